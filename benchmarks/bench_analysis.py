@@ -0,0 +1,76 @@
+# Semantic analysis of programs with many function declarations
+#
+# Usage: python -m benchmarks.bench_analysis [n_functions]
+import gc
+import sys
+import time
+import tracemalloc
+
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from interpreter.semantic_analyser import SemanticAnalyzer
+from benchmarks.programs import generate_program
+
+
+# Functions declared inside each other, the innermost ones use
+# the globals and the builtin types through the whole scope chain
+def generate_nested(depth, n_lines):
+    body = ''.join(
+        'v{}: int = g + h - g * h;\n'.format(_name(i)) for i in range(n_lines)
+    )
+    text = 'g: int = 1;\nh: int = 2;\n'
+    for level in range(depth):
+        text += 'function f{}(p: int, q: str, r: bool) {{\n'.format(_name(level))
+    text += body + '}\n' * depth
+    return text
+
+
+def _name(i):
+    return ''.join('abcdefghij'[int(digit)] for digit in str(i))
+
+
+def bench(tree, repeat=5):
+    best = None
+    for _ in range(repeat):
+        gc.disable()
+        start = time.perf_counter()
+        SemanticAnalyzer(tree).analyse()
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def retained(text):
+    """ Memory the analysis adds to a parsed tree """
+    tree = Parser(RegexLexer(text)).parse()
+    gc.collect()
+    tracemalloc.start()
+    SemanticAnalyzer(tree).analyse()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    n_functions = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    text = generate_program(n_functions)
+    tree = Parser(RegexLexer(text)).parse()
+
+    elapsed = bench(tree)
+    print('{} functions: {:8.1f}ms to analyse, {:.1f} MB kept by the analysed tree'.format(
+        n_functions, elapsed * 1000, retained(text) / 1024 / 1024
+    ))
+
+    depth, n_lines = 100, n_functions // 2
+    tree = Parser(RegexLexer(generate_nested(depth, n_lines))).parse()
+    elapsed = bench(tree)
+    print('{} lines {} functions deep: {:8.1f}ms to analyse'.format(
+        n_lines, depth, elapsed * 1000
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+# Running arithmetic, the operand types are known before it runs
+#
+# Usage: python -m benchmarks.bench_arithmetic [n_lines]
+import sys
+
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from interpreter.semantic_analyser import SemanticAnalyzer
+from benchmarks.bench_variables import bench
+from benchmarks.programs import arithmetic_program
+
+
+def main():
+    n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    text = arithmetic_program(n_lines)
+    tree = Parser(RegexLexer(text)).parse()
+    SemanticAnalyzer(tree).analyse()
+
+    elapsed = bench(tree)
+    print('{} lines: {:8.1f}ms to run, {:.2f}us per line'.format(
+        n_lines, elapsed * 1000, elapsed / n_lines * 1e6
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Visits per second of NodeVisitor.visit against the getattr lookup it
+# replaced, on every node of a generated program with visit methods
+# that do nothing
+#
+# Usage: python -m benchmarks.bench_dispatch [n_functions]
+import sys
+import time
+
+from interpreter.ast import AST, fields
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from interpreter.visitor import node_classes, make_visitor
+from benchmarks.programs import generate_program
+
+
+class GetattrVisitor(object):
+    def visit(self, node):
+        method_name = 'visit_' + type(node).__name__
+        visitor = getattr(self, method_name, self.generic_visit)
+        return visitor(node)
+
+    def generic_visit(self, node):
+        raise Exception('No visit_{} method'.format(type(node).__name__))
+
+
+def nothing(visitor, node):
+    pass
+
+
+methods = {node_class: nothing for node_class in node_classes()}
+TableVisitor = make_visitor('TableVisitor', methods)
+for node_class in methods:
+    setattr(GetattrVisitor, 'visit_' + node_class.__name__, nothing)
+
+
+def nodes_of(tree):
+    nodes = []
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, AST):
+            nodes.append(item)
+            stack.extend(value for _, value in fields(item))
+    return nodes
+
+
+def best(visitor, nodes, repeat=5):
+    visit = visitor.visit
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for node in nodes:
+            visit(node)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    n_functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    tree = Parser(RegexLexer(generate_program(n_functions))).parse()
+    nodes = nodes_of(tree)
+
+    before = best(GetattrVisitor(), nodes)
+    after = best(TableVisitor(), nodes)
+    print('{} nodes'.format(len(nodes)))
+    print('getattr: {:8.2f}M visits per second'.format(len(nodes) / before / 1e6))
+    print('table:   {:8.2f}M visits per second, {:.2f}x'.format(
+        len(nodes) / after / 1e6, before / after
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# The tree walking Interpreter against the closure compiler, the
+# bytecode VM, the register VM and Python source run by CPython. Compiling walks the
+# whole tree once, so it only pays off for code that runs more than
+# once, like function bodies. Compiled Python source is cached, the
+# compile time of python is without the cache
+#
+# Usage: python -m benchmarks.bench_engines [size]
+import contextlib
+import gc
+import os
+import sys
+import time
+
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from interpreter.semantic_analyser import SemanticAnalyzer
+from interpreter.interpreter import Interpreter
+from interpreter.closures import ClosureCompiler
+from interpreter.bytecode import compile_tree
+from interpreter.registers import compile_registers
+from interpreter.transpiler import Transpiler, PythonProgram, compile_source
+from benchmarks.programs import (
+    generate_program,
+    variable_program,
+    arithmetic_program,
+    recursive_program
+)
+
+
+def best(run, repeat=5):
+    times = []
+    for _ in range(repeat):
+        gc.disable()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        gc.enable()
+    return min(times)
+
+
+def transpile_uncached(tree):
+    compile_source.cache_clear()
+    transpiler = Transpiler(tree)
+    return PythonProgram(transpiler.transpile(), transpiler.constants)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), size * 400))
+    programs = [
+        ('recursive', recursive_program(size)),
+        ('variables', variable_program(size * 500)),
+        ('arithmetic', arithmetic_program(size * 500)),
+        ('functions', generate_program(size * 100)),
+    ]
+    engines = [
+        ('closures', lambda tree: ClosureCompiler(tree).compile(), lambda program: program()),
+        ('bytecode', compile_tree, lambda program: program.run()),
+        ('registers', compile_registers, lambda program: program.run()),
+        ('python', transpile_uncached, lambda program: program.run()),
+    ]
+    print('{:<12}{:<10}{:>10}{:>10}{:>10}{:>10}{:>10}'.format(
+        'program', 'engine', 'tree', 'compile', 'run', 'speedup', 'run only'
+    ))
+    for name, text in programs:
+        tree = Parser(RegexLexer(text)).parse()
+        SemanticAnalyzer(tree).analyse()
+        rows = []
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            tree_time = best(lambda: Interpreter(tree).interpret())
+            for engine, compile, run in engines:
+                program = compile(tree)
+                rows.append((engine, best(lambda: compile(tree)), best(lambda: run(program))))
+
+        for engine, compile_time, run_time in rows:
+            print('{:<12}{:<10}{:>8.1f}ms{:>8.1f}ms{:>8.1f}ms{:>9.1f}x{:>9.1f}x'.format(
+                name, engine, tree_time * 1000, compile_time * 1000, run_time * 1000,
+                tree_time / (compile_time + run_time), tree_time / run_time
+            ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Pratt parser against the expr -> term -> factor chain
+#
+# Usage: python -m benchmarks.bench_expressions [n_lines]
+import gc
+import sys
+import time
+
+from interpreter.ast import dump
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+
+
+# Tokens are lexed up front so only the parser is timed
+def lex(text):
+    lexer = RegexLexer(text)
+    tokens = []
+    while True:
+        token = lexer.get_next_token()
+        tokens.append(token)
+        if token.type == 'EOF':
+            return tokens
+
+
+def generate_chains(n_lines):
+    chain = ' + '.join('a * {} - b'.format(i) for i in range(30))
+    return '\n'.join('x: int = {};'.format(chain) for _ in range(n_lines))
+
+
+def generate_expressions(n_lines):
+    lines = []
+    for i in range(n_lines):
+        lines.append(
+            'x: int = a + b * {i} - (c - {i}) * (d + e / f) + g - h + i * j;'.format(i=i)
+        )
+        lines.append(
+            'if (a * {i} + b >= (c - d) * e - {i}) {{ print(a + b + c + d + e + f); }}'.format(i=i)
+        )
+    return '\n'.join(lines)
+
+
+def bench(tokens, pratt, repeat=10):
+    best = None
+    for _ in range(repeat):
+        parser = Parser(tokens)
+        parser.pratt = pratt
+        gc.disable()
+        start = time.perf_counter()
+        tree = parser.parse()
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        if best is None or elapsed < best:
+            best = elapsed
+    return tree, best
+
+
+def main():
+    n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    programs = (
+        ('mixed', generate_expressions(n_lines)),
+        ('long chains', generate_chains(n_lines // 4)),
+    )
+    for name, text in programs:
+        tokens = lex(text)
+        print('{}: {} tokens'.format(name, len(tokens)))
+
+        descent_tree, descent = bench(tokens, pratt=False)
+        pratt_tree, pratt = bench(tokens, pratt=True)
+        assert dump(descent_tree) == dump(pratt_tree)
+
+        print('  {:<18} {:8.1f}ms'.format('recursive descent', descent * 1000))
+        print('  {:<18} {:8.1f}ms  {:.2f}x'.format('pratt', pratt * 1000, descent / pratt))
+
+
+if __name__ == '__main__':
+    main()
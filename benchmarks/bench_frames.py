@@ -0,0 +1,55 @@
+# Calls per second of the tree walking Interpreter and the activation
+# records it creates per call, with and without reusing them
+#
+# Usage: python -m benchmarks.bench_frames [n]
+import gc
+import sys
+import time
+
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from interpreter.semantic_analyser import SemanticAnalyzer
+from interpreter.interpreter import Interpreter
+from benchmarks.programs import recursive_program
+
+
+class CountingInterpreter(Interpreter):
+    calls = 0
+
+    def enter_call(self, func_symbol, args):
+        self.calls += 1
+        super(CountingInterpreter, self).enter_call(func_symbol, args)
+
+
+def best(tree, pool_size, repeat=5):
+    times = []
+    for _ in range(repeat):
+        interpreter = Interpreter(tree)
+        interpreter.pool_size = pool_size
+        gc.disable()
+        start = time.perf_counter()
+        interpreter.interpret()
+        times.append(time.perf_counter() - start)
+        gc.enable()
+    return min(times)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), n * 400))
+    tree = Parser(RegexLexer(recursive_program(n))).parse()
+    SemanticAnalyzer(tree).analyse()
+
+    for name, pool_size in (('new records', 0), ('pooled', Interpreter.pool_size)):
+        interpreter = CountingInterpreter(tree)
+        interpreter.pool_size = pool_size
+        interpreter.interpret()
+        calls = interpreter.calls
+        elapsed = best(tree, pool_size)
+        print('{:<12}{:>8} calls {:>10.0f} calls/s {:>8.3f} records/call'.format(
+            name, calls, calls / elapsed, interpreter.allocated / calls
+        ))
+
+
+if __name__ == '__main__':
+    main()
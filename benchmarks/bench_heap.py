@@ -0,0 +1,99 @@
+# Throughput of the StackInterpreter, which keeps calls on the heap,
+# next to the recursive tree walker, and how deep non tail recursion
+# gets under a memory budget with the bytes each call holds
+#
+# Usage: python -m benchmarks.bench_heap [max_depth]
+import gc
+import sys
+import time
+import tracemalloc
+
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from interpreter.semantic_analyser import SemanticAnalyzer
+from interpreter.interpreter import Interpreter, StackInterpreter
+from interpreter.trampoline import STEP_BYTES
+from benchmarks.programs import recursive_program, variable_program
+
+count_text = """
+function count(n: int) {{
+    if (n == 0) {{
+        return(0);
+    }} else {{
+        return(1 + count(n - 1));
+    }}
+}}
+x: int = count({depth});
+"""
+
+
+def analysed(text):
+    tree = Parser(RegexLexer(text)).parse()
+    SemanticAnalyzer(tree).analyse()
+    return tree
+
+
+def best(cls, tree, repeat=5):
+    times = []
+    for _ in range(repeat):
+        interpreter = cls(tree)
+        gc.disable()
+        start = time.perf_counter()
+        interpreter.interpret()
+        times.append(time.perf_counter() - start)
+        gc.enable()
+    return min(times)
+
+
+class MeasuringInterpreter(StackInterpreter):
+    # Most bytes the budget counted at once
+    counted = 0
+
+    def enter_call(self, func_symbol, args):
+        super(MeasuringInterpreter, self).enter_call(func_symbol, args)
+        counted = self.call_stack.bytes + len(self.steps) * STEP_BYTES
+        if counted > self.counted:
+            self.counted = counted
+
+
+def main():
+    max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20 * 400))
+
+    for name, text in (
+        ('recursive', recursive_program(20)),
+        ('variables', variable_program(2000)),
+    ):
+        tree = analysed(text)
+        walker = best(Interpreter, tree)
+        stack = best(StackInterpreter, tree)
+        print('{:<10} walker {:8.1f}ms  stack {:8.1f}ms  {:.2f}x slower'.format(
+            name, walker * 1000, stack * 1000, stack / walker
+        ))
+
+    depth = 1000
+    while depth <= max_depth:
+        tree = analysed(count_text.format(depth=depth))
+        interpreter = MeasuringInterpreter(tree)
+        interpreter.max_bytes = 1 << 30
+        start = time.perf_counter()
+        interpreter.interpret()
+        elapsed = time.perf_counter() - start
+        counted = interpreter.counted
+
+        tracemalloc.start()
+        interpreter = StackInterpreter(tree)
+        interpreter.max_bytes = 1 << 30
+        interpreter.interpret()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print('depth {:>7}: {:8.1f}ms, {:.2f}us per call, {:6.0f} bytes counted '
+              'and {:6.0f} traced per call'.format(
+                  depth, elapsed * 1000, elapsed / depth * 1e6,
+                  counted / depth, peak / depth
+              ))
+        depth *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Re-check latency of the incremental front end against a full parse
+#
+# Usage: python -m benchmarks.bench_incremental [n_lines]
+import sys
+import time
+
+from interpreter.incremental import IncrementalParser
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from benchmarks.programs import generate_program
+
+
+def best_of(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    text = generate_program(1)
+    n_functions = n_lines // text.count('\n')
+    text = generate_program(n_functions)
+    print('Program: {} lines'.format(text.count('\n')))
+
+    full = best_of(lambda: Parser(RegexLexer(text)).parse())
+    print('{:<28} {:8.2f}ms'.format('full parse', full * 1000))
+
+    # Flip between two versions of the program, each run
+    # parses one edit of the given size in the middle of it
+    middle = text.index('c: int = a *', len(text) // 2)
+    for size in (1, 10, 100, 1000):
+        edited = text[:middle] + 'x' * size + ': int = 1;' + text[middle:]
+        parser = IncrementalParser(text)
+        versions = [edited, text]
+
+        def edit():
+            parser.update(versions[0])
+            versions.reverse()
+
+        elapsed = best_of(edit, repeat=20)
+        print('{:<28} {:8.2f}ms'.format(
+            'edit of {} chars'.format(size + 10), elapsed * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Lexer throughput in tokens per second
+#
+# Usage: python -m benchmarks.bench_lexer [n_functions]
+import sys
+import time
+
+from interpreter.lexer import Lexer, RegexLexer
+from benchmarks.programs import generate_program
+
+
+def count_tokens(lexer):
+    count = 0
+    while lexer.get_next_token().type != 'EOF':
+        count += 1
+    return count
+
+
+def bench(lexer_class, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = count_tokens(lexer_class(text))
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return count, best
+
+
+def main():
+    n_functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    text = generate_program(n_functions)
+    print('Program: {} chars'.format(len(text)))
+
+    for lexer_class in (Lexer, RegexLexer):
+        count, elapsed = bench(lexer_class, text)
+        print('{:<12} {:>8} tokens  {:8.3f}s  {:>12,.0f} tokens/s'.format(
+            lexer_class.__name__, count, elapsed, count / elapsed
+        ))
+
+
+if __name__ == '__main__':
+    main()
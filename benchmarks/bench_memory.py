@@ -0,0 +1,103 @@
+# Memory held by a parsed and analysed tree per node, by the same
+# program parsed and analysed as a flat tree, and what interning literals saves
+#
+# Usage: python -m benchmarks.bench_memory [n_functions]
+import gc
+import sys
+import time
+import tracemalloc
+
+from interpreter.ast import AST, fields
+from interpreter.lexer import TokenBuffer
+from interpreter.parser import Parser
+from interpreter.semantic_analyser import SemanticAnalyzer, FlatSemanticAnalyzer
+from benchmarks.programs import generate_program
+
+
+def count_nodes(tree):
+    count = 0
+    seen = set()
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, AST) and id(item) not in seen:
+            seen.add(id(item))
+            count += 1
+            stack.extend(value for _, value in fields(item))
+    return count
+
+
+def traced(function):
+    """ Result of function, memory it leaves allocated and its time """
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    function()
+    return result, size, time.perf_counter() - start
+
+
+def analysed(tokens):
+    tree = Parser(tokens).parse()
+    SemanticAnalyzer(tree).analyse()
+    return tree
+
+
+def flat_analysed(tokens):
+    flat = Parser(tokens).parse_flat()
+    FlatSemanticAnalyzer(flat).analyse()
+    return flat
+
+
+def parsed(tokens, intern):
+    parser = Parser(tokens)
+    parser.intern = intern
+    return parser.parse()
+
+
+def main():
+    n_functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    text = generate_program(n_functions)
+    tokens = TokenBuffer(text) # Lexed up front, only the tree is measured
+
+    tree, size, analyse_time = traced(lambda: analysed(tokens))
+    nodes = count_nodes(tree)
+    flat, flat_size, flat_analyse_time = traced(lambda: flat_analysed(tokens))
+    print('Program: {} lines, {} nodes'.format(text.count('\n'), nodes))
+    # Shared nodes share a row, so a flat tree has as many rows as nodes
+    for name, size, count, elapsed in (
+        ('tree', size, nodes, analyse_time),
+        ('flat tree', flat_size, len(flat), flat_analyse_time)
+    ):
+        print('{:<16} {:10.1f} MB {:10.1f} bytes per node {:8.1f}ms to parse and analyse'.format(
+            name, size / 1024 / 1024, size / count, elapsed * 1000
+        ))
+
+    _, size, parse_time = traced(lambda: Parser(tokens).parse())
+    flat, flat_size, flat_time = traced(lambda: Parser(tokens).parse_flat())
+    for name, size, count, elapsed in (
+        ('parsed tree', size, nodes, parse_time),
+        ('parsed flat tree', flat_size, len(flat), flat_time)
+    ):
+        print('{:<16} {:10.1f} MB {:10.1f} bytes per node {:8.1f}ms to parse'.format(
+            name, size / 1024 / 1024, size / count, elapsed * 1000
+        ))
+
+    plain, plain_size, _ = traced(lambda: parsed(tokens, intern=False))
+    shared, shared_size, _ = traced(lambda: parsed(tokens, intern=True))
+    plain_nodes, shared_nodes = count_nodes(plain), count_nodes(shared)
+    print('Interning: {} -> {} nodes ({:.1f}% fewer), {:.1f} -> {:.1f} MB ({:.1f}% saved)'.format(
+        plain_nodes, shared_nodes, 100 - 100 * shared_nodes / plain_nodes,
+        plain_size / 1024 / 1024, shared_size / 1024 / 1024,
+        100 - 100 * shared_size / plain_size
+    ))
+
+
+if __name__ == '__main__':
+    main()
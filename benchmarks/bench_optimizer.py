@@ -0,0 +1,85 @@
+# Nodes the interpreter visits and its time without the optimizer, with
+# only constant folding and with dead code elimination as well
+#
+# Usage: python -m benchmarks.bench_optimizer [n_lines]
+import contextlib
+import io
+import sys
+
+from interpreter.interpreter import Interpreter
+from interpreter.lexer import RegexLexer
+from interpreter.optimizer import Optimizer
+from interpreter.parser import Parser
+from interpreter.semantic_analyser import SemanticAnalyzer
+from benchmarks.bench_variables import bench
+from benchmarks.programs import arithmetic_program, generate_program, _name
+
+
+class CountingInterpreter(Interpreter):
+    visited = 0
+
+    def visit(self, node):
+        self.visited += 1
+        return super(CountingInterpreter, self).visit(node)
+
+
+def visited(tree):
+    interpreter = CountingInterpreter(tree)
+    interpreter.interpret()
+    return interpreter.visited
+
+
+# Half the functions are never called, every function has a
+# variable nothing reads
+def generate_dead(n_functions):
+    lines = []
+    for i in range(n_functions):
+        lines.append(
+            'function f_{name}(a: int) {{ unused: int = a * {i}; t: int = a + 1; return(t); }}\n'.format(
+                name=_name(i), i=i
+            )
+        )
+        if i % 2 == 0:
+            lines.append('print(f_{}({}));\n'.format(_name(i), i))
+    return ''.join(lines)
+
+
+# Optimizing changes the blocks the function symbols run,
+# so every variant gets its own analysed tree
+def analysed(text):
+    tree = Parser(RegexLexer(text)).parse()
+    SemanticAnalyzer(tree).analyse()
+    return tree
+
+
+def optimized(text, dead_code):
+    optimizer = Optimizer(analysed(text))
+    optimizer.dead_code = dead_code
+    return optimizer.optimize(), len(optimizer.eliminated)
+
+
+def main():
+    n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    programs = (
+        ('arithmetic', arithmetic_program(n_lines)),
+        ('functions', generate_program(n_lines // 10)),
+        ('dead code', generate_dead(n_lines // 2)),
+    )
+    for name, text in programs:
+        tree = analysed(text)
+        folded, _ = optimized(text, dead_code=False)
+        pruned, eliminated = optimized(text, dead_code=True)
+
+        print('{}: {} lines, {} statements eliminated'.format(
+            name, text.count('\n'), eliminated
+        ))
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = [(visited(item), bench(item)) for item in (tree, folded, pruned)]
+        for label, (count, elapsed) in zip(('analysed', 'folded', 'optimised'), results):
+            print('  {:<10} {:10} nodes visited {:8.1f}ms to run'.format(
+                label, count, elapsed * 1000
+            ))
+
+
+if __name__ == '__main__':
+    main()
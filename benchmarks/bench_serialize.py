@@ -0,0 +1,49 @@
+# Loading a compiled program against lexing, parsing and
+# analysing its source again
+#
+# Usage: python -m benchmarks.bench_serialize [n_functions]
+import sys
+import time
+
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from interpreter.semantic_analyser import SemanticAnalyzer
+from interpreter.serialize import dumps, loads
+from benchmarks.programs import generate_program
+
+
+def best_of(function, repeat=7):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def analyse(text):
+    tree = Parser(RegexLexer(text)).parse()
+    SemanticAnalyzer(tree).analyse()
+    return tree
+
+
+def main():
+    n_functions = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    text = generate_program(n_functions)
+    data = dumps(analyse(text), text)
+    print('Program: {} lines, {} bytes source, {} bytes compiled'.format(
+        text.count('\n'), len(text), len(data)
+    ))
+
+    compile_time = best_of(lambda: analyse(text))
+    load_time = best_of(lambda: loads(data, text))
+    print('{:<24} {:8.2f}ms'.format('lex + parse + analyse', compile_time * 1000))
+    print('{:<24} {:8.2f}ms  {:.1f}x'.format(
+        'load', load_time * 1000, compile_time / load_time
+    ))
+
+
+if __name__ == '__main__':
+    main()
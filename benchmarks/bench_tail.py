@@ -0,0 +1,48 @@
+# Self recursion in tail position at growing depths: time and the
+# most memory the run holds at once, which should not grow
+#
+# Usage: python -m benchmarks.bench_tail [max_depth]
+import sys
+import time
+import tracemalloc
+
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from interpreter.semantic_analyser import SemanticAnalyzer
+from interpreter.interpreter import Interpreter
+
+text = """
+function sum(n: int, acc: int) {{
+    if (n == 0) {{
+        return(acc);
+    }} else {{
+        return(sum(n - 1, acc + n));
+    }}
+}}
+x: int = sum({depth}, 0);
+"""
+
+
+def main():
+    max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    depth = 1000
+    while depth <= max_depth:
+        tree = Parser(RegexLexer(text.format(depth=depth))).parse()
+        SemanticAnalyzer(tree).analyse()
+
+        start = time.perf_counter()
+        Interpreter(tree).interpret()
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        Interpreter(tree).interpret()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print('depth {:>8}: {:8.1f}ms, {:.2f}us per call, {:6.1f} KB peak'.format(
+            depth, elapsed * 1000, elapsed / depth * 1e6, peak / 1024
+        ))
+        depth *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# Memory held by the token stream, Token objects vs TokenBuffer
+#
+# Usage: python -m benchmarks.bench_tokens [n_functions]
+import sys
+import tracemalloc
+
+from interpreter.lexer import RegexLexer, TokenBuffer
+from benchmarks.programs import generate_program
+
+
+def token_list(text):
+    lexer = RegexLexer(text)
+    tokens = []
+    while True:
+        token = lexer.get_next_token()
+        tokens.append(token)
+        if token.type == 'EOF':
+            return tokens
+
+
+def measure(build, text):
+    tracemalloc.start()
+    result = build(text)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    n_functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    text = generate_program(n_functions)
+
+    tokens, list_size = measure(token_list, text)
+    buffer, buffer_size = measure(TokenBuffer, text)
+    count = len(buffer)
+    assert count == len(tokens)
+
+    print('{} tokens, source text not counted'.format(count))
+    for name, size in (('Token list', list_size), ('TokenBuffer', buffer_size)):
+        print('{:<12} {:>12,} bytes  {:>12,} bytes per 100k tokens'.format(
+            name, size, size * 100000 // count
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# Running a program that mostly reads and writes variables
+#
+# Usage: python -m benchmarks.bench_variables [n_calls]
+import gc
+import sys
+import time
+
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from interpreter.semantic_analyser import SemanticAnalyzer
+from interpreter.interpreter import Interpreter
+from benchmarks.programs import variable_program
+
+
+def bench(tree, repeat=5):
+    best = None
+    for _ in range(repeat):
+        gc.disable()
+        start = time.perf_counter()
+        Interpreter(tree).interpret()
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    n_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    text = variable_program(n_calls)
+    tree = Parser(RegexLexer(text)).parse()
+    SemanticAnalyzer(tree).analyse()
+
+    elapsed = bench(tree)
+    print('{} calls: {:8.1f}ms to run, {:.2f}us per call'.format(
+        n_calls, elapsed * 1000, elapsed / n_calls * 1e6
+    ))
+
+
+if __name__ == '__main__':
+    main()
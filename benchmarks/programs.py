@@ -0,0 +1,83 @@
+# Generated programs shared by the benchmarks
+
+
+def function_block(i):
+    return """
+function func_{name}(a: int, b: str) {{
+    /* Function number {i} */
+    c: int = a * {i} + (a - 3) * 2;
+    d: str = b;
+    if (c >= {i}) {{
+        print('big ', c, d);
+    }} else {{
+        print('small ', c);
+    }}
+    return(c + 1);
+}}
+print(func_{name}({i}, 'text'));
+""".format(name=_name(i), i=i)
+
+
+def generate_program(n_functions):
+    return ''.join(function_block(i) for i in range(n_functions))
+
+
+# Names can not contain digits
+def _name(i):
+    letters = 'abcdefghij'
+    return ''.join(letters[int(digit)] for digit in str(i))
+
+
+# Mostly variable reads and writes, in a function and at the top level
+def variable_program(n_calls):
+    lines = ["""
+function work(a: int, b: int) {
+    c: int = a + b;
+    d: int = c * a - b;
+    e: int = d + c - a * b;
+    f: int = e - d + c - b + a;
+    return(f * a + e * b - d + c - f);
+}
+x_a: int = 0;
+"""]
+    for i in range(1, n_calls):
+        lines.append('x_{name}: int = work({i}, {j}) - x_{prev} + x_{prev};\n'.format(
+            name=_name(i), prev=_name(i - 1), i=i, j=i % 7
+        ))
+    return ''.join(lines)
+
+
+# Long integer expressions on variables and numbers
+def arithmetic_program(n_lines):
+    lines = ['a: int = 3; b: int = 5; c: int = 7; d: int = 11; e: int = 13;\n']
+    for i in range(n_lines):
+        lines.append(
+            'x_{name}: int = a + b * {i} - (c - {i}) * (d + e) + a * b - c + d * -e;\n'
+            'if (x_{name} * 2 >= (a - b) * c - {i}) {{ y_{name}: int = x_{name} - a * b; }}\n'.format(
+                name=_name(i), i=i
+            )
+        )
+    return ''.join(lines)
+
+
+# Recursive calls, fib(n) and a count down n calls deep
+def recursive_program(n):
+    return """
+function fib(n: int) {{
+    if (n <= 1) {{
+        return(n);
+    }} else {{
+        a: int = fib(n - 1);
+        return(a + fib(n - 2));
+    }}
+}}
+function count(n: int) {{
+    if (n == 0) {{
+        return(0);
+    }} else {{
+        return(1 + count(n - 1));
+    }}
+}}
+x: int = fib({n});
+y: int = count({n} * 20);
+""".format(n=n)
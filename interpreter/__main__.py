@@ -0,0 +1,171 @@
+import argparse
+import os
+import sys
+
+from .lexer import Lexer, RegexLexer, StreamLexer
+from .parser import Parser
+from .semantic_analyser import SemanticAnalyzer
+from .interpreter import Interpreter, StackInterpreter
+from .optimizer import Optimizer
+from .ast import dump as dump_tree
+from .bytecode import compile_tree, disassemble
+from .transpiler import Transpiler
+from . import serialize
+
+#######################################
+#######################################
+# COMMAND LINE
+#######################################
+#######################################
+
+
+def cmd_lex(args):
+    if args.stream: # Never holds the whole file in memory
+        lexer = StreamLexer(args.file)
+    else:
+        with open(args.file, encoding='utf-8') as f:
+            text = f.read()
+        lexer = Lexer(text) if args.char_lexer else RegexLexer(text)
+
+    count = 0
+    while True:
+        token = lexer.get_next_token()
+        if token.type == 'EOF':
+            break
+        count += 1
+        if not args.count:
+            print(token)
+
+    if args.count:
+        print(count)
+
+
+def analyse(text, optimize=True):
+    tree = Parser(RegexLexer(text)).parse()
+    SemanticAnalyzer(tree).analyse()
+    if optimize:
+        tree = Optimizer(tree).optimize()
+    return tree
+
+
+def cmd_dump(args):
+    with open(args.file, encoding='utf-8') as f:
+        text = f.read()
+    tree = analyse(text, optimize=False)
+    if not args.no_optimize:
+        optimizer = Optimizer(tree)
+        tree = optimizer.optimize()
+        for statement in optimizer.eliminated:
+            print('Removed {}'.format(statement), file=sys.stderr)
+    print(dump_tree(tree))
+
+
+def cmd_compile(args):
+    with open(args.file, encoding='utf-8') as f:
+        text = f.read()
+    tree = analyse(text)
+
+    output = args.output or os.path.splitext(args.file)[0] + '.ipc'
+    with open(output, 'wb') as f:
+        serialize.dump(tree, text, f)
+
+
+def cmd_run(args):
+    # Runs source files and compiled programs alike
+    with open(args.file, 'rb') as f:
+        data = f.read()
+    if serialize.is_compiled(data):
+        tree = serialize.loads(data)
+    else:
+        tree = analyse(data.decode('utf-8'))
+    if args.engine == 'stack':
+        interpreter = StackInterpreter(tree)
+        if args.max_memory is not None:
+            interpreter.max_bytes = int(args.max_memory * 1024 * 1024)
+        interpreter.interpret()
+    else:
+        Interpreter(tree).interpret(engine=args.engine)
+
+
+def cmd_dis(args):
+    with open(args.file, encoding='utf-8') as f:
+        text = f.read()
+    print(disassemble(compile_tree(analyse(text))))
+
+
+def cmd_transpile(args):
+    with open(args.file, encoding='utf-8') as f:
+        text = f.read()
+    print(Transpiler(analyse(text)).transpile(), end='')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='interpreter')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    lex_parser = commands.add_parser('lex', help='print the tokens of a file')
+    lex_parser.add_argument('file')
+    lex_parser.add_argument(
+        '--stream', action='store_true',
+        help='lex the file in chunks without reading it into memory first'
+    )
+    lex_parser.add_argument(
+        '--char-lexer', action='store_true',
+        help='use the char by char Lexer'
+    )
+    lex_parser.add_argument(
+        '--count', action='store_true',
+        help='only print the number of tokens'
+    )
+    lex_parser.set_defaults(func=cmd_lex)
+
+    compile_parser = commands.add_parser(
+        'compile', help='analyse a file and save the program to run it later'
+    )
+    compile_parser.add_argument('file')
+    compile_parser.add_argument(
+        '-o', '--output',
+        help='where to save the program, FILE with .ipc extension by default'
+    )
+    compile_parser.set_defaults(func=cmd_compile)
+
+    run_parser = commands.add_parser('run', help='run a source file or a compiled program')
+    run_parser.add_argument('file')
+    run_parser.add_argument(
+        '--engine', choices=('tree', 'stack', 'closures', 'bytecode', 'registers', 'python'),
+        default='tree',
+        help='walk the tree, walk it keeping calls on the heap (stack), '
+             'or compile it to closures, bytecode, register code or Python first'
+    )
+    run_parser.add_argument(
+        '--max-memory', type=float, metavar='MB',
+        help='with --engine stack, the most memory running calls can hold'
+    )
+    run_parser.set_defaults(func=cmd_run)
+
+    dump_parser = commands.add_parser(
+        'dump', help='print the optimised tree of a file and what the optimizer removed'
+    )
+    dump_parser.add_argument('file')
+    dump_parser.add_argument(
+        '--no-optimize', action='store_true',
+        help='print the tree as the semantic analyser left it'
+    )
+    dump_parser.set_defaults(func=cmd_dump)
+
+    dis_parser = commands.add_parser('dis', help='print the bytecode of a file')
+    dis_parser.add_argument('file')
+    dis_parser.set_defaults(func=cmd_dis)
+
+    transpile_parser = commands.add_parser(
+        'transpile', help='print the Python source a file is turned into'
+    )
+    transpile_parser.add_argument('file')
+    transpile_parser.set_defaults(func=cmd_transpile)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
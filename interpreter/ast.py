@@ -1,60 +1,109 @@
+from .lexer import Token
+
 #######################################
 #######################################
 # AST NODES
 #######################################
 #######################################
 
+# Nodes keep their attributes in __slots__, there are a lot of
+# them in every cached tree. Literal nodes and operators only keep
+# what the token held, token rebuilds it when it is asked for.
 class AST(object):
-    pass
+    __slots__ = ()
 
 
 class Block(AST):
+    __slots__ = ('children', 'nlocals')
+
     def __init__(self):
         self.children = []
+        # Number of global variables, set on the root
+        # block by the semantic analyser
+        self.nlocals = None
 
 
 class Number(AST):
+    __slots__ = ('value',)
+
     def __init__(self, token):
         self.value = token.value
-        self.token = token
+
+    @property
+    def token(self):
+        if isinstance(self.value, float):
+            return Token('FLOAT', self.value)
+        return Token('INTEGER', self.value)
 
 
 class Boolean(AST):
+    __slots__ = ('value',)
+
     def __init__(self, token):
         self.value = token.value
-        self.token = token
+
+    @property
+    def token(self):
+        return Token('BOOL', self.value)
 
 
 class String(AST):
+    __slots__ = ('value',)
+
     def __init__(self, token):
         self.value = token.value
-        self.token = token
+
+    @property
+    def token(self):
+        return Token('STRING', self.value)
 
 
 class BinOp(AST):
+    __slots__ = ('left', 'op', 'right', 'type')
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
-        self.token = self.op
+        # Type of both operands when the semantic analyser knows it,
+        # None when it has to be checked at run time
+        self.type = None
+
+    @property
+    def token(self):
+        return self.op
 
 
 class Comparison(AST):
+    __slots__ = ('left', 'op', 'right', 'type')
+
     def __init__(self, left, op=None, right=None):
         self.left = left
         self.op = op
         self.right = right
-        self.token = self.op
+        self.type = None # Like BinOp.type
+
+    @property
+    def token(self):
+        return self.op
 
 
 # Example -> b: int = -a; <- Unary operation
 class UnaryOp(AST):
+    __slots__ = ('op', 'expr')
+
     def __init__(self, op, expr):
-        self.token = self.op = op
+        self.op = op
         self.expr = expr
 
+    @property
+    def token(self):
+        return self.op
+
 
 class Assign(AST):
+    __slots__ = ('name', 'type', 'value')
+
     def __init__(self, name, value, type=None):
         self.name = name
         self.type = type
@@ -63,16 +112,22 @@ class Assign(AST):
 class Value(AST):
     # Something that has only a value
     # Like a boolean or a string
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
 
 class Print(AST):
+    __slots__ = ('args',)
+
     def __init__(self):
         self.args = []
 
 
 class IfStatement(AST):
+    __slots__ = ('value', 'block', 'elseblock')
+
     def __init__(self, value, block, elseblock=None):
         self.value = value
         self.block = block
@@ -80,12 +135,16 @@ class IfStatement(AST):
 
 
 class Param(AST):
+    __slots__ = ('var_node', 'type_node')
+
     def __init__(self, var_node, type_node):
         self.var_node = var_node
         self.type_node = type_node
 
 
 class FuncDecl(AST):
+    __slots__ = ('func_name', 'formal_params', 'block_node', 'returns')
+
     def __init__(self, func_name, params, block_node, returns=None):
         self.func_name = func_name
         self.formal_params = params # This is a list of parameter nodes
@@ -94,20 +153,85 @@ class FuncDecl(AST):
 
 
 class FuncCall(AST):
+    __slots__ = ('func_name', 'params', 'scope_level', 'func_symbol', 'tail')
+
     def __init__(self, func_name, params, token):
         self.func_name = func_name
         self.params = params
-        self.token = token
         self.scope_level = None
+        # Set once by the semantic analyser, the interpreter
+        # only reads it so an analysed tree can be run many times
+        self.func_symbol = None
+        # True for a function calling itself as the last thing it runs
+        self.tail = None
+
+    @property
+    def token(self):
+        return Token('NAME', self.func_name)
 
 class Empty(AST):
-    pass
+    __slots__ = ()
 
 class Returns(AST):
+    __slots__ = ('returns',)
+
     def __init__(self, returns):
         self.returns = returns
 
 class Variable(AST):
+    __slots__ = ('value', 'depth', 'slot')
+
     def __init__(self, token):
         self.value = token.value
-        self.token = token
+        # Resolved by the semantic analyser: how many scopes out the
+        # variable is declared and its index in that scope
+        self.depth = None
+        self.slot = None
+
+    @property
+    def token(self):
+        return Token('NAME', self.value)
+
+
+# Attribute names of a node class, base classes first
+slot_names = {}
+
+
+def fields(obj):
+    """ (name, value) of every attribute that is set, works for
+        nodes and for plain objects like tokens and symbols """
+    if hasattr(obj, '__dict__'):
+        return list(vars(obj).items())
+
+    cls = type(obj)
+    names = slot_names.get(cls)
+    if names is None:
+        names = slot_names[cls] = [
+            name for klass in reversed(cls.__mro__)
+            for name in getattr(klass, '__slots__', ())
+        ]
+    return [(name, getattr(obj, name)) for name in names if hasattr(obj, name)]
+
+
+#######################################
+# DUMP
+#######################################
+
+# Readable form of a tree, one node per line
+def dump(node, indent=0):
+    pad = '  ' * indent
+    if isinstance(node, list):
+        if not node:
+            return pad + '[]'
+        return '\n'.join(dump(item, indent) for item in node)
+    if not isinstance(node, AST):
+        return pad + repr(node)
+
+    lines = [pad + type(node).__name__]
+    for name, value in sorted(fields(node)):
+        if isinstance(value, (AST, list)) and value:
+            lines.append('{}  {}:'.format(pad, name))
+            lines.append(dump(value, indent + 2))
+        else:
+            lines.append('{}  {}: {!r}'.format(pad, name, value))
+    return '\n'.join(lines)
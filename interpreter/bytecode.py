@@ -0,0 +1,377 @@
+from .ast import FuncDecl, FuncCall, Empty
+from .interpreter import NodeVisitor, Interpreter
+
+#######################################
+#######################################
+# BYTECODE
+#######################################
+#######################################
+
+"""
+An analysed tree compiled to one list of ints, every instruction is
+two of them: opcode and argument. The program comes first and ends
+with HALT, the body of each called function follows and ends with END.
+Constants, the BinOps checked at run time and call targets are in the
+constant pool, the argument of their instructions is the index.
+
+Jumps are offsets from the instruction after the jump.
+
+The VM keeps values on one stack and runs calls in a loop, a frame is
+a list [access link, returns, slot 0, slot 1, ...].
+"""
+
+LINK = 0
+RETURNS = 1
+FIRST_SLOT = 2
+
+(
+    CONST,          # push constants[arg]
+    LOAD,           # push slot arg of the frame
+    LOAD_OUTER,     # push a variable of an outer frame, constants[arg] is (depth, slot)
+    STORE,          # pop into slot arg
+    ADD,
+    SUB,
+    MUL,
+    DIV,
+    CHECKED_BINOP,  # BinOp constants[arg] on operands checked now
+    LESS,
+    LESS_EQUAL,
+    GREATER_EQUAL,
+    GREATER,
+    EQUAL,
+    NEGATIVE,
+    POSITIVE,
+    JUMP,
+    JUMP_IF_FALSE,  # pop, jump when it is false
+    PRINT,          # print the top arg values
+    RETURN,         # the top arg values become what the call returns
+    CALL,           # constants[arg] is (start, frame size, number of params, hops)
+    END,            # end of a function body
+    POP,
+    HALT,
+) = range(24)
+
+opnames = [
+    'CONST', 'LOAD', 'LOAD_OUTER', 'STORE', 'ADD', 'SUB', 'MUL', 'DIV',
+    'CHECKED_BINOP', 'LESS', 'LESS_EQUAL', 'GREATER_EQUAL', 'GREATER',
+    'EQUAL', 'NEGATIVE', 'POSITIVE', 'JUMP', 'JUMP_IF_FALSE', 'PRINT',
+    'RETURN', 'CALL', 'END', 'POP', 'HALT',
+]
+binary_opcodes = {'+': ADD, '-': SUB, '*': MUL, '/': DIV}
+comparison_opcodes = {
+    '<': LESS,
+    '<=': LESS_EQUAL,
+    '>=': GREATER_EQUAL,
+    '>': GREATER,
+    '==': EQUAL,
+}
+
+
+class Program(object):
+    def __init__(self, code, constants, nlocals, functions):
+        self.code = code
+        self.constants = constants
+        self.nlocals = nlocals # Of the global frame
+        self.functions = functions # Start of each function body -> its name
+
+    def run(self):
+        return VM(self).run()
+
+
+class Compiler(NodeVisitor):
+    def __init__(self, tree):
+        self.tree = tree
+        self.code = []
+        self.constants = []
+        self.constant_index = {}
+        self.level = 1 # Scope level of the code being compiled
+        # id of a function block -> index of its function
+        self.function_index = {}
+        self.function_symbols = []
+        # (constant index, function index, number of params, hops) of each call
+        self.calls = []
+
+    def compile(self):
+        self.visit(self.tree)
+        self.emit(HALT)
+
+        # Bodies of called functions, compiling one can add more
+        starts = []
+        functions = {}
+        index = 0
+        while index < len(self.function_symbols):
+            func_symbol = self.function_symbols[index]
+            starts.append(len(self.code))
+            functions[len(self.code)] = func_symbol.name
+            self.level = func_symbol.scope_level + 1
+            self.visit(func_symbol.block)
+            self.emit(END)
+            index += 1
+
+        for constant, index, nparams, hops in self.calls:
+            func_symbol = self.function_symbols[index]
+            self.constants[constant] = (
+                starts[index], FIRST_SLOT + func_symbol.nlocals, nparams, hops
+            )
+
+        return Program(
+            self.code, self.constants,
+            self.tree.nlocals or 0, functions
+        )
+
+    def emit(self, opcode, arg=0):
+        self.code.append(opcode)
+        self.code.append(arg)
+        return len(self.code) - 1 # Where the argument is, for patching
+
+    def constant(self, value):
+        key = (type(value), value)
+        index = self.constant_index.get(key)
+        if index is None:
+            index = self.constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def patch(self, position):
+        """ Points the jump with its argument at position to here """
+        self.code[position] = len(self.code) - position - 1
+
+    def visit_Block(self, node):
+        for child in node.children:
+            if isinstance(child, (FuncDecl, Empty)):
+                continue
+            self.visit(child)
+            if isinstance(child, FuncCall): # What it returns is not used
+                self.emit(POP)
+
+    def visit_Number(self, node):
+        self.emit(CONST, self.constant(node.value))
+
+    def visit_String(self, node):
+        self.emit(CONST, self.constant(node.value))
+
+    def visit_Boolean(self, node):
+        self.emit(CONST, self.constant(node.value))
+
+    def visit_Variable(self, node):
+        if node.depth == 0:
+            self.emit(LOAD, FIRST_SLOT + node.slot)
+        else:
+            self.emit(LOAD_OUTER, self.constant((node.depth, FIRST_SLOT + node.slot)))
+
+    def visit_BinOp(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+        if node.type is None: # Types only known at run time
+            self.emit(CHECKED_BINOP, len(self.constants))
+            self.constants.append(node)
+        else:
+            self.emit(binary_opcodes[node.op.value])
+
+    def visit_UnaryOp(self, node):
+        self.visit(node.expr)
+        self.emit(NEGATIVE if node.op.value == '-' else POSITIVE)
+
+    def visit_Comparison(self, node):
+        self.visit(node.left)
+        if node.op is not None:
+            self.visit(node.right)
+            self.emit(comparison_opcodes[node.op.value])
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        self.emit(STORE, FIRST_SLOT + node.name.slot)
+
+    def visit_IfStatement(self, node):
+        self.visit(node.value)
+        to_else = self.emit(JUMP_IF_FALSE)
+        self.visit(node.block)
+        if node.elseblock is None:
+            self.patch(to_else)
+            return
+        to_end = self.emit(JUMP)
+        self.patch(to_else)
+        self.visit(node.elseblock)
+        self.patch(to_end)
+
+    def visit_Print(self, node):
+        for arg in node.args:
+            self.visit(arg)
+        self.emit(PRINT, len(node.args))
+
+    def visit_Returns(self, node):
+        for item in node.returns:
+            self.visit(item)
+        self.emit(RETURN, len(node.returns))
+
+    def visit_FuncCall(self, node):
+        for param in node.params:
+            self.visit(param)
+        func_symbol = node.func_symbol
+        index = self.function_index.get(id(func_symbol.block))
+        if index is None:
+            index = self.function_index[id(func_symbol.block)] = len(self.function_symbols)
+            self.function_symbols.append(func_symbol)
+        # Filled in once the function has been compiled
+        self.calls.append((
+            len(self.constants), index, len(node.params),
+            self.level - func_symbol.scope_level
+        ))
+        self.constants.append(None)
+        self.emit(CALL, len(self.constants) - 1)
+
+
+def compile_tree(tree):
+    return Compiler(tree).compile()
+
+
+#######################################
+# VM
+#######################################
+
+
+class VM(object):
+    def __init__(self, program):
+        self.program = program
+
+    def run(self):
+        program = self.program
+        code = program.code
+        constants = program.constants
+        checked_binop = Interpreter.checked_binop
+        print_args = Interpreter.print_args
+
+        frame = [None] * (FIRST_SLOT + program.nlocals)
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        calls = [] # (return address, frame) of the callers
+        pc = 0
+        while True:
+            op = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+            if op == LOAD:
+                push(frame[arg])
+            elif op == CONST:
+                push(constants[arg])
+            elif op == STORE:
+                frame[arg] = pop()
+            elif op == ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+            elif op == SUB:
+                right = pop()
+                stack[-1] = stack[-1] - right
+            elif op == MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+            elif op == JUMP_IF_FALSE:
+                if not pop():
+                    pc += arg
+            elif op == LOAD_OUTER:
+                depth, slot = constants[arg]
+                outer = frame
+                while depth:
+                    outer = outer[LINK]
+                    depth -= 1
+                push(outer[slot])
+            elif op == CALL:
+                start, size, nparams, hops = constants[arg]
+                new = [None] * size
+                link = frame
+                while hops:
+                    link = link[LINK]
+                    hops -= 1
+                new[LINK] = link
+                if nparams:
+                    new[FIRST_SLOT:FIRST_SLOT + nparams] = stack[-nparams:]
+                    del stack[-nparams:]
+                calls.append((pc, frame))
+                frame = new
+                pc = start
+            elif op == END:
+                returns = frame[RETURNS]
+                if returns is not None and len(returns) == 1:
+                    returns = returns[0]
+                push(returns)
+                pc, frame = calls.pop()
+            elif op == RETURN:
+                returns = stack[len(stack) - arg:]
+                del stack[len(stack) - arg:]
+                if not calls:
+                    raise Exception('Error: Invalid syntax')
+                frame[RETURNS] = returns
+            elif op == JUMP:
+                pc += arg
+            elif op == LESS:
+                right = pop()
+                stack[-1] = stack[-1] < right
+            elif op == LESS_EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] <= right
+            elif op == GREATER_EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] >= right
+            elif op == GREATER:
+                right = pop()
+                stack[-1] = stack[-1] > right
+            elif op == EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] == right
+            elif op == DIV:
+                right = pop()
+                stack[-1] = stack[-1] / right
+            elif op == CHECKED_BINOP:
+                right = pop()
+                stack[-1] = checked_binop(constants[arg], stack[-1], right)
+            elif op == NEGATIVE:
+                stack[-1] = -stack[-1]
+            elif op == POSITIVE:
+                stack[-1] = +stack[-1]
+            elif op == PRINT:
+                args = stack[len(stack) - arg:]
+                del stack[len(stack) - arg:]
+                print_args(args)
+            elif op == POP:
+                pop()
+            elif op == HALT:
+                return 'success'
+            else:
+                raise Exception('Error: Unknown opcode {}'.format(op))
+
+
+#######################################
+# DISASSEMBLER
+#######################################
+
+
+def disassemble(program):
+    """ Readable listing of a program, one instruction per line """
+    lines = []
+    code = program.code
+    for pc in range(0, len(code), 2):
+        if pc in program.functions:
+            lines.append('')
+            lines.append('function {}:'.format(program.functions[pc]))
+        op = code[pc]
+        arg = code[pc + 1]
+        name = opnames[op]
+        if op in (CONST, LOAD_OUTER):
+            detail = repr(program.constants[arg])
+        elif op in (LOAD, STORE):
+            detail = 'slot {}'.format(arg - FIRST_SLOT)
+        elif op == CHECKED_BINOP:
+            detail = program.constants[arg].op.value
+        elif op in (JUMP, JUMP_IF_FALSE):
+            detail = 'to {}'.format(pc + 2 + arg)
+        elif op == CALL:
+            start = program.constants[arg][0]
+            detail = program.functions[start]
+        elif op in (PRINT, RETURN):
+            detail = '{} values'.format(arg)
+        else:
+            lines.append('{:>6} {}'.format(pc, name))
+            continue
+        lines.append('{:>6} {:<14} {:>4} ({})'.format(pc, name, arg, detail))
+    return '\n'.join(lines)
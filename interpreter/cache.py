@@ -0,0 +1,109 @@
+import hashlib
+import sys
+from collections import OrderedDict
+from threading import Lock
+
+from .ast import AST, fields
+from .lexer import Token
+from .semantic_analyser import FunctionSymbol
+
+#######################################
+#######################################
+# PROGRAM CACHE
+#######################################
+#######################################
+
+# 32 MB of trees
+MAX_BYTES = 32 * 1024 * 1024
+
+
+def source_key(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+# Rough memory use of a tree: its nodes, child lists, tokens and the
+# function blocks calls run, which need not be in the tree after
+# optimising. Walks without recursion.
+def tree_size(tree):
+    size = 0
+    seen = set()
+    stack = [tree]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, list):
+            size += sys.getsizeof(item)
+            stack.extend(item)
+        elif isinstance(item, AST): # Attributes are in __slots__
+            size += sys.getsizeof(item)
+            stack.extend(value for _, value in fields(item))
+        elif isinstance(item, Token):
+            size += sys.getsizeof(item) + sys.getsizeof(vars(item))
+        elif isinstance(item, FunctionSymbol):
+            size += sys.getsizeof(item) + sys.getsizeof(vars(item))
+            stack.append(item.block)
+    return size
+
+
+# LRU cache of analysed trees keyed by a hash of the source text.
+# Trees are shared between runs, so only trees nothing else will
+# analyse or edit again should be put in.
+class ProgramCache(object):
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # key -> (tree, size)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, text):
+        key = source_key(text)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, text, tree):
+        key = source_key(text)
+        size = tree_size(tree)
+        if size > self.max_bytes: # Would push everything else out
+            return
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self.entries[key] = (tree, size)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                _, (_, old_size) = self.entries.popitem(last=False)
+                self.size -= old_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,335 @@
+from functools import lru_cache
+
+from .ast import Number, String, Boolean, Variable, FuncDecl, Empty
+from .interpreter import NodeVisitor, Interpreter
+
+#######################################
+#######################################
+# CLOSURE COMPILER
+#######################################
+#######################################
+
+"""
+Turns an analysed tree into Python closures, each node becomes a
+function of the current frame that calls the closures of its children
+directly. Node types, operators, slots and call targets are all worked
+out once here instead of on every run of the node.
+
+A frame is a list: [access link, returns, slot 0, slot 1, ...], like
+an ActivationRecord of the tree walking Interpreter.
+"""
+
+LINK = 0
+RETURNS = 1
+FIRST_SLOT = 2
+
+
+def constant(value):
+    def run(frame):
+        return value
+    return run
+
+
+# Where an operand of an operation comes from: a closure of the frame,
+# a slot of the frame (a variable of the current scope) or a constant
+CLOSURE = 'closure'
+SLOT = 'slot'
+CONSTANT = 'constant'
+
+operand_source = {
+    CLOSURE: '{}(frame)',
+    SLOT: 'frame[{}]',
+    CONSTANT: '{}',
+}
+
+
+@lru_cache(maxsize=None)
+def operation(op, left_kind, right_kind):
+    """ Function that makes the closure of op on a left and a right
+        operand of the given kinds. Python runs op itself, the operands
+        are read in the closure without calling closures for them. """
+    source = (
+        'def make(left, right):\n'
+        '    def run(frame):\n'
+        '        return {} {} {}\n'
+        '    return run\n'
+    ).format(
+        operand_source[left_kind].format('left'), op, operand_source[right_kind].format('right')
+    )
+    namespace = {}
+    exec(source, namespace)
+    return namespace['make']
+
+
+def text(value):
+    """ Closure of what print_args prints for the value of the closure """
+    def run(frame):
+        result = value(frame)
+        if type(result) is list:
+            return ''.join([str(item) for item in result])
+        return str(result)
+    return run
+
+
+def slot_text(index):
+    def run(frame):
+        result = frame[index]
+        if type(result) is list:
+            return ''.join([str(item) for item in result])
+        return str(result)
+    return run
+
+
+def nothing(frame):
+    pass
+
+
+class ClosureCompiler(NodeVisitor):
+    def __init__(self, tree):
+        self.tree = tree
+        self.level = 1 # Scope level of the code being compiled
+        self.functions = {} # id of a function block -> [its closure]
+
+    def compile(self):
+        """ The program as a function that runs it """
+        body = self.visit(self.tree)
+        size = FIRST_SLOT + (self.tree.nlocals or 0)
+
+        def program():
+            body([None] * size)
+            return 'success'
+        return program
+
+    def function(self, func_symbol):
+        """ [closure] of the block of func_symbol, the closure is set
+            once the block is compiled so recursive calls can refer to it """
+        key = id(func_symbol.block)
+        holder = self.functions.get(key)
+        if holder is None:
+            holder = self.functions[key] = [None]
+            level = self.level
+            self.level = func_symbol.scope_level + 1
+            holder[0] = self.visit(func_symbol.block)
+            self.level = level
+        return holder
+
+    def visit_Block(self, node):
+        statements = [
+            self.visit(child) for child in node.children
+            if not isinstance(child, (FuncDecl, Empty))
+        ]
+        if not statements:
+            return nothing
+        if len(statements) == 1:
+            return statements[0]
+        if len(statements) == 2:
+            first, second = statements
+
+            def two_statements(frame):
+                first(frame)
+                second(frame)
+            return two_statements
+
+        def block(frame):
+            for statement in statements:
+                statement(frame)
+        return block
+
+    def visit_Number(self, node):
+        return constant(node.value)
+
+    def visit_String(self, node):
+        return constant(node.value)
+
+    def visit_Boolean(self, node):
+        return constant(node.value)
+
+    def visit_Variable(self, node):
+        index = FIRST_SLOT + node.slot
+        depth = node.depth
+        if depth == 0:
+            def variable(frame):
+                return frame[index]
+        elif depth == 1:
+            def variable(frame):
+                return frame[LINK][index]
+        else:
+            def variable(frame):
+                for _ in range(depth):
+                    frame = frame[LINK]
+                return frame[index]
+        return variable
+
+    def operand(self, node):
+        """ (kind, closure, slot or value) of an operand, see operation """
+        if isinstance(node, (Number, String, Boolean)):
+            return CONSTANT, node.value
+        if isinstance(node, Variable) and node.depth == 0:
+            return SLOT, FIRST_SLOT + node.slot
+        return CLOSURE, self.visit(node)
+
+    def operation(self, node):
+        left_kind, left = self.operand(node.left)
+        right_kind, right = self.operand(node.right)
+        return operation(node.op.value, left_kind, right_kind)(left, right)
+
+    def visit_BinOp(self, node):
+        if node.type is None: # Types only known at run time
+            left = self.visit(node.left)
+            right = self.visit(node.right)
+            checked_binop = Interpreter.checked_binop
+
+            def checked(frame):
+                return checked_binop(node, left(frame), right(frame))
+            return checked
+        return self.operation(node)
+
+    def visit_UnaryOp(self, node):
+        expr = self.visit(node.expr)
+        if node.op.value == '-':
+            def negative(frame):
+                return -expr(frame)
+            return negative
+
+        def positive(frame):
+            return +expr(frame)
+        return positive
+
+    def visit_Comparison(self, node):
+        if node.op is None: # Condition with just a value
+            return self.visit(node.left)
+        return self.operation(node)
+
+    def visit_Assign(self, node):
+        index = FIRST_SLOT + node.name.slot
+        kind, value = self.operand(node.value)
+        if kind == SLOT:
+            def copy_slot(frame):
+                frame[index] = frame[value]
+            return copy_slot
+        if kind == CONSTANT:
+            def assign_constant(frame):
+                frame[index] = value
+            return assign_constant
+
+        def assign(frame):
+            frame[index] = value(frame)
+        return assign
+
+    def visit_IfStatement(self, node):
+        condition = self.visit(node.value)
+        block = self.visit(node.block)
+        if node.elseblock is None:
+            def if_statement(frame):
+                if condition(frame):
+                    block(frame)
+            return if_statement
+
+        elseblock = self.visit(node.elseblock)
+
+        def if_else(frame):
+            if condition(frame):
+                block(frame)
+            else:
+                elseblock(frame)
+        return if_else
+
+    def visit_Print(self, node):
+        # Closures of the text of each arg, like print_args makes it
+        texts = []
+        for arg in node.args:
+            kind, value = self.operand(arg)
+            if kind == CONSTANT:
+                texts.append(constant(str(value)))
+            elif kind == SLOT:
+                texts.append(slot_text(value))
+            else:
+                texts.append(text(value))
+        if len(texts) == 1:
+            only = texts[0]
+
+            def print_one(frame):
+                print(only(frame))
+            return print_one
+
+        def print_statement(frame):
+            print(''.join([arg_text(frame) for arg_text in texts]))
+        return print_statement
+
+    def visit_Returns(self, node):
+        returns = [self.visit(item) for item in node.returns]
+        if self.level == 1:
+            def global_returns(frame):
+                [item(frame) for item in returns]
+                raise Exception('Error: Invalid syntax')
+            return global_returns
+
+        if len(returns) == 1:
+            item = returns[0]
+
+            def set_return(frame):
+                frame[RETURNS] = [item(frame)]
+            return set_return
+
+        def set_returns(frame):
+            frame[RETURNS] = [item(frame) for item in returns]
+        return set_returns
+
+    def visit_FuncCall(self, node):
+        func_symbol = node.func_symbol
+        args = [self.visit(param) for param in node.params]
+        body = self.function(func_symbol)
+        size = FIRST_SLOT + func_symbol.nlocals
+        # Scopes between the caller and where the function was declared
+        hops = self.level - func_symbol.scope_level
+        end = FIRST_SLOT + len(args)
+
+        if hops == 0: # Declared in the scope of the caller, which is the link
+            # Slots of the new frame after the params
+            rest = (None,) * (func_symbol.nlocals - len(args))
+            if len(args) == 1:
+                arg = args[0]
+
+                def call_one(frame):
+                    new = [frame, None, arg(frame), *rest]
+                    body[0](new)
+                    returns = new[RETURNS]
+                    if returns is not None and len(returns) == 1:
+                        return returns[0]
+                    return returns
+                return call_one
+            if len(args) == 2:
+                first, second = args
+
+                def call_two(frame):
+                    new = [frame, None, first(frame), second(frame), *rest]
+                    body[0](new)
+                    returns = new[RETURNS]
+                    if returns is not None and len(returns) == 1:
+                        return returns[0]
+                    return returns
+                return call_two
+
+            def call_here(frame):
+                new = [frame, None, *[arg(frame) for arg in args], *rest]
+                body[0](new)
+                returns = new[RETURNS]
+                if returns is not None and len(returns) == 1:
+                    return returns[0]
+                return returns
+            return call_here
+
+        def call(frame):
+            values = [arg(frame) for arg in args]
+            link = frame
+            for _ in range(hops):
+                link = link[LINK]
+            new = [None] * size
+            new[LINK] = link
+            new[FIRST_SLOT:end] = values
+            body[0](new)
+            returns = new[RETURNS]
+            if returns is not None and len(returns) == 1:
+                return returns[0]
+            return returns
+        return call
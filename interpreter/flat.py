@@ -0,0 +1,311 @@
+from array import array
+
+from . import ast
+from .lexer import Token
+
+#######################################
+#######################################
+# FLAT AST
+#######################################
+#######################################
+
+"""
+A tree kept in parallel arrays instead of node objects. Node i has
+kind kinds[i] and up to COLUMNS ints in columns[0][i] ... columns[-1][i],
+what they mean depends on the kind (see layouts):
+    NODE   index of the child node, -1 for None
+    LIST   two columns, start and count of the items of the list in
+           items, which holds node indices. Count -1 is None
+    CONST  index into constants, the pool of values and tokens
+
+The Parser writes the rows itself (Parser.parse_flat), a node gets its
+row once its children have theirs, so the root comes last. Shared
+literal nodes have one row that every parent points to.
+
+FlatSemanticAnalyzer keeps what it works out in the info columns, see
+info_layouts, and the function symbols in symbols. FlatInterpreter
+runs the analysed arrays.
+"""
+
+NODE = 0
+LIST = 1
+CONST = 2
+
+# Node class -> its fields in column order
+layouts = {
+    'Block': (('children', LIST),),
+    'Number': (('value', CONST),),
+    'Boolean': (('value', CONST),),
+    'String': (('value', CONST),),
+    'Variable': (('value', CONST),),
+    'Value': (('value', CONST),),
+    'BinOp': (('left', NODE), ('op', CONST), ('right', NODE)),
+    'Comparison': (('left', NODE), ('op', CONST), ('right', NODE)),
+    'UnaryOp': (('op', CONST), ('expr', NODE)),
+    'Assign': (('name', NODE), ('type', CONST), ('value', NODE)),
+    'Print': (('args', LIST),),
+    'IfStatement': (('value', NODE), ('block', NODE), ('elseblock', NODE)),
+    'Param': (('var_node', NODE), ('type_node', CONST)),
+    'FuncDecl': (
+        ('func_name', NODE), ('formal_params', LIST),
+        ('block_node', NODE), ('returns', LIST)
+    ),
+    'FuncCall': (('func_name', CONST), ('params', LIST)),
+    'Returns': (('returns', LIST),),
+    'Empty': (),
+}
+kind_names = sorted(layouts)
+kind_codes = {name: code for code, name in enumerate(kind_names)}
+node_classes = [getattr(ast, name) for name in kind_names]
+COLUMNS = 6
+# Node class -> (kind code, layout)
+plans = {cls: (kind_codes[cls.__name__], layouts[cls.__name__]) for cls in node_classes}
+padding = (-1,) * COLUMNS
+# Fields the semantic analyser fills in, not stored in the columns
+analysis_fields = {
+    ast.Block: ('nlocals',),
+    ast.BinOp: ('type',),
+    ast.Comparison: ('type',),
+    ast.Variable: ('depth', 'slot'),
+    ast.FuncCall: ('scope_level', 'func_symbol', 'tail'),
+}
+# What FlatSemanticAnalyzer keeps in the two info columns. type is the
+# constant index of the type name, func_symbol an index into symbols
+info_layouts = {
+    'BinOp': ('type',),
+    'Comparison': ('type',),
+    'Variable': ('depth', 'slot'),
+    'FuncCall': ('func_symbol', 'tail'),
+}
+
+(BLOCK, NUMBER, BOOLEAN, STRING, VARIABLE, BINOP, COMPARISON, UNARYOP, ASSIGN,
+ PRINT, IFSTATEMENT, PARAM, FUNCDECL, FUNCCALL, RETURNS, EMPTY) = (
+    kind_codes[name] for name in (
+        'Block', 'Number', 'Boolean', 'String', 'Variable', 'BinOp', 'Comparison',
+        'UnaryOp', 'Assign', 'Print', 'IfStatement', 'Param', 'FuncDecl',
+        'FuncCall', 'Returns', 'Empty'
+    )
+)
+
+
+def kind_table(cls, prefix='flat_'):
+    """ Kind code -> the function of cls named prefix + the kind name,
+        for walkers of a FlatTree to look methods up by kinds[index] """
+    return [getattr(cls, prefix + name, None) for name in kind_names]
+
+
+class FlatTree(object):
+    def __init__(self):
+        self.kinds = array('B')
+        self.columns = tuple(array('i') for _ in range(COLUMNS))
+        self.items = array('i')
+        self.constants = []
+        self.constant_index = {}
+        self.root = -1
+        # Set by FlatSemanticAnalyzer
+        self.info = None
+        self.symbols = []
+        self.nlocals = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def kind(self, index):
+        return kind_names[self.kinds[index]]
+
+    def field(self, index, name):
+        """ Value of one field of node index, nodes
+            as indices and lists as lists of them """
+        column = 0
+        for field, field_type in layouts[self.kind(index)]:
+            value = self.columns[column][index]
+            if field_type == LIST:
+                count = self.columns[column + 1][index]
+                value = None if count < 0 else self.items[value:value + count].tolist()
+                column += 2
+            else:
+                if field_type == CONST:
+                    value = self.constants[value]
+                elif value < 0:
+                    value = None
+                column += 1
+            if field == name:
+                return value
+        raise Exception('No field {} on {}'.format(name, self.kind(index)))
+
+    def to_tree(self):
+        """ New tree of ast nodes """
+        return unflatten(self)
+
+    def constant(self, value):
+        # Tokens and values are pooled, equal ones share a slot
+        if isinstance(value, Token):
+            key = (Token, value.type, type(value.value), value.value)
+        else:
+            key = (type(value), value)
+        index = self.constant_index.get(key)
+        if index is None:
+            index = self.constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+
+# Makes the nodes of the Parser as rows of a FlatTree, a node is the
+# index of its row. Rows are kept in one list, kind and COLUMNS values
+# each, until finish makes the arrays.
+class FlatBuilder(object):
+    width = COLUMNS + 1
+
+    def __init__(self):
+        self.flat = FlatTree()
+        self.data = []
+        self.count = 0
+        self.constant = self.flat.constant
+
+    def add(self, row):
+        self.data.extend(row)
+        self.count += 1
+        return self.count - 1
+
+    def items(self, nodes):
+        """ start and count columns of a list of nodes """
+        items = self.flat.items
+        start = len(items)
+        items.extend(nodes)
+        return start, len(nodes)
+
+    def literal(self, node_class, token):
+        return self.add((kind_codes[node_class.__name__], self.constant(token.value)) + padding[1:])
+
+    def operation(self, node_class, left, op, right):
+        kind = COMPARISON if node_class is ast.Comparison else BINOP
+        return self.add((kind, left, self.constant(op), right, -1, -1, -1))
+
+    def unary(self, op, expr):
+        return self.add((UNARYOP, self.constant(op), expr, -1, -1, -1, -1))
+
+    def condition(self, left):
+        """ Comparison of just a value """
+        return self.add((COMPARISON, left, self.constant(None), -1, -1, -1, -1))
+
+    def is_comparison(self, node):
+        return self.data[node * self.width] == COMPARISON
+
+    def variable(self, token):
+        return self.add((VARIABLE, self.constant(token.value)) + padding[1:])
+
+    def call(self, token, params):
+        return self.add((FUNCCALL, self.constant(token.value)) + self.items(params) + padding[3:])
+
+    def param(self, var_node, type_token):
+        return self.add((PARAM, var_node, self.constant(type_token)) + padding[2:])
+
+    def function(self, name, params, block, returns):
+        returns = (-1, -1) if returns is None else self.items(returns)
+        return self.add((FUNCDECL, name) + self.items(params) + (block,) + returns)
+
+    def returns(self, values):
+        return self.add((RETURNS,) + self.items(values) + padding[2:])
+
+    def ifelse(self, condition, block, elseblock):
+        if elseblock is None:
+            elseblock = -1
+        return self.add((IFSTATEMENT, condition, block, elseblock, -1, -1, -1))
+
+    def print(self, args):
+        return self.add((PRINT,) + self.items(args) + padding[2:])
+
+    def assign(self, name, type_token, value):
+        return self.add((ASSIGN, name, self.constant(type_token), value, -1, -1, -1))
+
+    def block(self, children):
+        return self.add((BLOCK,) + self.items(children) + padding[2:])
+
+    def empty(self):
+        return self.add((EMPTY,) + padding)
+
+    def finish(self, root):
+        flat = self.flat
+        data = self.data
+        width = self.width
+        flat.root = root
+        flat.kinds = array('B', data[0::width])
+        flat.columns = tuple(array('i', data[column::width]) for column in range(1, width))
+        self.data = []
+        return flat
+
+
+def flatten(tree):
+    """ Tree of ast nodes -> FlatTree, nodes that are
+        shared in the tree share a row """
+    builder = FlatBuilder()
+    constant = builder.constant
+    rows = {} # id of a node -> its row
+    # (node, True) once its children have rows
+    stack = [(tree, False)]
+    while stack:
+        node, ready = stack.pop()
+        if id(node) in rows:
+            continue
+        plan = plans.get(type(node))
+        if plan is None:
+            raise Exception('Error: Can not flatten {}'.format(type(node).__name__))
+        kind, layout = plan
+        if not ready:
+            stack.append((node, True))
+            for field, field_type in layout:
+                value = getattr(node, field)
+                if value is None or field_type == CONST:
+                    continue
+                if field_type == NODE:
+                    value = [value]
+                stack.extend((child, False) for child in reversed(value))
+            continue
+
+        row = [kind]
+        for field, field_type in layout:
+            value = getattr(node, field)
+            if field_type == CONST:
+                row.append(constant(value))
+            elif value is None:
+                row.append(-1)
+                if field_type == LIST:
+                    row.append(-1)
+            elif field_type == NODE:
+                row.append(rows[id(value)])
+            else:
+                row.extend(builder.items([rows[id(child)] for child in value]))
+        row.extend(padding[len(row) - 1:])
+        rows[id(node)] = builder.add(row)
+    return builder.finish(rows[id(tree)])
+
+
+def unflatten(flat):
+    """ FlatTree -> tree of ast nodes """
+    # Create every node first, then set the fields, so the
+    # order of the rows does not matter and nothing recurses
+    new = object.__new__
+    nodes = [new(node_classes[kind]) for kind in flat.kinds]
+    constants = flat.constants
+    columns = flat.columns
+    items = flat.items
+    for index, node in enumerate(nodes):
+        column = 0
+        for field, field_type in layouts[kind_names[flat.kinds[index]]]:
+            value = columns[column][index]
+            if field_type == CONST:
+                setattr(node, field, constants[value])
+                column += 1
+            elif field_type == NODE:
+                setattr(node, field, nodes[value] if value >= 0 else None)
+                column += 1
+            else:
+                count = columns[column + 1][index]
+                setattr(node, field, [
+                    nodes[item] for item in items[value:value + count]
+                ] if count >= 0 else None)
+                column += 2
+        for field in analysis_fields.get(type(node), ()):
+            setattr(node, field, None)
+
+    return nodes[flat.root]
@@ -0,0 +1,133 @@
+from bisect import bisect_left, bisect_right
+
+from .ast import (
+    Block,
+    IfStatement,
+    FuncDecl
+)
+from .lexer import RegexLexer, Token, master_pattern
+from .parser import Parser
+
+#######################################
+#######################################
+# INCREMENTAL FRONT END
+#######################################
+#######################################
+
+
+# RegexLexer that also remembers where the last token started
+class SpanLexer(RegexLexer):
+    def __init__(self, text, pos=0):
+        super(SpanLexer, self).__init__(text, pos)
+        self.token_start = pos
+
+    def tokens(self):
+        for match in master_pattern.finditer(self.text, self.pos):
+            kind = match.lastgroup
+            if kind == 'END':
+                break
+            self.token_start = match.start(kind)
+            self.pos = match.end()
+            yield self.match_token(kind, match.group(kind))
+
+        self.token_start = self.pos = len(self.text)
+        while True:
+            yield Token('EOF', None)
+
+
+# One top level statement, start is the offset of its first token
+class Segment(object):
+    def __init__(self, start, node):
+        self.start = start
+        self.node = node
+
+
+# Keeps the top level statements of a program between edits. An edit
+# re-lexes and re-parses from the statement before the damaged one
+# until the token stream lines up with an old statement boundary
+# again, everything after that is reused as it is.
+class IncrementalParser(object):
+    def __init__(self, text=''):
+        self.text = ''
+        self.segments = []
+        self.tree = Block()
+        self.edit(0, 0, text)
+
+    def parse(self):
+        return self.tree
+
+    def update(self, text):
+        # Work out the edit range from the previous text
+        old = self.text
+        prefix = common_prefix(old, text)
+        suffix = common_suffix(old[prefix:], text[prefix:])
+        return self.edit(prefix, len(old) - suffix, text[prefix:len(text) - suffix])
+
+    def edit(self, start, end, new_text):
+        """ Replace text[start:end] with new_text """
+        delta = len(new_text) - (end - start)
+        text = self.text[:start] + new_text + self.text[end:]
+        edit_end = start + len(new_text)
+
+        segments = self.segments
+        starts = [segment.start for segment in segments]
+
+        # Statement before the one that holds the edit, its parse
+        # can depend on the first token of the next statement
+        first = max(bisect_right(starts, start) - 2, 0)
+        pos = starts[first] if first > 0 else 0
+
+        lexer = SpanLexer(text, pos)
+        parser = Parser(lexer)
+        new_segments = []
+        reused = []
+
+        # Same loop as Parser.statement_list
+        while True:
+            position = lexer.token_start
+            # With tokens waiting in the lookahead buffer token_start
+            # is not where curr_token starts, do not sync there
+            if position >= edit_end and not parser.count:
+                index = bisect_left(starts, position - delta, first)
+                if index < len(starts) and starts[index] == position - delta:
+                    reused = segments[index:]
+                    break
+
+            node = parser.statement()
+            new_segments.append(Segment(position, node))
+            if isinstance(node, IfStatement) or isinstance(node, FuncDecl):
+                continue
+            elif parser.curr_token.type != 'SCOLON':
+                break
+            else:
+                parser.eat('SCOLON')
+
+        for segment in reused:
+            segment.start += delta
+
+        self.text = text
+        self.segments = segments[:first] + new_segments + reused
+        self.tree.children = [segment.node for segment in self.segments]
+        return self.tree
+
+
+def common_prefix(a, b):
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix(a, b):
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
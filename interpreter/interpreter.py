@@ -1,26 +1,18 @@
-from semantic_analyser import (
+from .semantic_analyser import (
     BuiltinTypeSymbol,
     VariableSymbol,
     FunctionSymbol,
     SymbolTable,
     Symbol
 )
+from .flat import kind_table
+from .trampoline import MAX_DEPTH, STEP_BYTES, run
+from .visitor import NodeVisitor
 from enum import Enum
-
-################################
-# NODE VISITOR
-################################
-
-
-class NodeVisitor(object):
-    def visit(self, node):
-        method_name = 'visit_' + type(node).__name__
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
-
-    def generic_visit(self, node):
-        raise Exception('No visit_{} method'.format(type(node).__name__))
-
+from itertools import repeat
+import operator
+import struct
+import sys
 
 ################################
 # Call Stack
@@ -30,32 +22,46 @@ class NodeVisitor(object):
 class CallStack(object):
     def __init__(self):
         self.items = []
+        self.bytes = 0 # Held by the records, see record_bytes
 
     def push(self, item):
         self.items.append(item)
+        self.bytes += record_bytes(item)
     
     def pop(self):
-        self.items.pop()
+        self.bytes -= record_bytes(self.items.pop())
     
     def peek(self):
         return self.items[-1] # See what is at the top of the stack
 
 
 class ActivationRecord:
-    def __init__(self, name, type, scope_level):
+    __slots__ = ('name', 'type', 'scope_level', 'slots', 'access_link', 'returns')
+
+    def __init__(self, name, type, scope_level, nlocals, access_link=None):
         self.name = name # Function name
         self.type = type
         self.scope_level = scope_level
-        self.members = {} # Holds data about variables and such
+        # Variables by the slot the semantic analyser gave them
+        self.slots = [None] * nlocals
+        # Record of the scope the function was declared in
+        self.access_link = access_link
+        self.returns = None
+
+    def __setitem__(self, slot, value):
+        self.slots[slot] = value
+
+    def __getitem__(self, slot):
+        return self.slots[slot]
 
-    def __setitem__(self, key, value):
-        self.members[key] = value
 
-    def __getitem__(self, key):
-        return self.members[key]
+# Memory of a record and its slot list, not of the values in them
+RECORD_BYTES = sys.getsizeof(ActivationRecord('', None, 0, 0)) + sys.getsizeof([])
+SLOT_BYTES = struct.calcsize('P')
 
-    def get(self, key):
-        return self.members.get(key)
+
+def record_bytes(ar):
+    return RECORD_BYTES + SLOT_BYTES * len(ar.slots)
 
 
 class ARType(Enum):
@@ -75,24 +81,63 @@ AR Types: <- str
 # INTERPRETER
 ################################
 
+# Operators on values the semantic analyser already checked
+operations = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+}
+comparisons = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    '>': operator.gt,
+    '==': operator.eq,
+}
+
 
 class Interpreter(NodeVisitor):
+    # Keep the records of finished calls to use for the next
+    # calls of the same function, at most this many per function
+    pool_size = 256
+
     def __init__(self, tree):
         self.tree = tree
+        self.root = tree # What interpret visits
         self.call_stack = None
+        self.pools = {} # Function block -> free records
+        self.allocated = 0 # Records created for calls
+        self.tail_args = None # Args of a tail call to run next
     
-    def interpret(self):
+    def interpret(self, engine='tree'):
+        if engine == 'closures': # Compiles the tree to closures and runs those
+            from .closures import ClosureCompiler
+            return ClosureCompiler(self.tree).compile()()
+        if engine == 'bytecode': # Compiles the tree to bytecode for the VM
+            from .bytecode import compile_tree
+            return compile_tree(self.tree).run()
+        if engine == 'python': # Transpiles the tree for CPython to run
+            from .transpiler import transpile
+            return transpile(self.tree).run()
+        if engine == 'registers': # Compiles the tree for the register VM
+            from .registers import compile_registers
+            return compile_registers(self.tree).run()
+        if engine != 'tree':
+            raise Exception('Unknown engine {}'.format(engine))
+
         if self.call_stack is None: # Create a global scope
             self.call_stack = CallStack()
             ar = ActivationRecord(
                 name='global',
                 type=ARType.GLOBAL,
                 scope_level=1,
+                nlocals=self.tree.nlocals,
             )
             self.call_stack.push(ar)
 
         try:
-            self.visit(self.tree)
+            self.visit(self.root)
             self.call_stack.pop()
             return 'success'
         except Exception as exc:
@@ -104,29 +149,41 @@ class Interpreter(NodeVisitor):
             self.visit(child)
 
     def visit_BinOp(self, node):
-        left = self.visit(node.left)
-        right = self.visit(node.right)
+        return self.binop(node, self.visit(node.left), self.visit(node.right))
+
+    def binop(self, node, left, right):
+        if node.type is None:
+            return self.checked_binop(node, left, right)
+        return operations[node.op.value](left, right)
+
+    # For operands whose types are only known at run time
+    @staticmethod
+    def checked_binop(node, left, right):
+        return Interpreter.checked_operation(node.op.value, left, right)
+
+    @staticmethod
+    def checked_operation(op, left, right):
         if (isinstance(type(left), bool) or isinstance(type(right), bool)) or (
             type(left) != type(right)
         ):
             raise Exception("Error: Can not run {} operation on types {} and {}".format(
-                    node.op.value, type(left).__name__, type(right).__name__
+                    op, type(left).__name__, type(right).__name__
             ))
 
         if (type(left).__name__ != 'int' or type(right).__name__ != 'int') and (
-            node.op.value in ('*', '/') # Mult and Div only with numbers
+            op in ('*', '/') # Mult and Div only with numbers
         ):  
             raise Exception("Error: Can not run {} operation on types {} and {}".format(
-                    node.op.value, type(left).__name__, type(right).__name__
+                    op, type(left).__name__, type(right).__name__
             ))
 
-        if node.op.value == '+':
+        if op == '+':
             return left + right
-        elif node.op.value == '-':
+        elif op == '-':
             return left - right
-        elif node.op.value == '/':
+        elif op == '/':
             return left / right
-        elif node.op.value == '*':
+        elif op == '*':
             return left * right
     
     def visit_FuncDecl(self, node):
@@ -134,38 +191,90 @@ class Interpreter(NodeVisitor):
         pass 
 
     def visit_FuncCall(self, node):
-        func_name = node.func_name
+        args = [self.visit(param) for param in node.params]
+        if node.tail: # The call that is running does it
+            self.tail_args = args
+            return None
         func_symbol = node.func_symbol
+        self.enter_call(func_symbol, args)
 
-        ar = ActivationRecord(
-            name=func_name,
-            type=ARType.FUNCTION,
-            scope_level=func_symbol.scope_level + 1
-        )
-
-        formal_params = func_symbol.formal_params
-        actual_params = node.params
+        # Visit function block, again for every tail call
+        self.visit(func_symbol.block)
+        while self.tail_args is not None:
+            self.restart_call(func_symbol)
+            self.visit(func_symbol.block)
+
+        return self.leave_call(func_symbol)
+
+    def enter_call(self, func_symbol, args):
+        # The function sees the variables of the scope it was declared in
+        caller = self.call_stack.peek()
+        access_link = self.frame(caller.scope_level - func_symbol.scope_level)
+        pool = self.pools.get(func_symbol.block)
+        if pool:
+            ar = pool.pop()
+            ar.access_link = access_link
+            # Slots not set yet read as None, like in a new record
+            ar.slots[len(args):] = repeat(None, func_symbol.nlocals - len(args))
+        else:
+            ar = ActivationRecord(
+                name=func_symbol.name,
+                type=ARType.FUNCTION,
+                scope_level=func_symbol.scope_level + 1,
+                nlocals=func_symbol.nlocals,
+                access_link=access_link
+            )
+            self.allocated += 1
 
-        for f_param_symbol, a_param_node in zip(formal_params, actual_params):
-            ar.members[f_param_symbol.name] = self.visit(a_param_node)
+        # Params have the first slots
+        ar.slots[:len(args)] = args
 
         self.call_stack.push(ar)
 
-        # Visit function block
-        self.visit(func_symbol.block)
+    def restart_call(self, func_symbol):
+        """ Sets the record of the running call up for a tail call """
+        args = self.tail_args
+        self.tail_args = None
+        ar = self.call_stack.peek()
+        ar.slots[:len(args)] = args
+        ar.slots[len(args):] = repeat(None, func_symbol.nlocals - len(args))
+        ar.returns = None
 
+    def frame(self, depth):
+        """ Record depth access links out from the current one """
+        ar = self.call_stack.peek()
+        while depth:
+            ar = ar.access_link
+            depth -= 1
+        return ar
+
+    def leave_call(self, func_symbol):
         # check if function should return anything
         ar = self.call_stack.peek()
-        returns = ar['return']
+        returns = ar.returns
         if returns is not None and len(returns) == 1:
             returns = returns[0]
         
 
         self.call_stack.pop()
+        # Nothing points at the record once the call is over
+        pool = self.pools.setdefault(func_symbol.block, [])
+        if len(pool) < self.pool_size:
+            ar.returns = None
+            ar.access_link = None
+            pool.append(ar)
         return returns
 
 
     def visit_Returns(self, node):
+        returns = []
+        for item in node.returns:
+            value = self.visit(item)
+            returns.append(value)
+
+        self.set_returns(returns)
+
+    def set_returns(self, returns):
         ar = self.call_stack.peek()
 
         if ar.type == ARType.GLOBAL:
@@ -173,19 +282,16 @@ class Interpreter(NodeVisitor):
                 'Error: Invalid syntax'
             )
 
-        returns = []
-        for item in node.returns:
-            value = self.visit(item)
-            returns.append(value)
-
-        ar.members['return'] = returns
+        ar.returns = returns
 
 
     def visit_Assign(self, node):
-        var_name = node.name.value
         var_value = self.visit(node.value)
+        self.assign(node, var_value)
+
+    def assign(self, node, var_value):
         ar = self.call_stack.peek() # Save in ar at the top of the stack
-        ar.members[var_name] = var_value
+        ar.slots[node.name.slot] = var_value
 
     def visit_IfStatement(self, node): # Will not have separate AR
         if self.visit(node.value): # Check if block should run
@@ -195,32 +301,36 @@ class Interpreter(NodeVisitor):
                 self.visit(node.elseblock)
         
     def visit_Variable(self, node):
-        var_name = node.value
-        ar = self.call_stack.peek()
-        var_value = ar.get(var_name)
-        return var_value
+        if node.depth == 0:
+            return self.call_stack.peek().slots[node.slot]
+        return self.frame(node.depth).slots[node.slot]
 
     def visit_Comparison(self, node):
-        op = node.op.value
         left = self.visit(node.left)
+        if node.op is None: # Condition with just a value
+            return left
         right = self.visit(node.right)
+        return self.compare(node, left, right)
 
-        if op == '<':
-            return self.visit(node.left) < self.visit(node.right)
-        if op == '<=':
-            return self.visit(node.left) <= self.visit(node.right)
-        if op == '>=':
-            return self.visit(node.left) >= self.visit(node.right)
-        if op == '>':
-            return self.visit(node.left) > self.visit(node.right)
-        if op == '==':
-            return self.visit(node.left) == self.visit(node.right)
+    def compare(self, node, left, right):
+        return comparisons[node.op.value](left, right)
+
+    def visit_UnaryOp(self, node):
+        return self.unaryop(node, self.visit(node.expr))
+
+    def unaryop(self, node, value):
+        if node.op.value == '-':
+            return -value
+        return +value
 
     def visit_Print(self, node):
-        i = 0
+        args = [self.visit(arg) for arg in node.args]
+        self.print_args(args)
+
+    @staticmethod
+    def print_args(args):
         print_str = ''
-        while i <= len(node.args) - 1:
-            current_arg = self.visit(node.args[i])
+        for current_arg in args:
             if type(current_arg).__name__ == 'list':
                 for item in current_arg:
                     print_str += str(item)
@@ -228,8 +338,6 @@ class Interpreter(NodeVisitor):
             else:
                 print_str += str(current_arg)
 
-            i += 1
-
         print(print_str)
 
     def visit_Number(self, node):
@@ -246,11 +354,212 @@ class Interpreter(NodeVisitor):
         pass
 
 
+################################
+# EXPLICIT STACK INTERPRETER
+################################
+
+
+# Runs the same way as Interpreter, but nodes that nest yield their
+# children to trampoline.run and get the values sent back, so deep
+# nesting and deep recursion do not use the Python stack
+class StackInterpreter(Interpreter):
+    max_depth = MAX_DEPTH
+    # Bytes the suspended steps and the records of running calls can
+    # hold, None for no limit but max_depth
+    max_bytes = None
+
+    def visit(self, node):
+        max_depth = self.max_depth
+        if self.max_bytes is not None:
+            max_depth = self.max_bytes // STEP_BYTES
+        self.steps = []
+        return run(node, self.start, max_depth, self.steps)
+
+    def enter_call(self, func_symbol, args):
+        super(StackInterpreter, self).enter_call(func_symbol, args)
+        if self.max_bytes is not None and (
+            self.call_stack.bytes + len(self.steps) * STEP_BYTES > self.max_bytes
+        ):
+            raise Exception('Error: Calls need more than the memory budget of {} bytes'.format(
+                self.max_bytes
+            ))
+
+    def start(self, node):
+        return super(StackInterpreter, self).visit(node)
+
+    def visit_Block(self, node):
+        for child in node.children:
+            yield child
+
+    def visit_BinOp(self, node):
+        left = yield node.left
+        right = yield node.right
+        return self.binop(node, left, right)
+
+    def visit_UnaryOp(self, node):
+        value = yield node.expr
+        return self.unaryop(node, value)
+
+    def visit_Comparison(self, node):
+        left = yield node.left
+        if node.op is None:
+            return left
+        right = yield node.right
+        return self.compare(node, left, right)
+
+    def visit_FuncCall(self, node):
+        args = []
+        for param in node.params:
+            value = yield param
+            args.append(value)
+        if node.tail:
+            self.tail_args = args
+            return None
+        func_symbol = node.func_symbol
+        self.enter_call(func_symbol, args)
+        yield func_symbol.block
+        while self.tail_args is not None:
+            self.restart_call(func_symbol)
+            yield func_symbol.block
+        return self.leave_call(func_symbol)
 
+    def visit_Returns(self, node):
+        returns = []
+        for item in node.returns:
+            value = yield item
+            returns.append(value)
+        self.set_returns(returns)
 
+    def visit_Assign(self, node):
+        var_value = yield node.value
+        self.assign(node, var_value)
 
+    def visit_IfStatement(self, node):
+        condition = yield node.value
+        if condition:
+            yield node.block
+        elif node.elseblock is not None:
+            yield node.elseblock
 
+    def visit_Print(self, node):
+        args = []
+        for arg in node.args:
+            value = yield arg
+            args.append(value)
+        self.print_args(args)
 
 
+################################
+# FLAT TREE INTERPRETER
+################################
 
 
+# Runs a FlatTree the FlatSemanticAnalyzer analysed, the same way as
+# Interpreter runs the nodes, reading what the analyser worked out
+# from the info columns of the tree
+class FlatInterpreter(Interpreter):
+    def __init__(self, flat):
+        super(FlatInterpreter, self).__init__(flat)
+        self.root = flat.root
+        self.kinds = flat.kinds
+        self.columns = flat.columns
+        self.items = flat.items
+        self.constants = flat.constants
+        self.info = flat.info
+        self.symbols = flat.symbols
+        self.kind_methods = kind_table(type(self))
+
+    def interpret(self, engine='tree'):
+        if engine != 'tree': # The other engines compile ast nodes
+            raise Exception('Error: Flat trees only run with the tree engine')
+        return super(FlatInterpreter, self).interpret()
+
+    def visit(self, index):
+        return self.kind_methods[self.kinds[index]](self, index)
+
+    def list(self, index, column):
+        start = self.columns[column][index]
+        return self.items[start:start + self.columns[column + 1][index]]
+
+    def flat_Block(self, index):
+        for child in self.list(index, 0):
+            self.visit(child)
+
+    def flat_BinOp(self, index):
+        columns = self.columns
+        left = self.visit(columns[0][index])
+        right = self.visit(columns[2][index])
+        op = self.constants[columns[1][index]].value
+        if self.info[0][index] < 0:
+            return self.checked_operation(op, left, right)
+        return operations[op](left, right)
+
+    def flat_FuncDecl(self, index):
+        # Already handled in semantic analyser
+        pass
+
+    def flat_FuncCall(self, index):
+        args = [self.visit(param) for param in self.list(index, 1)]
+        symbols, tails = self.info
+        if tails[index]: # The call that is running does it
+            self.tail_args = args
+            return None
+        func_symbol = self.symbols[symbols[index]]
+        self.enter_call(func_symbol, args)
+
+        # Visit function block, again for every tail call
+        self.visit(func_symbol.block)
+        while self.tail_args is not None:
+            self.restart_call(func_symbol)
+            self.visit(func_symbol.block)
+
+        return self.leave_call(func_symbol)
+
+    def flat_Returns(self, index):
+        self.set_returns([self.visit(item) for item in self.list(index, 0)])
+
+    def flat_Assign(self, index):
+        columns = self.columns
+        var_value = self.visit(columns[2][index])
+        self.call_stack.peek().slots[self.info[1][columns[0][index]]] = var_value
+
+    def flat_IfStatement(self, index):
+        columns = self.columns
+        if self.visit(columns[0][index]):
+            self.visit(columns[1][index])
+        elif columns[2][index] >= 0:
+            self.visit(columns[2][index])
+
+    def flat_Variable(self, index):
+        depths, slots = self.info
+        if depths[index] == 0:
+            return self.call_stack.peek().slots[slots[index]]
+        return self.frame(depths[index]).slots[slots[index]]
+
+    def flat_Comparison(self, index):
+        columns = self.columns
+        left = self.visit(columns[0][index])
+        op = self.constants[columns[1][index]]
+        if op is None: # Condition with just a value
+            return left
+        return comparisons[op.value](left, self.visit(columns[2][index]))
+
+    def flat_UnaryOp(self, index):
+        columns = self.columns
+        value = self.visit(columns[1][index])
+        if self.constants[columns[0][index]].value == '-':
+            return -value
+        return +value
+
+    def flat_Print(self, index):
+        self.print_args([self.visit(arg) for arg in self.list(index, 0)])
+
+    def flat_Number(self, index):
+        return self.constants[self.columns[0][index]]
+
+    flat_String = flat_Number
+    flat_Boolean = flat_Number
+
+    def flat_Empty(self, index):
+        # Do nothing on empty statement
+        pass
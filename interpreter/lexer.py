@@ -1,3 +1,9 @@
+import codecs
+import os
+import re
+from array import array
+from enum import IntEnum
+
 #######################################
 #######################################
 # LEXER
@@ -55,6 +61,21 @@ reserved_names = {
 }
 
 
+# Token types that are not part of the tables above
+literal_types = ('INTEGER', 'FLOAT', 'STRING')
+
+
+# Small int for every token type, TokenBuffer stores these
+TokenKind = IntEnum('TokenKind', sorted(
+    set(symbols.values()) |
+    set(other_types.values()) |
+    set(reserved_names.values()) |
+    set(literal_types)
+))
+
+kind_names = {kind.value: kind.name for kind in TokenKind}
+
+
 class Token(object):
     def __init__(self, token_type, value):
         self.value = value
@@ -77,7 +98,7 @@ class Lexer(object):
     def __init__(self, text):
         self.text = text
         self.pos = 0
-        self.current_char = self.text[self.pos]
+        self.current_char = self.text[self.pos] if self.text else None
 
     def error(self):
         raise Exception('SyntaxError: Invalid syntax')
@@ -271,3 +292,309 @@ class Lexer(object):
         # Advance for the closing tag
         self.advance()
         return Token('STRING', string)
+
+
+#######################################
+# REGEX LEXER
+#######################################
+
+# One master pattern built from the tables above. Whitespace and
+# comments are swallowed in front of every match, longer symbols go
+# first so '==' wins over '='
+def _build_master_pattern():
+    ordered = sorted(
+        (char for char in symbols if char != 'EOF'),
+        key=len,
+        reverse=True
+    )
+    # Unrolled /* ... */ so a comment can never swallow a '*/'
+    comment = r'/\*[^*]*\*+(?:[^/*][^*]*\*+)*/'
+    parts = [
+        r'(?P<NAME>[^\W\d_][^\W\d]*)',
+        r'(?P<NUMBER>\d[\d.]*)',
+        r'(?P<STRING>"[^"]*"|\'[^\']*\')',
+        # Unterminated comments
+        r'(?P<ERROR>/\*)',
+        '(?P<SYMBOL>{})'.format('|'.join(re.escape(char) for char in ordered)),
+        r'(?P<INVALID>\S)',
+        # Only whitespace and comments left
+        r'(?P<END>\Z)',
+    ]
+    return re.compile(r'\s*(?:{}\s*)*(?:{})'.format(comment, '|'.join(parts)))
+
+
+master_pattern = _build_master_pattern()
+
+# Reserved names whose token value is not the name itself
+reserved_values = {
+    'True': True,
+    'False': False
+}
+
+
+# Emits the same tokens as Lexer but scans the text with one
+# compiled pattern instead of walking it char by char
+class RegexLexer(Lexer):
+    def __init__(self, text, pos=0):
+        self.text = text
+        self.pos = pos
+        self._tokens = self.tokens()
+
+    # Same attribute as Lexer.current_char,
+    # worked out from pos only when asked
+    @property
+    def current_char(self):
+        if self.pos < len(self.text):
+            return self.text[self.pos]
+        return None
+
+    def get_next_token(self):
+        return next(self._tokens)
+
+    def match_token(self, kind, value):
+        if kind == 'NAME':
+            token_type = reserved_names.get(value)
+            if token_type is None:
+                return Token('NAME', value)
+            return Token(token_type, reserved_values.get(value, value))
+        if kind == 'SYMBOL':
+            return Token(symbols[value], value)
+        if kind == 'NUMBER':
+            if '.' in value:
+                return Token('FLOAT', float(value))
+            return Token('INTEGER', int(value))
+        if kind == 'STRING':
+            return Token('STRING', value[1:-1])
+        self.error()
+
+    def tokens(self):
+        for match in master_pattern.finditer(self.text, self.pos):
+            kind = match.lastgroup
+            if kind == 'END':
+                break
+            self.pos = match.end()
+            yield self.match_token(kind, match.group(kind))
+
+        self.pos = len(self.text)
+        while True:
+            yield Token('EOF', None)
+
+
+#######################################
+# STREAM LEXER
+#######################################
+
+# Lexes a file path, a mmap or anything with a read() method (returning
+# str or bytes) chunk by chunk. Only a window of the source is held in
+# memory, a token is taken from it once it can not grow any further.
+class StreamLexer(RegexLexer):
+    def __init__(self, source, chunk_size=64 * 1024):
+        self.chunk_size = chunk_size
+        self.owns_reader = isinstance(source, (str, os.PathLike))
+        if self.owns_reader:
+            source = open(source, encoding='utf-8')
+        self.reader = source
+        self.decoder = None
+        self.window = ''
+        self.window_start = 0 # Absolute position of window[0]
+        self.offset = 0 # Position inside the window
+        self.done = False
+        self._tokens = self.tokens()
+
+    @property
+    def pos(self):
+        return self.window_start + self.offset
+
+    @property
+    def current_char(self):
+        if self.offset >= len(self.window) and not self.done:
+            self.read_chunk()
+        if self.offset < len(self.window):
+            return self.window[self.offset]
+        return None
+
+    def read_chunk(self):
+        chunk = self.reader.read(self.chunk_size)
+        if isinstance(chunk, bytes):
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder('utf-8')()
+            # A chunk can end in the middle of a multi byte char
+            raw = chunk
+            chunk = self.decoder.decode(raw, final=not raw)
+            while raw and not chunk:
+                raw = self.reader.read(self.chunk_size)
+                chunk = self.decoder.decode(raw, final=not raw)
+
+        if not chunk:
+            self.done = True
+            if self.owns_reader:
+                self.reader.close()
+
+        # Drop the consumed part of the window
+        self.window = self.window[self.offset:] + chunk
+        self.window_start += self.offset
+        self.offset = 0
+
+    # A match can only be trusted if more text could not change it
+    def needs_more(self, match):
+        if self.done:
+            return False
+        if match.end() == len(self.window):
+            return True
+        kind = match.lastgroup
+        # Comment or string that goes past the end of the window
+        return kind == 'ERROR' or (
+            kind == 'INVALID' and match.group(kind) in '"\''
+        )
+
+    def tokens(self):
+        while True:
+            match = master_pattern.match(self.window, self.offset)
+            if self.needs_more(match):
+                self.read_chunk()
+                continue
+            kind = match.lastgroup
+            if kind == 'END':
+                break
+            self.offset = match.end()
+            yield self.match_token(kind, match.group(kind))
+
+        while True:
+            yield Token('EOF', None)
+
+
+#######################################
+# TOKEN BUFFER
+#######################################
+
+# Kinds whose tokens always have the same value share one Token, the
+# parser only reads tokens and nodes keep them as they are
+def _build_fixed_tokens():
+    names = list(reserved_names.values())
+    tokens = {TokenKind.EOF: Token('EOF', None)}
+    for text, token_type in list(symbols.items()) + list(reserved_names.items()):
+        if text != 'EOF' and names.count(token_type) < 2: # Not TYPE or BOOL
+            tokens[TokenKind[token_type]] = Token(token_type, text)
+    return tokens
+
+
+fixed_tokens = _build_fixed_tokens()
+
+
+# Holds the whole token stream in three array columns: kind, start and
+# end offset into the source. Token values are only sliced out of the
+# source (and converted) when a Token is actually asked for.
+class TokenBuffer(object):
+    def __init__(self, text):
+        self.text = text
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+        self._tokenize()
+
+    def error(self):
+        raise Exception('SyntaxError: Invalid syntax')
+
+    def _tokenize(self):
+        append_kind = self.kinds.append
+        append_start = self.starts.append
+        append_end = self.ends.append
+        name_kind = TokenKind.NAME
+        reserved_kinds = {
+            name: TokenKind[token_type]
+            for name, token_type in reserved_names.items()
+        }
+        symbol_kinds = {
+            char: TokenKind[token_type]
+            for char, token_type in symbols.items()
+        }
+
+        for match in master_pattern.finditer(self.text):
+            kind = match.lastgroup
+            start, end = match.span(kind)
+
+            if kind == 'END':
+                break
+            elif kind == 'NAME':
+                append_kind(reserved_kinds.get(match.group(kind), name_kind))
+            elif kind == 'SYMBOL':
+                append_kind(symbol_kinds[match.group(kind)])
+            elif kind == 'NUMBER':
+                if '.' in match.group(kind):
+                    append_kind(TokenKind.FLOAT)
+                else:
+                    append_kind(TokenKind.INTEGER)
+            elif kind == 'STRING':
+                # Span without the quotes
+                append_kind(TokenKind.STRING)
+                start += 1
+                end -= 1
+            else:
+                self.error()
+            append_start(start)
+            append_end(end)
+
+        append_kind(TokenKind.EOF)
+        append_start(len(self.text))
+        append_end(len(self.text))
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def kind(self, index):
+        return TokenKind(self.kinds[index])
+
+    def value(self, index):
+        kind = self.kinds[index]
+        if kind == TokenKind.EOF:
+            return None
+        text = self.text[self.starts[index]:self.ends[index]]
+        if kind == TokenKind.INTEGER:
+            return int(text)
+        if kind == TokenKind.FLOAT:
+            return float(text)
+        if kind == TokenKind.BOOL:
+            return text == 'True'
+        return text
+
+    def token(self, index):
+        kind = self.kinds[index]
+        token = fixed_tokens.get(kind)
+        if token is None:
+            return Token(kind_names[kind], self.value(index))
+        return token
+
+    def reader(self):
+        return TokenReader(self)
+
+
+# Hands out the tokens of a TokenBuffer one by one,
+# works anywhere a lexer is expected. The parser still compares
+# token.type strings: it is fed by every lexer here and nodes keep
+# their tokens, so only the shared fixed tokens skip building a Token.
+class TokenReader(object):
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.kinds = buffer.kinds
+        self.index = 0
+        self.last = len(buffer) - 1 # EOF
+
+    def get_next_token(self):
+        # Keeps returning EOF once the buffer is used up
+        index = self.index
+        if index < self.last:
+            self.index = index + 1
+        else:
+            index = self.last
+        token = fixed_tokens.get(self.kinds[index])
+        if token is None:
+            return self.buffer.token(index)
+        return token
+
+
+# Picks the lexer implementation, the char by char
+# Lexer is kept around for comparison
+def make_lexer(text, regex=True):
+    if regex:
+        return RegexLexer(text)
+    return Lexer(text)
@@ -0,0 +1,464 @@
+from .ast import (
+    AST,
+    Assign,
+    BinOp,
+    Number,
+    String,
+    Boolean,
+    Comparison,
+    UnaryOp,
+    Variable,
+    IfStatement,
+    FuncDecl,
+    FuncCall,
+    Empty,
+    fields
+)
+from .interpreter import NodeVisitor, operations, comparisons
+from .lexer import Token
+
+#######################################
+#######################################
+# OPTIMIZER
+#######################################
+#######################################
+
+"""
+Runs on an analysed tree, before the interpreter:
+ - operations on literals become one literal
+ - a variable assigned a literal at the top of its scope can not
+   change (names are declared once per scope), its uses become the
+   literal
+ - if statements with a literal condition become the branch they
+   take, unless a branch declares a function
+Then DeadCodeEliminator removes what is left unused.
+
+The tree that was passed in is not changed, nodes that change are
+copied. Calls get copies of their function symbols, which point at
+the optimised function blocks.
+"""
+
+literal_classes = (Number, String, Boolean)
+
+
+def literal(value):
+    if isinstance(value, bool):
+        return Boolean(Token('BOOL', value))
+    if isinstance(value, str):
+        return String(Token('STRING', value))
+    if isinstance(value, float):
+        return Number(Token('FLOAT', value))
+    return Number(Token('INTEGER', value))
+
+
+def copy(node, **changes):
+    new = object.__new__(type(node))
+    for name, value in fields(node):
+        setattr(new, name, changes.pop(name, value))
+    return new
+
+
+class Optimizer(NodeVisitor):
+    # Run DeadCodeEliminator after folding
+    dead_code = True
+
+    def __init__(self, tree):
+        self.tree = tree
+        # Per function scope, innermost last: slot -> literal
+        self.scopes = []
+        self.blocks = {} # id of a function block -> its optimised block
+        self.symbols = {} # id of a function symbol -> its copy
+        self.eliminated = []
+
+    def optimize(self):
+        self.scopes.append({})
+        tree = self.block(self.tree, record=True)
+        self.scopes.pop()
+        for func_symbol in self.symbols.values():
+            func_symbol.block = self.blocks.get(id(func_symbol.block), func_symbol.block)
+
+        if self.dead_code:
+            eliminator = DeadCodeEliminator(tree)
+            tree = eliminator.eliminate()
+            self.eliminated = eliminator.eliminated
+        return tree
+
+    def block(self, node, record):
+        """ Optimised copy of a block, record is True when its
+            statements always run when the scope is entered """
+        children = []
+        pending = list(reversed(node.children))
+        while pending:
+            child = pending.pop()
+            if isinstance(child, IfStatement):
+                condition = self.visit(child.value)
+                if isinstance(condition, literal_classes) and not declares_functions(child):
+                    # Its statements run in this block now
+                    branch = child.block if condition.value else child.elseblock
+                    if branch is not None:
+                        pending.extend(reversed(branch.children))
+                    continue
+                child = self.if_statement(child, condition)
+            else:
+                child = self.visit(child)
+                if record and isinstance(child, Assign) and isinstance(child.value, literal_classes):
+                    self.scopes[-1][child.name.slot] = child.value
+            children.append(child)
+
+        if len(children) == len(node.children) and all(
+            child is old for child, old in zip(children, node.children)
+        ):
+            return node
+        return copy(node, children=children)
+
+    def visit_Block(self, node):
+        return self.block(node, record=False)
+
+    def if_statement(self, node, condition):
+        block = self.block(node.block, record=False)
+        elseblock = node.elseblock
+        if elseblock is not None:
+            elseblock = self.block(elseblock, record=False)
+        if condition is node.value and block is node.block and elseblock is node.elseblock:
+            return node
+        return copy(node, value=condition, block=block, elseblock=elseblock)
+
+    def visit_IfStatement(self, node):
+        return self.if_statement(node, self.visit(node.value))
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if (
+            node.type is not None and
+            isinstance(left, literal_classes) and isinstance(right, literal_classes)
+        ):
+            try:
+                return literal(operations[node.op.value](left.value, right.value))
+            except ZeroDivisionError: # Fails when it runs, like before
+                pass
+        if left is node.left and right is node.right:
+            return node
+        return copy(node, left=left, right=right)
+
+    def visit_UnaryOp(self, node):
+        expr = self.visit(node.expr)
+        if isinstance(expr, Number):
+            return literal(-expr.value if node.op.value == '-' else +expr.value)
+        if expr is node.expr:
+            return node
+        return copy(node, expr=expr)
+
+    def visit_Comparison(self, node):
+        left = self.visit(node.left)
+        right = node.right
+        if right is not None:
+            right = self.visit(right)
+        if isinstance(left, literal_classes):
+            if node.op is None: # Condition with just a value
+                return literal(bool(left.value))
+            if isinstance(right, literal_classes):
+                return literal(comparisons[node.op.value](left.value, right.value))
+        if left is node.left and right is node.right:
+            return node
+        return copy(node, left=left, right=right)
+
+    def visit_Variable(self, node):
+        value = self.scopes[-1 - node.depth].get(node.slot)
+        return node if value is None else value
+
+    def visit_Assign(self, node):
+        value = self.visit(node.value)
+        if value is node.value:
+            return node
+        return copy(node, value=value)
+
+    def visit_FuncDecl(self, node):
+        self.scopes.append({})
+        block = self.block(node.block_node, record=True)
+        self.scopes.pop()
+        self.blocks[id(node.block_node)] = block
+        if block is node.block_node:
+            return node
+        return copy(node, block_node=block)
+
+    def visit_FuncCall(self, node):
+        params = self.items(node.params)
+        if node.func_symbol is None:
+            return node if params is node.params else copy(node, params=params)
+        return copy(node, params=params, func_symbol=self.symbol(node.func_symbol))
+
+    def symbol(self, func_symbol):
+        """ Copy of func_symbol, it gets the optimised block """
+        new = self.symbols.get(id(func_symbol))
+        if new is None:
+            new = self.symbols[id(func_symbol)] = object.__new__(type(func_symbol))
+            new.__dict__.update(func_symbol.__dict__)
+        return new
+
+    def visit_Print(self, node):
+        args = self.items(node.args)
+        if args is node.args:
+            return node
+        return copy(node, args=args)
+
+    def visit_Returns(self, node):
+        returns = self.items(node.returns)
+        if returns is node.returns:
+            return node
+        return copy(node, returns=returns)
+
+    def items(self, nodes):
+        """ Optimised list of nodes, the same list if nothing changed """
+        new = [self.visit(item) for item in nodes]
+        if all(item is old for item, old in zip(new, nodes)):
+            return nodes
+        return new
+
+    def visit_Number(self, node):
+        return node
+
+    def visit_String(self, node):
+        return node
+
+    def visit_Boolean(self, node):
+        return node
+
+    def visit_Empty(self, node):
+        return node
+
+
+def declares_functions(node):
+    """ True when a branch of the if statement node declares a
+        function. Calls elsewhere can reach it, so neither branch
+        can be dropped """
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        for branch in (node.block, node.elseblock):
+            if branch is None:
+                continue
+            for child in branch.children:
+                if isinstance(child, FuncDecl):
+                    return True
+                if isinstance(child, IfStatement):
+                    pending.append(child)
+    return False
+
+
+#######################################
+# DEAD CODE
+#######################################
+
+"""
+Removes what can not change the output of a program:
+ - functions no reachable code calls
+ - assignments whose variable is never read by reachable code, when
+   working out the value can not fail or have effects
+ - if statements that are left with nothing to run
+Everything the analyser checked is still checked, only the stored
+and interpreted tree gets smaller.
+
+A variable that is declared in an if block that did not run is None,
+typed operations on it fail. Only variables that are set on every way
+to where they are read count as safe to work out, see assigned_reads.
+"""
+
+
+def is_pure(node, assigned):
+    """ True when working out node can not fail or print, assigned
+        are the ids of the variables that are always set when read """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (Number, String, Boolean)):
+            continue
+        if isinstance(node, Variable):
+            if id(node) not in assigned:
+                return False
+            continue
+        if isinstance(node, BinOp) and node.type is not None and (
+            node.op.value != '/' or (isinstance(node.right, Number) and node.right.value != 0)
+        ):
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, UnaryOp):
+            stack.append(node.expr)
+        elif isinstance(node, Comparison) and node.type is not None:
+            stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+        else:
+            return False
+    return True
+
+
+class DeadCodeEliminator(object):
+    def __init__(self, tree):
+        self.tree = tree
+        # Code of the program and of each function by the id of its block:
+        # what it needs when it runs, function blocks and variables
+        self.uses = {}
+        self.stores = {} # (scope, slot) of a removable assignment -> what its value reads
+        self.live = set()
+        self.blocks = {} # id of a function block -> its new block
+        self.func_symbols = set()
+        self.eliminated = [] # Descriptions of the removed statements
+        self.assigned = assigned_reads(tree)
+
+    def eliminate(self):
+        root = id(self.tree)
+        self.collect(self.tree, (root,))
+
+        pending = list(self.uses[root])
+        live = self.live
+        while pending:
+            key = pending.pop()
+            if key in live:
+                continue
+            live.add(key)
+            pending.extend(self.uses.get(key, ()))
+            pending.extend(self.stores.get(key, ()))
+
+        tree = self.block(self.tree, (root,))
+        for func_symbol in self.func_symbols:
+            func_symbol.block = self.blocks.get(id(func_symbol.block), func_symbol.block)
+        return tree
+
+    def collect(self, block, scopes):
+        """ Fills in uses for block, scopes are the ids of the
+            blocks of the scopes it can see, innermost last """
+        uses = self.uses[scopes[-1]] = []
+        stack = [block]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+            elif not isinstance(node, AST):
+                continue
+            elif isinstance(node, FuncDecl):
+                if id(node.block_node) not in self.uses:
+                    self.collect(node.block_node, scopes + (id(node.block_node),))
+            elif isinstance(node, Variable):
+                uses.append((scopes[-1 - node.depth], node.slot))
+            elif isinstance(node, Assign):
+                if is_pure(node.value, self.assigned):
+                    key = (scopes[-1], node.name.slot)
+                    self.stores[key] = [
+                        (scopes[-1 - read.depth], read.slot) for read in reads(node.value)
+                    ]
+                else:
+                    stack.append(node.value)
+            else:
+                if isinstance(node, FuncCall):
+                    func_symbol = node.func_symbol
+                    self.func_symbols.add(func_symbol)
+                    key = id(func_symbol.block)
+                    uses.append(key)
+                    # The block a call runs need not be in the tree
+                    if key not in self.uses:
+                        self.collect(
+                            func_symbol.block, scopes[:func_symbol.scope_level] + (key,)
+                        )
+                stack.extend(value for _, value in fields(node))
+
+    def block(self, node, scopes):
+        children = []
+        for child in node.children:
+            if isinstance(child, FuncDecl):
+                if id(child.block_node) not in self.live:
+                    self.eliminated.append('function {}'.format(child.func_name.value))
+                    continue
+                block = self.block(child.block_node, scopes + (id(child.block_node),))
+                self.blocks[id(child.block_node)] = block
+                if block is not child.block_node:
+                    child = copy(child, block_node=block)
+            elif isinstance(child, Assign):
+                key = (scopes[-1], child.name.slot)
+                if key in self.stores and key not in self.live:
+                    self.eliminated.append('assignment to {}'.format(child.name.value))
+                    continue
+            elif isinstance(child, IfStatement):
+                block = self.block(child.block, scopes)
+                elseblock = child.elseblock
+                if elseblock is not None:
+                    elseblock = self.block(elseblock, scopes)
+                    if not elseblock.children:
+                        elseblock = None
+                if not block.children and elseblock is None and is_pure(child.value, self.assigned):
+                    self.eliminated.append('if statement')
+                    continue
+                if block is not child.block or elseblock is not child.elseblock:
+                    child = copy(child, block=block, elseblock=elseblock)
+            elif isinstance(child, Empty):
+                continue
+            children.append(child)
+
+        if len(children) == len(node.children) and all(
+            child is old for child, old in zip(children, node.children)
+        ):
+            return node
+        return copy(node, children=children)
+
+
+def assigned_reads(tree):
+    """ ids of the variables of tree that are read where they are
+        always set: params, and variables assigned on every way from
+        the start of their scope to the read """
+    found = set()
+
+    def expression(node, assigned, outer):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+            elif isinstance(node, Variable):
+                slots = assigned if node.depth == 0 else outer[-node.depth]
+                if node.slot in slots:
+                    found.add(id(node))
+            elif isinstance(node, AST):
+                stack.extend(value for _, value in fields(node))
+
+    def statements(block, assigned, declared, outer):
+        """ assigned are the slots set so far and grows with the block.
+            Functions can be called once they are declared, declared
+            are the slots set before the if statement a function is
+            declared in, None outside of if statements. outer are the
+            slots set in each outer scope when it declared the function
+            being walked, innermost last """
+        for child in block.children:
+            if isinstance(child, Assign):
+                expression(child.value, assigned, outer)
+                assigned.add(child.name.slot)
+            elif isinstance(child, IfStatement):
+                expression(child.value, assigned, outer)
+                before = frozenset(assigned) if declared is None else declared
+                taken = set(assigned)
+                statements(child.block, taken, before, outer)
+                if child.elseblock is not None:
+                    other = set(assigned)
+                    statements(child.elseblock, other, before, outer)
+                    assigned |= taken & other
+            elif isinstance(child, FuncDecl):
+                here = frozenset(assigned) if declared is None else declared
+                params = set(range(len(child.formal_params)))
+                statements(child.block_node, params, None, outer + (here,))
+            else:
+                expression(child, assigned, outer)
+
+    statements(tree, set(), None, ())
+    return found
+
+
+def reads(node):
+    """ Variables read by an expression """
+    found = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Variable):
+            found.append(node)
+        elif isinstance(node, AST):
+            stack.extend(value for _, value in fields(node))
+    return found
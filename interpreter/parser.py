@@ -16,6 +16,9 @@ from .ast import (
     Empty,
     Returns
 )
+from .flat import FlatBuilder
+from .lexer import Token, TokenBuffer
+from .trampoline import MAX_DEPTH, identity, run
 
 #######################################
 #######################################
@@ -23,50 +26,166 @@ from .ast import (
 #######################################
 #######################################
 
+# Binary operators for the Pratt expression parser: token type ->
+# (binding power, node class). Higher binding power binds tighter,
+# adding an operator only takes a new entry here.
+binary_operators = {
+    'ISEQUAL': (10, Comparison),
+    'GRTHAN': (10, Comparison),
+    'LSTHAN': (10, Comparison),
+    'GRTHEQ': (10, Comparison),
+    'SMTHEQ': (10, Comparison),
+    'PLUS': (20, BinOp),
+    'MINUS': (20, BinOp),
+    'MULT': (30, BinOp),
+    'DIV': (30, BinOp),
+}
+
+# Comparisons are only allowed inside if conditions
+COMPARISON_POWER = 10
+UNARY_POWER = 40
+
+# Size of the lookahead ring buffer, the most peek can look ahead
+LOOKAHEAD = 4
+
 
 class Parser(object):
+    # Parse expressions with the Pratt parser instead of
+    # the expr -> term -> factor chain
+    pratt = True
+    # Blocks nest on an explicit stack, this is how deep they can go
+    max_depth = MAX_DEPTH
+    # Share equal literals and operations on literals, see literal
+    intern = True
+
     def __init__(self, lexer):
+        """ lexer can be any lexer, a TokenBuffer or a list
+            or iterator of already lexed tokens """
+        if isinstance(lexer, TokenBuffer): # Pre-tokenized source
+            lexer = lexer.reader()
+        elif not hasattr(lexer, 'get_next_token'):
+            lexer = TokenStream(lexer)
         self.lexer = lexer
-        self.curr_token = lexer.get_next_token()
+        self.get_next_token = lexer.get_next_token
+
+        # Tokens after curr_token that were already read by peek
+        self.ring = [None] * LOOKAHEAD
+        self.head = 0
+        self.count = 0
+        self.curr_token = self.get_next_token()
+
+        self.nodes = TreeBuilder() # parse_flat swaps it for a FlatBuilder
+        # (class, value) or (class, op, operands) -> the shared node
+        self.interned = {}
+        self.pure = set() # The nodes in interned
 
     def error(self):
         raise Exception('ParserError: Invalid syntax')
 
+    def advance(self):
+        if self.count:
+            self.curr_token = self.ring[self.head]
+            self.head = (self.head + 1) % LOOKAHEAD
+            self.count -= 1
+        else:
+            self.curr_token = self.get_next_token()
+
+    def peek(self, k=1):
+        """ Token k places after curr_token, peek(0) is curr_token """
+        if k == 0:
+            return self.curr_token
+        if k > LOOKAHEAD:
+            raise Exception('ParserError: Can not look {} tokens ahead'.format(k))
+        while self.count < k:
+            self.ring[(self.head + self.count) % LOOKAHEAD] = self.get_next_token()
+            self.count += 1
+        return self.ring[(self.head + k - 1) % LOOKAHEAD]
+
     def eat(self, token_type):
         # Check if curr_token's type matches the passed in type
         if self.curr_token.type == token_type:
-            self.curr_token = self.lexer.get_next_token()
+            self.advance()
         else:
             self.error()
 
+    #######################################
+    # Interning
+    #######################################
+
+    # Equal literals in one program are one node, and so are equal
+    # operations whose operands are all shared nodes, like 2 * 3 or -1.
+    # Nothing ever changes these nodes. Variables and function calls
+    # are never shared, the analyser writes to them.
+    def literal(self, node_class, token):
+        if not self.intern:
+            return self.nodes.literal(node_class, token)
+        key = (node_class, type(token.value), token.value)
+        node = self.interned.get(key)
+        if node is None:
+            node = self.interned[key] = self.nodes.literal(node_class, token)
+            self.pure.add(node)
+        return node
+
+    def operation(self, node_class, left, op, right):
+        if left not in self.pure or right not in self.pure:
+            return self.nodes.operation(node_class, left, op, right)
+        key = (node_class, op.type, left, right)
+        node = self.interned.get(key)
+        if node is None:
+            node = self.interned[key] = self.nodes.operation(node_class, left, op, right)
+            self.pure.add(node)
+        return node
+
+    def unary(self, op, expr):
+        if expr not in self.pure:
+            return self.nodes.unary(op, expr)
+        key = (UnaryOp, op.type, expr)
+        node = self.interned.get(key)
+        if node is None:
+            node = self.interned[key] = self.nodes.unary(op, expr)
+            self.pure.add(node)
+        return node
+
     def parse(self):
         node = self.block()
         return node
 
+    def parse_flat(self):
+        """ The same program as parse as a FlatTree, the parser
+            writes its rows instead of making node objects """
+        builder = self.nodes = FlatBuilder()
+        # Shared nodes are rows now
+        self.interned = {}
+        self.pure = set()
+        return builder.finish(self.block())
+
     # Parent node of each program but also inner scoped blocks
     def block(self):
         """ block  :  compound_statement """
-        return self.compound_statement()
+        return run(self.block_steps(), identity, self.max_depth)
 
-    def compound_statement(self):
-        """ compound_statement  :  statement_list """
-        nodes = self.statement_list()
-        root = Block()
-        for node in nodes:
-            root.children.append(node)
-        return root
+    # Nested blocks are parsed as steps on an explicit stack instead of
+    # recursive calls. A step yields the step of an inner block and gets
+    # the parsed node back, see trampoline.run
+    def block_steps(self):
+        nodes = yield self.statement_list_steps()
+        return self.nodes.block(nodes)
 
-    def statement_list(self):
+    def statement_list_steps(self):
         """ statement_list  :  statement SCOLON
                             | statement 
                             | statement SCOLON statement_list """
         statements = []
         while True:
-            statement = self.statement()
-            statements.append(statement)
-            if isinstance(statement, IfStatement) or isinstance(statement, FuncDecl):
+            # Ifs and function declarations end with a brace, not SCOLON
+            if self.curr_token.type == 'IF':
+                statements.append((yield self.ifelse_steps()))
+                continue
+            elif self.curr_token.type == 'FUNCDECL':
+                statements.append((yield self.functiondecl_steps()))
                 continue
-            elif self.curr_token.type != 'SCOLON':
+            statements.append(self.statement())
+            if self.curr_token.type != 'SCOLON':
                 break
             else:
                 self.eat('SCOLON')
@@ -81,7 +200,7 @@ class Parser(object):
 
         token = self.curr_token
         if (token.type == 'NAME' and
-            self.lexer.current_char == '('
+            self.peek().type == 'LPAREN'
         ):  
             node = self.functioncall()
         elif token.type == 'NAME':
@@ -109,15 +228,15 @@ class Parser(object):
         if token.type == 'PLUS':
             op = token
             self.eat('PLUS')
-            node = UnaryOp(op=token, expr=self.factor())
+            node = self.unary(token, self.factor())
 
         elif token.type == 'MINUS':
             op = token
             self.eat('MINUS')
-            node = UnaryOp(op=token, expr=self.factor())
+            node = self.unary(token, self.factor())
         
         elif token.type == 'INTEGER':
-            node = Number(token=token)
+            node = self.literal(Number, token)
             self.eat('INTEGER')
 
         elif token.type == 'LPAREN':
@@ -126,7 +245,7 @@ class Parser(object):
             self.eat('RPAREN')
 
         elif (token.type == 'NAME' and
-            self.lexer.current_char == '('
+            self.peek().type == 'LPAREN'
         ):  
             node = self.functioncall()
 
@@ -147,12 +266,15 @@ class Parser(object):
                 self.eat('MULT')
             elif token.type == 'DIV':
                 self.eat('DIV')
-            node = BinOp(left=node, op=token, right=self.factor())
+            node = self.operation(BinOp, node, token, self.factor())
         
         return node            
 
     def expr(self):
         """ expr   : term ((PLUS | MINUS) term)* """
+        if self.pratt:
+            return self.expression(COMPARISON_POWER)
+
         node = self.term()
 
         while self.curr_token.type in ('PLUS', 'MINUS'):
@@ -161,15 +283,87 @@ class Parser(object):
                 self.eat('PLUS')
             elif token.type == 'MINUS':
                 self.eat('MINUS')
-            node = BinOp(left=node, op=token, right=self.term())
+            node = self.operation(BinOp, node, token, self.term())
 
         return node
 
+    #######################################
+    # Pratt expressions
+    #######################################
+
+    def expression(self, min_power=0, left=None):
+        """ Operators that bind tighter than min_power """
+        if left is None:
+            left = self.prefix()
+
+        while True:
+            token = self.curr_token
+            operator = binary_operators.get(token.type)
+            if operator is None or operator[0] <= min_power:
+                return left
+
+            power, node_class = operator
+            self.advance()
+            if node_class is Comparison:
+                # Comparisons do not chain
+                if self.nodes.is_comparison(left):
+                    self.error()
+                if self.curr_token.type == 'BOOL':
+                    right = self.literal(Boolean, self.curr_token)
+                    self.eat('BOOL')
+                    left = self.operation(Comparison, left, token, right)
+                    continue
+
+            # Plain numbers and variables are read in place,
+            # that saves a call for most right operands
+            operand = self.curr_token
+            if operand.type == 'INTEGER':
+                self.advance()
+                right = self.literal(Number, operand)
+            elif operand.type == 'NAME' and self.peek().type != 'LPAREN':
+                self.advance()
+                right = self.nodes.variable(operand)
+            else:
+                right = self.prefix()
+
+            following = binary_operators.get(self.curr_token.type)
+            if following is not None and following[0] > power:
+                right = self.expression(power, left=right)
+
+            left = self.operation(node_class, left, token, right)
+
+    def prefix(self):
+        token = self.curr_token
+        if token.type == 'INTEGER':
+            self.eat('INTEGER')
+            return self.literal(Number, token)
+
+        elif token.type == 'NAME':
+            if self.peek().type == 'LPAREN':
+                return self.functioncall()
+            self.eat('NAME')
+            return self.nodes.variable(token)
+
+        elif token.type == 'LPAREN':
+            self.eat('LPAREN')
+            node = self.expression(COMPARISON_POWER)
+            self.eat('RPAREN')
+            return node
+
+        elif token.type in ('PLUS', 'MINUS'):
+            self.eat(token.type)
+            return self.unary(token, self.expression(UNARY_POWER))
+
+        self.error()
+
     #######################################
     # FUNCTIONS
     #######################################
     
     def functiondecl(self):
+        return run(self.functiondecl_steps(), identity, self.max_depth)
+
+    def functiondecl_steps(self):
         """ FUNCDECL variable LPAREN (parameter (COMMA parameter)*) RPARNEN LBRACE block (RETURN RPAREN (parameter) LPAREN) RBRACE """
         self.eat('FUNCDECL')
         name = self.variable()
@@ -178,12 +372,12 @@ class Parser(object):
         params = []
         while True:
             if self.curr_token.type == 'NAME':
-                var_node = Variable(token=self.curr_token)
+                var_node = self.nodes.variable(self.curr_token)
                 self.eat('NAME')
                 self.eat('COLON')    
                 # Next token should be specifying the type of the param
                 type_node = self.curr_token
-                param = Param(var_node=var_node, type_node=type_node)
+                param = self.nodes.param(var_node, type_node)
                 params.append(param)
                 self.eat('TYPE')
 
@@ -191,12 +385,14 @@ class Parser(object):
                 self.eat('COMMA')
             elif self.curr_token.type == 'RPAREN':
                 break
+            else:
+                self.error()
         
         self.eat('RPAREN')
 
         # Block
         self.eat('LBRACE')
-        block = self.block()
+        block = yield self.block_steps()
         return_params = None
  
         # Check for returns
@@ -208,13 +404,13 @@ class Parser(object):
             while True:
                 token = self.curr_token
                 if token.type == 'BOOL':
-                    return_params.append(Boolean(token=token))
+                    return_params.append(self.literal(Boolean, token))
                     self.eat('BOOL')
                 elif token.type == 'STRING':
-                    return_params.append(String(token=token))
+                    return_params.append(self.literal(String, token))
                     self.eat('STRING')
                 elif (token.type == 'NAME' and
-                    self.lexer.current_char == '('
+                    self.peek().type == 'LPAREN'
                 ):  
                     return_params.append(self.functioncall())
                 else:
@@ -230,23 +426,22 @@ class Parser(object):
                     self.error() 
             
         self.eat('RBRACE')    
-        node = FuncDecl(func_name=name, params=params, block_node=block, returns=return_params)
+        node = self.nodes.function(name, params, block, return_params)
         return node
         
     def functioncall(self):
         token = self.curr_token
-        name = token.value
         self.eat('NAME')
         self.eat('LPAREN')
         params = []
         if self.curr_token.type != 'RPAREN':
             while True:
                 if self.curr_token.type == 'STRING':
-                    node = String(token=self.curr_token)
+                    node = self.literal(String, self.curr_token)
                     params.append(node)
                     self.eat('STRING')
                 elif self.curr_token.type == 'BOOL':
-                    node = Boolean(token=self.curr_token)
+                    node = self.literal(Boolean, self.curr_token)
                     params.append(node)
                     self.eat('BOOL')              
                 else:
@@ -261,12 +456,7 @@ class Parser(object):
                     self.error()
 
         self.eat('RPAREN')
-        node = FuncCall(
-            func_name=name,
-            params=params,
-            token=token
-        )
-        return node
+        return self.nodes.call(token, params)
 
     def returns(self):
         return_params = None
@@ -280,13 +470,13 @@ class Parser(object):
             while True:
                 token = self.curr_token
                 if token.type == 'BOOL':
-                    return_params.append(Boolean(token=token))
+                    return_params.append(self.literal(Boolean, token))
                     self.eat('BOOL')
                 elif token.type == 'STRING':
-                    return_params.append(String(token=token))
+                    return_params.append(self.literal(String, token))
                     self.eat('STRING')
                 elif (token.type == 'NAME' and
-                    self.lexer.current_char == '('
+                    self.peek().type == 'LPAREN'
                 ):  
                     return_params.append(self.functioncall())
                 else:
@@ -301,8 +491,7 @@ class Parser(object):
                 else:
                     self.error() 
 
-        node = Returns(returns=return_params)
-        return node
+        return self.nodes.returns(return_params)
 
 
     #######################################
@@ -311,39 +500,44 @@ class Parser(object):
 
 
     def ifelse(self):
+        return run(self.ifelse_steps(), identity, self.max_depth)
+
+    def ifelse_steps(self):
         """ ifelse  :  IF comparison LBRACE block RBRACE (ELSE LBRACE block RBRACE) """        
         self.eat('IF')
         comparison = self.comparison()
         self.eat('LBRACE')
-        block = self.block()
+        block = yield self.block_steps()
         self.eat('RBRACE')
-        node = IfStatement(value=comparison, block=block)
+        elseblock = None
  
         if self.curr_token.type == 'ELSE':
             self.eat('ELSE')
             self.eat('LBRACE')
-            elseblock = self.block()
+            elseblock = yield self.block_steps()
             self.eat('RBRACE')
-            node.elseblock = elseblock
         
-        return node 
+        return self.nodes.ifelse(comparison, block, elseblock) 
 
     def comparison(self):
         """ comparison  :  LPAREN variable 
                                   | VALUE 
                                   | (variable | expr) op (variable | expr)
                            RPAREN """
+        if self.pratt:
+            return self.pratt_comparison()
+
         self.eat('LPAREN')
         
         if self.curr_token.type == 'BOOL':
-            left = Boolean(token=self.curr_token)
+            left = self.literal(Boolean, self.curr_token)
             self.eat('BOOL')
         else:
             left = self.expr()
         
         if self.curr_token.type == 'RPAREN':
             self.eat('RPAREN')
-            return Comparison(left=left)
+            return self.nodes.condition(left)
         
         # Check for comparison operator
         token = self.curr_token
@@ -367,39 +561,53 @@ class Parser(object):
 
         # Right side of comparison
         if self.curr_token.type == 'BOOL':
-            right = Boolean(token=self.curr_token)
+            right = self.literal(Boolean, self.curr_token)
         else:
             right = self.expr()
         
         self.eat('RPAREN')
-        return Comparison(left=left, op=op, right=right)
+        return self.operation(Comparison, left, op, right)
+
+    def pratt_comparison(self):
+        self.eat('LPAREN')
+        if self.curr_token.type == 'BOOL':
+            left = self.literal(Boolean, self.curr_token)
+            self.eat('BOOL')
+            node = self.expression(left=left)
+        else:
+            node = self.expression()
+        self.eat('RPAREN')
+
+        if not self.nodes.is_comparison(node):
+            node = self.nodes.condition(node)
+        return node
 
     def variable(self):
         token = self.curr_token
         self.eat('NAME')
-        return Variable(token=token)
+        return self.nodes.variable(token)
     
     def print(self):
         """ PRINT  LPAREN (expr | STRING | BOOL | functioncall (COMMA))* RPAREN """
         self.eat('PRINT')
         self.eat('LPAREN')
         
-        node = Print() # So Print can take multiple args
+        args = [] # So Print can take multiple args
 
         while True:
             token = self.curr_token
             if token.type == 'STRING':
-                node.args.append(String(token=token))
+                args.append(self.literal(String, token))
                 self.eat('STRING')
             elif token.type == 'BOOL':
-                node.args.append(Boolean(token=token))
+                args.append(self.literal(Boolean, token))
                 self.eat('BOOL')
             elif (token.type == 'NAME' and
-                self.lexer.current_char == '('
+                self.peek().type == 'LPAREN'
             ):  
-                node.args.append(self.functioncall())
+                args.append(self.functioncall())
             else:
-                node.args.append(self.expr()) # Arithmetic expression
+                args.append(self.expr()) # Arithmetic expression
 
             if self.curr_token.type == 'COMMA':
                 self.eat('COMMA')
@@ -407,7 +615,7 @@ class Parser(object):
                 break
 
         self.eat('RPAREN')
-        return node
+        return self.nodes.print(args)
         
     def assignment(self):
         """ variable COLON TYPE EQUAL expr 
@@ -419,17 +627,221 @@ class Parser(object):
         self.eat('EQUAL')
         
         if self.curr_token.type == 'STRING':
-            value = String(token=self.curr_token)
+            value = self.literal(String, self.curr_token)
             self.eat('STRING')
 
         elif self.curr_token.type == 'BOOL':
-            value = Boolean(token=self.curr_token)
+            value = self.literal(Boolean, self.curr_token)
             self.eat('BOOL')
         else:
             value = self.expr()
 
-        node = Assign(name=name, type=var_type, value=value)
-        return node                
+        return self.nodes.assign(name, var_type, value)                
 
     def empty(self):
+        return self.nodes.empty()
+
+
+# Makes the nodes of the Parser as ast objects
+class TreeBuilder(object):
+    @staticmethod
+    def literal(node_class, token):
+        return node_class(token=token)
+
+    @staticmethod
+    def operation(node_class, left, op, right):
+        return node_class(left=left, op=op, right=right)
+
+    @staticmethod
+    def unary(op, expr):
+        return UnaryOp(op=op, expr=expr)
+
+    @staticmethod
+    def condition(left):
+        """ Comparison of just a value """
+        return Comparison(left=left)
+
+    @staticmethod
+    def is_comparison(node):
+        return isinstance(node, Comparison)
+
+    @staticmethod
+    def variable(token):
+        return Variable(token=token)
+
+    @staticmethod
+    def call(token, params):
+        return FuncCall(func_name=token.value, params=params, token=token)
+
+    @staticmethod
+    def param(var_node, type_token):
+        return Param(var_node=var_node, type_node=type_token)
+
+    @staticmethod
+    def function(name, params, block, returns):
+        return FuncDecl(func_name=name, params=params, block_node=block, returns=returns)
+
+    @staticmethod
+    def returns(values):
+        return Returns(returns=values)
+
+    @staticmethod
+    def ifelse(condition, block, elseblock):
+        return IfStatement(value=condition, block=block, elseblock=elseblock)
+
+    @staticmethod
+    def print(args):
+        node = Print()
+        node.args = args
+        return node
+
+    @staticmethod
+    def assign(name, type_token, value):
+        return Assign(name=name, type=type_token, value=value)
+
+    @staticmethod
+    def block(children):
+        node = Block()
+        node.children = children
+        return node
+
+    @staticmethod
+    def empty():
         return Empty()
+
+
+# Lexer stand-in for a list or iterator of tokens,
+# keeps returning EOF once they are used up
+class TokenStream(object):
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.eof = Token('EOF', None)
+
+    def get_next_token(self):
+        return next(self.tokens, self.eof)
+
+
+#######################################
+# EXPLICIT STACK PARSER
+#######################################
+
+# Parses expressions with operand and operator stacks instead of
+# recursion, so nested parentheses, unary operators and long operator
+# chains are not limited by the Python stack. Produces the same tree as
+# the Pratt parser. Function call arguments are still parsed recursively.
+class StackParser(Parser):
+    def functioncall(self):
+        return self.expression(call=True)
+
+    def expression(self, min_power=0, left=None, call=False):
+        """ Operators that bind tighter than min_power. With call only
+            the function call at the current token """
+        operands = []
+        # ('unary', token), ('paren', outer floor), ('call', outer floor,
+        # name token, args so far) or (power, token, node_class)
+        operators = []
+        floor = min_power
+        argument = False # At the start of an argument of a call
+
+        while True:
+            literal = False # A string or bool argument, nothing can follow it
+            if left is None:
+                # Prefix operators, opening parentheses and calls, then one operand
+                while True:
+                    token = self.curr_token
+                    if argument and token.type in ('STRING', 'BOOL'):
+                        literal = True
+                        break
+                    argument = False
+                    if token.type in ('PLUS', 'MINUS'):
+                        self.eat(token.type)
+                        operators.append(('unary', token))
+                    elif token.type == 'LPAREN':
+                        self.eat('LPAREN')
+                        operators.append(('paren', floor))
+                        floor = COMPARISON_POWER
+                    elif token.type == 'NAME' and self.peek().type == 'LPAREN':
+                        self.eat('NAME')
+                        self.eat('LPAREN')
+                        if self.curr_token.type == 'RPAREN': # No args
+                            self.eat('RPAREN')
+                            left = self.nodes.call(token, [])
+                            break
+                        # Args are parsed like expr, then go to the frame
+                        operators.append(('call', floor, token, []))
+                        floor = COMPARISON_POWER
+                        argument = True
+                    else:
+                        break
+                    if len(operators) > self.max_depth:
+                        raise Exception(
+                            'Error: Maximum nesting depth of {} exceeded'.format(self.max_depth)
+                        )
+                if literal:
+                    left = self.literal(String if token.type == 'STRING' else Boolean, token)
+                    self.eat(token.type)
+                elif left is None:
+                    left = self.prefix()
+                elif call and not operators:
+                    return left
+            operands.append(left)
+            left = None
+
+            token = self.curr_token
+            operator = binary_operators.get(token.type)
+            if not literal and operator is not None and operator[0] > floor:
+                power, node_class = operator
+                self.reduce(operands, operators, power)
+                # Comparisons do not chain
+                if node_class is Comparison and self.nodes.is_comparison(operands[-1]):
+                    self.error()
+                self.eat(token.type)
+                operators.append((power, token, node_class))
+
+                if node_class is Comparison and self.curr_token.type == 'BOOL':
+                    operands.append(self.literal(Boolean, self.curr_token))
+                    self.eat('BOOL')
+                    self.reduce(operands, operators, power)
+                    left = operands.pop()
+                continue
+
+            # Only an open parenthesis or call can be left after this
+            self.reduce(operands, operators, 0)
+            if not operators:
+                return operands.pop()
+            frame = operators[-1]
+            if frame[0] == 'paren':
+                self.eat('RPAREN')
+                floor = operators.pop()[1]
+                left = operands.pop()
+                continue
+
+            frame[3].append(operands.pop())
+            if self.curr_token.type == 'COMMA':
+                self.eat('COMMA')
+                argument = True
+                continue
+            self.eat('RPAREN')
+            operators.pop()
+            floor = frame[1]
+            left = self.nodes.call(frame[2], frame[3])
+            if call and not operators:
+                return left
+
+    # Builds nodes for the operators on top of the stack
+    # that bind at least as tight as power
+    def reduce(self, operands, operators, power):
+        while operators:
+            operator = operators[-1]
+            if operator[0] in ('paren', 'call'):
+                return
+            if operator[0] == 'unary':
+                operators.pop()
+                operands.append(self.unary(operator[1], operands.pop()))
+                continue
+            if operator[0] < power:
+                return
+            operators.pop()
+            right = operands.pop()
+            left = operands.pop()
+            operands.append(self.operation(operator[2], left, operator[1], right))
@@ -0,0 +1,380 @@
+from .ast import FuncDecl, FuncCall, Number, Empty
+from .bytecode import LINK, RETURNS, FIRST_SLOT
+from .interpreter import NodeVisitor, Interpreter, operations
+from .visitor import dispatch_table
+
+#######################################
+#######################################
+# REGISTER VM
+#######################################
+#######################################
+
+"""
+An analysed tree compiled for a register machine. Every instruction is
+a tuple (opcode, a, b, c) and names the registers it reads and writes,
+there is no operand stack. Registers are the frame list: access link,
+returns, the variables by slot and then the temporaries of the function.
+Variables of the current scope are read where they are, an assignment
+writes its result straight into the variable.
+
+Operations the analyser typed get their own instructions, int + int is
+INT_ADD and str + str is STR_CONCAT, with a _CONST form when the right
+operand is a number. Typed float operations run through BINARY.
+
+Jumps are offsets from the next instruction, in instructions.
+"""
+
+(
+    LOAD_CONST,     # a = value b
+    MOVE,           # a = b
+    LOAD_OUTER,     # a = register c of the frame b access links out
+    INT_ADD,        # a = b + c
+    INT_SUB,
+    INT_MUL,
+    INT_DIV,
+    INT_ADD_CONST,  # a = b + value c
+    INT_SUB_CONST,
+    INT_MUL_CONST,
+    INT_DIV_CONST,
+    STR_CONCAT,
+    BINARY,         # a = c[0](b, c[1]), any other typed operation
+    CHECKED_BINOP,  # a = BinOp c on b and a checked now
+    LESS,           # a = b < c
+    LESS_EQUAL,
+    GREATER_EQUAL,
+    GREATER,
+    EQUAL,
+    NEGATIVE,       # a = -b
+    POSITIVE,
+    JUMP,           # by a
+    JUMP_IF_FALSE,  # by b when a is false
+    PRINT,          # the c values from register b
+    RETURN,         # the c values from register b become what the call returns
+    CALL,           # a = call b, its params are in the registers from c
+    END,
+    HALT,
+) = range(28)
+
+int_opcodes = {'+': INT_ADD, '-': INT_SUB, '*': INT_MUL, '/': INT_DIV}
+int_const_opcodes = {
+    '+': INT_ADD_CONST,
+    '-': INT_SUB_CONST,
+    '*': INT_MUL_CONST,
+    '/': INT_DIV_CONST,
+}
+comparison_opcodes = {
+    '<': LESS,
+    '<=': LESS_EQUAL,
+    '>=': GREATER_EQUAL,
+    '>': GREATER,
+    '==': EQUAL,
+}
+
+
+class RegisterProgram(object):
+    def __init__(self, code, size):
+        self.code = code
+        self.size = size # Registers of the global frame
+
+    def run(self):
+        return RegisterVM(self).run()
+
+
+class RegisterCompiler(NodeVisitor):
+    def __init__(self, tree):
+        self.tree = tree
+        self.code = []
+        self.level = 1 # Scope level of the code being compiled
+        self.next = 0 # First free temporary
+        self.size = 0 # Registers the function needs so far
+        # id of a function block -> [start, registers] of its body
+        self.targets = {}
+        self.function_symbols = []
+
+    def compile(self):
+        size = self.body(self.tree, self.tree.nlocals or 0)
+        self.code.append((HALT, 0, 0, 0))
+
+        # Bodies of called functions, compiling one can add more
+        index = 0
+        while index < len(self.function_symbols):
+            func_symbol = self.function_symbols[index]
+            target = self.targets[id(func_symbol.block)]
+            target[0] = len(self.code)
+            self.level = func_symbol.scope_level + 1
+            target[1] = self.body(func_symbol.block, func_symbol.nlocals)
+            self.code.append((END, 0, 0, 0))
+            index += 1
+
+        # Calls only point at their target until here
+        self.code = [
+            (op, a, (tuple(b[0]), b[1], b[2]), c) if op == CALL else (op, a, b, c)
+            for op, a, b, c in self.code
+        ]
+        return RegisterProgram(self.code, size)
+
+    def body(self, block, nlocals):
+        """ Compiles block, returns the registers it needs """
+        self.next = self.size = FIRST_SLOT + nlocals
+        self.visit(block)
+        return self.size
+
+    def emit(self, op, a=0, b=0, c=0):
+        self.code.append((op, a, b, c))
+        return len(self.code) - 1
+
+    def temporary(self):
+        register = self.next
+        self.next += 1
+        if self.next > self.size:
+            self.size = self.next
+        return register
+
+    def patch(self, position, to_a):
+        """ Points the jump at position to here """
+        op, a, b, c = self.code[position]
+        offset = len(self.code) - position - 1
+        self.code[position] = (op, offset, b, c) if to_a else (op, a, offset, c)
+
+    #######################################
+    # Expressions
+    #######################################
+
+    def expression(self, node, target=None):
+        """ Register with the value of node, in target if it is given """
+        return self.expressions[type(node)](self, node, target)
+
+    def destination(self, target):
+        return self.temporary() if target is None else target
+
+    def literal(self, node, target):
+        register = self.destination(target)
+        self.emit(LOAD_CONST, register, node.value)
+        return register
+
+    expression_Number = literal
+    expression_String = literal
+    expression_Boolean = literal
+
+    def expression_Variable(self, node, target):
+        if node.depth == 0:
+            register = FIRST_SLOT + node.slot
+            if target is None or target == register:
+                return register
+            self.emit(MOVE, target, register)
+            return target
+        register = self.destination(target)
+        self.emit(LOAD_OUTER, register, node.depth, FIRST_SLOT + node.slot)
+        return register
+
+    def expression_BinOp(self, node, target):
+        mark = self.next
+        op = node.op.value
+        left = self.expression(node.left)
+        if node.type == 'int' and isinstance(node.right, Number):
+            self.next = mark
+            register = self.destination(target)
+            self.emit(int_const_opcodes[op], register, left, node.right.value)
+            return register
+
+        right = self.expression(node.right)
+        self.next = mark
+        register = self.destination(target)
+        if node.type is None: # Types only known at run time
+            self.emit(CHECKED_BINOP, register, left, (node, right))
+        elif node.type == 'int':
+            self.emit(int_opcodes[op], register, left, right)
+        elif node.type == 'str' and op == '+':
+            self.emit(STR_CONCAT, register, left, right)
+        else:
+            self.emit(BINARY, register, left, (operations[op], right))
+        return register
+
+    def expression_UnaryOp(self, node, target):
+        mark = self.next
+        value = self.expression(node.expr)
+        self.next = mark
+        register = self.destination(target)
+        self.emit(NEGATIVE if node.op.value == '-' else POSITIVE, register, value)
+        return register
+
+    def expression_Comparison(self, node, target):
+        if node.op is None: # Condition with just a value
+            return self.expression(node.left, target)
+        mark = self.next
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+        self.next = mark
+        register = self.destination(target)
+        self.emit(comparison_opcodes[node.op.value], register, left, right)
+        return register
+
+    def expression_FuncCall(self, node, target):
+        mark = self.next
+        first = self.values(node.params)
+        self.next = mark
+
+        func_symbol = node.func_symbol
+        key = id(func_symbol.block)
+        if key not in self.targets:
+            self.targets[key] = [None, None]
+            self.function_symbols.append(func_symbol)
+        # Start and registers are filled in once the function is compiled
+        call = (self.targets[key], len(node.params), self.level - func_symbol.scope_level)
+        register = self.destination(target)
+        self.emit(CALL, register, call, first)
+        return register
+
+    def values(self, nodes):
+        """ Puts nodes in registers next to each other, returns the first """
+        if len(nodes) == 1: # Wherever it already is
+            return self.expression(nodes[0])
+        first = self.next
+        for node in nodes:
+            self.expression(node, self.temporary())
+        return first
+
+    #######################################
+    # Statements
+    #######################################
+
+    def visit_Block(self, node):
+        for child in node.children:
+            if isinstance(child, (FuncDecl, Empty)):
+                continue
+            mark = self.next
+            if isinstance(child, FuncCall): # What it returns is not used
+                self.expression(child)
+            else:
+                self.visit(child)
+            self.next = mark
+
+    def visit_Assign(self, node):
+        self.expression(node.value, FIRST_SLOT + node.name.slot)
+
+    def visit_IfStatement(self, node):
+        mark = self.next
+        condition = self.expression(node.value)
+        self.next = mark
+        to_else = self.emit(JUMP_IF_FALSE, condition)
+        self.visit(node.block)
+        if node.elseblock is None:
+            self.patch(to_else, to_a=False)
+            return
+        to_end = self.emit(JUMP)
+        self.patch(to_else, to_a=False)
+        self.visit(node.elseblock)
+        self.patch(to_end, to_a=True)
+
+    def visit_Print(self, node):
+        self.emit(PRINT, 0, self.values(node.args), len(node.args))
+
+    def visit_Returns(self, node):
+        self.emit(RETURN, 0, self.values(node.returns), len(node.returns))
+
+
+RegisterCompiler.expressions = dispatch_table(RegisterCompiler, 'expression_')
+
+
+def compile_registers(tree):
+    return RegisterCompiler(tree).compile()
+
+
+class RegisterVM(object):
+    def __init__(self, program):
+        self.program = program
+
+    def run(self):
+        program = self.program
+        code = program.code
+        checked_binop = Interpreter.checked_binop
+        print_args = Interpreter.print_args
+
+        r = [None] * program.size # Registers of the running function
+        calls = [] # (return address, registers, result register) of the callers
+        pc = 0
+        while True:
+            op, a, b, c = code[pc]
+            pc += 1
+            if op == INT_ADD:
+                r[a] = r[b] + r[c]
+            elif op == INT_SUB_CONST:
+                r[a] = r[b] - c
+            elif op == JUMP_IF_FALSE:
+                if not r[a]:
+                    pc += b
+            elif op == LOAD_CONST:
+                r[a] = b
+            elif op == INT_ADD_CONST:
+                r[a] = r[b] + c
+            elif op == INT_SUB:
+                r[a] = r[b] - r[c]
+            elif op == INT_MUL:
+                r[a] = r[b] * r[c]
+            elif op == INT_MUL_CONST:
+                r[a] = r[b] * c
+            elif op == CALL:
+                (start, size), nparams, hops = b
+                new = [None] * size
+                link = r
+                while hops:
+                    link = link[LINK]
+                    hops -= 1
+                new[LINK] = link
+                if nparams:
+                    new[FIRST_SLOT:FIRST_SLOT + nparams] = r[c:c + nparams]
+                calls.append((pc, r, a))
+                r = new
+                pc = start
+            elif op == END:
+                returns = r[RETURNS]
+                if returns is not None and len(returns) == 1:
+                    returns = returns[0]
+                pc, r, a = calls.pop()
+                r[a] = returns
+            elif op == RETURN:
+                if not calls:
+                    raise Exception('Error: Invalid syntax')
+                r[RETURNS] = r[b:b + c]
+            elif op == LESS:
+                r[a] = r[b] < r[c]
+            elif op == LESS_EQUAL:
+                r[a] = r[b] <= r[c]
+            elif op == GREATER_EQUAL:
+                r[a] = r[b] >= r[c]
+            elif op == GREATER:
+                r[a] = r[b] > r[c]
+            elif op == EQUAL:
+                r[a] = r[b] == r[c]
+            elif op == JUMP:
+                pc += a
+            elif op == MOVE:
+                r[a] = r[b]
+            elif op == LOAD_OUTER:
+                outer = r
+                while b:
+                    outer = outer[LINK]
+                    b -= 1
+                r[a] = outer[c]
+            elif op == STR_CONCAT:
+                r[a] = r[b] + r[c]
+            elif op == INT_DIV:
+                r[a] = r[b] / r[c]
+            elif op == INT_DIV_CONST:
+                r[a] = r[b] / c
+            elif op == CHECKED_BINOP:
+                node, right = c
+                r[a] = checked_binop(node, r[b], r[right])
+            elif op == BINARY:
+                function, right = c
+                r[a] = function(r[b], r[right])
+            elif op == NEGATIVE:
+                r[a] = -r[b]
+            elif op == POSITIVE:
+                r[a] = +r[b]
+            elif op == PRINT:
+                print_args(r[b:b + c])
+            elif op == HALT:
+                return 'success'
+            else:
+                raise Exception('Error: Unknown opcode {}'.format(op))
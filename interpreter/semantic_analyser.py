@@ -1,14 +1,25 @@
 import inspect
+from array import array
 
 from interpreter.ast import (
-    BinOp,
-    Variable
+    Empty,
+    IfStatement,
+    FuncDecl,
+    FuncCall,
+    Returns
 )
+from interpreter.flat import EMPTY, FUNCCALL, FUNCDECL, IFSTATEMENT, RETURNS, kind_table
+from interpreter.trampoline import MAX_DEPTH, run
+from interpreter.visitor import NodeVisitor
 
 ###############################
 # Symbol Tables / Scope Tables
 ###############################
 
+# Static type of what is only known at run time, like the
+# value of a call to a function that does not always return
+ANY = 'any'
+
 
 class Symbol(object):
     def __init__(self, name, type=None):
@@ -34,6 +45,10 @@ class BuiltinTypeSymbol(Symbol):
 class VariableSymbol(Symbol):
     def __init__(self, name, type): # type == BuilinTypeSymbol instance
         super(VariableSymbol, self).__init__(name, type)
+        self.slot = None # Index in its scope, set by SymbolTable.insert
+        # Static type of the values it holds, ANY once it can be given a
+        # value of unknown type, like the value of a call
+        self.value_type = type.name if type is not None else ANY
 
     def __str__(self): # For nice printing
         return "<{class_name}(name='{name}', type='{type}')>".format(
@@ -51,23 +66,37 @@ class FunctionSymbol(Symbol):
         self.formal_params = formal_params if formal_params is not None else []
         self.block = block
         self.returns = None
+        self.return_type = ANY
+        self.nlocals = 0 # Slots a call needs, params first
+
+    def __str__(self):
+        return "<{class_name}(name='{name}', params={params})>".format(
+            class_name=self.__class__.__name__,
+            name=self.name,
+            params=self.formal_params,
+        )
+
+    __repr__ = __str__
 
     
 class SymbolTable(object): # Each scope has a symbol table
     def __init__(self, scope_name, scope_level, parent_scope=None):
         self.symbols = {}
         self.scope_level = scope_level
-        self._init_builtins()
+        self.nlocals = 0 # Variables get slots 0, 1, ... in the order they are declared
         self.scope_name = scope_name
         self.parent_scope = parent_scope
-
-    def _init_builtins(self):
-        self.insert(BuiltinTypeSymbol('int'))
-        self.insert(BuiltinTypeSymbol('str'))
-        self.insert(BuiltinTypeSymbol('bool'))
+        # Symbols found in outer scopes by name. Only the innermost scope
+        # gets new symbols, so an outer scope never changes while an
+        # inner one that could have cached from it is still in use
+        self.cache = {}
+        self.branches = [] # If blocks of this scope being visited, outermost first
 
     def insert(self, symbol):
         symbol.scope_level = self.scope_level
+        if isinstance(symbol, VariableSymbol):
+            symbol.slot = self.nlocals
+            self.nlocals += 1
         self.symbols[symbol.name] = symbol
 
     def lookup(self, name, current_scope_only=False):
@@ -79,9 +108,22 @@ class SymbolTable(object): # Each scope has a symbol table
         if current_scope_only:
             return None
 
-        # recursively go up the chain and lookup the name
-        if self.parent_scope is not None:
-            return self.parent_scope.lookup(name)
+        symbol = self.cache.get(name)
+        if symbol is not None:
+            return symbol
+
+        # Go up the chain, every scope passed on the way caches the symbol
+        passed = [self]
+        scope = self.parent_scope
+        while scope is not None:
+            symbol = scope.symbols.get(name) or scope.cache.get(name)
+            if symbol is not None:
+                for inner in passed:
+                    inner.cache[name] = symbol
+                return symbol
+            passed.append(scope)
+            scope = scope.parent_scope
+        return None
 
     def __str__(self):
         symtab_header = 'Symbol table contents'
@@ -97,30 +139,50 @@ class SymbolTable(object): # Each scope has a symbol table
     __repr__ = __str__
 
 
-###############################
-# Semantic Analysis 
-###############################
+# The builtin types, one scope at the root of every scope chain
+class BuiltinScope(SymbolTable):
+    def __init__(self):
+        super(BuiltinScope, self).__init__(scope_name='builtins', scope_level=0)
+        for name in ('int', 'float', 'str', 'bool'):
+            SymbolTable.insert(self, BuiltinTypeSymbol(name))
 
+    def insert(self, symbol):
+        raise Exception('Error: Can not declare {} in the builtin scope'.format(symbol.name))
+
+
+builtin_scope = BuiltinScope()
 
-class NodeVisitor(object):
-    def visit(self, node):
-        method_name = 'visit_' + type(node).__name__
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
 
-    def generic_visit(self, node):
-        raise Exception('No visit_{} method'.format(type(node).__name__))
+###############################
+# Semantic Analysis 
+###############################
 
 
 class SemanticAnalyzer(NodeVisitor):
     def __init__(self, tree):
         self.current_scope = None
+        self.return_types = [] # Types returned by each function being visited
+        # (function block, index) of the params some call gives
+        # a value of unknown type
+        self.untyped_params = set()
+        # Variable symbol -> the if blocks of its scope it was declared
+        # in, outermost first. It is None where they did not run
+        self.branches = {}
         self.tree = tree
+        self.root = tree # What analyse visits
 
     def analyse(self):
         try:
-            self.visit(self.tree)
-            return 'success'
+            # A call can give a param a value of unknown type after the
+            # function was visited, visit again until no more params change
+            while True:
+                untyped = len(self.untyped_params)
+                self.current_scope = None
+                self.return_types = []
+                self.branches = {}
+                self.visit(self.root)
+                if len(self.untyped_params) == untyped:
+                    return 'success'
         except Exception as exc:
             raise exc
             return 'error'
@@ -129,41 +191,71 @@ class SemanticAnalyzer(NodeVisitor):
         raise Exception('TypeError: Invalid assignment')
     
     @staticmethod
-    def check_for_correct_type(var_type, var_value):
-        try:
-            value_type = type(var_value.value).__name__
-        except AttributeError:
-            value_type = 'int'
-
-        var_type = var_type.value
-        if value_type == var_type:
-            return True
-        return False        
+    def check_for_correct_type(var_type, value_type):
+        return value_type == ANY or value_type == var_type.value
 
     def visit_Block(self, node):
-        if self.current_scope is None: # Global scope
+        root = self.current_scope is None
+        if root: # Global scope
             glob_scope = SymbolTable(
                 scope_name='global',
                 scope_level=1,
-                parent_scope=self.current_scope, # None
+                parent_scope=builtin_scope,
             )
             self.current_scope = glob_scope
 
         for child in node.children:
             self.visit(child)
 
+        if root:
+            node.nlocals = self.current_scope.nlocals
+
+    # Visiting an expression returns its static type, 'int', 'float',
+    # 'str', 'bool' or ANY. Operations whose operand types are all known
+    # get them in node.type, the interpreter does not check those again.
     def visit_BinOp(self, node):
-        self.visit(node.left)
-        self.visit(node.right)
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        return self.binop_type(node, left, right)
+
+    def binop_type(self, node, left, right):
+        node.type, value_type = self.operation_types(node.op.value, left, right)
+        return value_type
+
+    @staticmethod
+    def operation_types(op, left, right):
+        """ (type of both operands or None, type of the value) """
+        known = right if left == ANY else left
+        # What checked_binop lets through, * and / only take ints
+        valid = known in (ANY, 'int') or (known == 'float' and op in ('+', '-')) or (
+            known == 'str' and op == '+'
+        )
+        if not valid or (ANY not in (left, right) and left != right):
+            raise Exception("Error: Can not run {} operation on types {} and {}".format(
+                op, left, right
+            ))
+        operands = None if ANY in (left, right) else known
+        if op == '/': # Of two ints
+            return operands, 'float'
+        return operands, known
 
     def visit_FuncDecl(self, node):
-        func_name = node.func_name.value
+        func_symbol = self.enter_function(node)
+        self.visit(node.block_node)                                
+        self.leave_function(func_symbol)
+
+    def enter_function(self, node):
+        params = [(param.var_node.value, param.type_node.value) for param in node.formal_params]
+        return self.declare_function(node.func_name.value, node.block_node, node.returns, params)
+
+    def declare_function(self, func_name, block, returns, params):
+        """ Enters the scope of a function, params are (name, type name) """
         func_symbol = FunctionSymbol(
             name=func_name,
-            block=node.block_node
+            block=block
         )
-        if node.returns is not None:
-            func_symbol.returns = node.returns
+        if returns is not None:
+            func_symbol.returns = returns
 
         self.current_scope.insert(func_symbol)
         func_scope = SymbolTable(
@@ -172,55 +264,88 @@ class SemanticAnalyzer(NodeVisitor):
             parent_scope=self.current_scope,
         )
         self.current_scope = func_scope
+        self.return_types.append([])
         
         # Insert formal_params into function scope
-        for param in node.formal_params:
-            param_type = self.current_scope.lookup(param.type_node.value)
-            param_name = param.var_node.value
+        for index, (param_name, type_name) in enumerate(params):
+            param_type = self.current_scope.lookup(type_name)
             var_symbol = VariableSymbol(param_name, param_type)
+            if (block, index) in self.untyped_params:
+                var_symbol.value_type = ANY
+            if self.current_scope.lookup(param_name, current_scope_only=True):
+                raise Exception(
+                    "Error: Duplicate identifier '%s' found" % param_name
+                )
             self.current_scope.insert(var_symbol)
             func_symbol.formal_params.append(var_symbol)
+        return func_symbol
 
-        self.visit(node.block_node)                                
+    def leave_function(self, func_symbol):
+        func_symbol.nlocals = self.current_scope.nlocals
         self.current_scope = self.current_scope.parent_scope # Leave function scope after visiting
 
+        # Calls have a type when every return has the same one and
+        # the function can not end without returning
+        types = self.return_types.pop()
+        if types and types.count(types[0]) == len(types) and self.always_returns(func_symbol.block):
+            func_symbol.return_type = types[0]
+        self.mark_tail_calls(func_symbol)
+
+    @staticmethod
+    def always_returns(block):
+        return always_returns(block)
+
+    @staticmethod
+    def mark_tail_calls(func_symbol):
+        mark_tail_calls(func_symbol)
+
     def visit_FuncCall(self, node):
+        self.check_call(node)
+        types = [self.visit(param) for param in node.params]
+        return self.call_type(node.func_symbol, types)
+
+    def check_call(self, node):
+        # Save this func symbol to AST to use in the Interpreter
+        node.func_symbol = self.call_symbol(node.func_name, len(node.params))
+        node.tail = False # See mark_tail_calls
+
+    def call_symbol(self, func_name, num_of_params):
         # 1. Check if the function was declared
         # 2. Check if the num of giver parameters is what the funciton is expecting
-        # 3. Check if they are of the right type
-        func_symbol = self.current_scope.lookup(node.func_name) 
+        func_symbol = self.current_scope.lookup(func_name) 
 
         if func_symbol is None:
-            raise Exception("Error: Function {} is not declared".format(node.func_name))
-
-        # Save this func symbol to AST to use in the Interpreter
-        node.func_symbol = func_symbol
+            raise Exception("Error: Function {} is not declared".format(func_name))
           
         # Check if num of given params matches num of formal (declared) params
-        num_of_params = len(node.params) 
         if len(func_symbol.formal_params) != num_of_params: 
             raise Exception("Error: Function {} was expecting {} params but got {}".format(
-                node.func_name, len(func_symbol.formal_params), num_of_params
+                func_name, len(func_symbol.formal_params), num_of_params
             ))
-        
-        for actual_param, formal_param in zip(node.params, func_symbol.formal_params):
-            if isinstance(actual_param, Variable):
-                self.visit(actual_param)
-                continue
-            elif isinstance(actual_param, BinOp) and formal_param.type.name != 'int':
-                raise Exception("Error: Type of given arg doesn't match defined arg")
-            elif isinstance(actual_param, BinOp) and formal_param.type.name == 'int':
-                continue
+        return func_symbol
 
-            elif type(actual_param.value).__name__ != formal_param.type.name: # 'str' or 'bool'...
-                print('wrong: ', type(actual_param.value).__name__ , formal_param.type.name)
+    def call_type(self, func_symbol, types):
+        # 3. Check if they are of the right type
+        for index, (actual_type, formal_param) in enumerate(zip(types, func_symbol.formal_params)):
+            if actual_type == ANY:
+                if formal_param.value_type != ANY:
+                    self.untyped_params.add((func_symbol.block, index))
+            elif actual_type != formal_param.type.name:
                 raise Exception("Error: Type of given arg doesn't match defined arg")
-
+        return func_symbol.return_type
 
     def visit_Assign(self, node):
-        type_name = node.type.value
+        value_type = self.visit(node.value)
+        self.assign(node, value_type)
+
+    def assign(self, node, value_type):
+        var_symbol = self.declare_variable(node.name.value, node.type, value_type)
+        node.name.depth = 0
+        node.name.slot = var_symbol.slot
+
+    def declare_variable(self, var_name, var_type, value_type):
+        type_name = var_type.value
         type_symbol = self.current_scope.lookup(type_name)
-        var_name = node.name.value
         var_symbol = VariableSymbol(var_name, type_symbol)
 
         if self.current_scope.lookup(var_name, current_scope_only=True): # Check for duplicate symbols
@@ -228,26 +353,56 @@ class SemanticAnalyzer(NodeVisitor):
                 "Error: Duplicate identifier '%s' found" % var_name
             )   
 
-        if not self.check_for_correct_type(node.type, node.value):
+        if not self.check_for_correct_type(var_type, value_type):
             raise Exception(
                 'TypeError: Variableiable {var} is not of type {type}'.format(var=var_name, type=type_name)      
             )
 
+        if value_type == ANY: # Only checked when it is used
+            var_symbol.value_type = ANY
+        if self.current_scope.branches:
+            self.branches[var_symbol] = tuple(self.current_scope.branches)
         self.current_scope.insert(var_symbol)
+        return var_symbol
 
     
     def visit_Returns(self, node):
-        returns = node.returns
-        for node in returns:
-            self.visit(node)
+        types = [self.visit(item) for item in node.returns]
+        self.add_returns(types)
+
+    def add_returns(self, types):
+        # Returns outside of functions fail when they are run
+        if self.return_types:
+            self.return_types[-1].append(types[0] if len(types) == 1 else ANY)
 
     def visit_Variable(self, node):
-        var_name = node.value
+        var_symbol = self.variable_symbol(node.value)
+        # The interpreter follows depth access links and reads the slot
+        node.depth = self.current_scope.scope_level - var_symbol.scope_level
+        node.slot = var_symbol.slot
+        return self.read_type(var_symbol)
+
+    def read_type(self, var_symbol):
+        """ Static type of a read of var_symbol here, ANY when it may
+            not be set: it was declared in an if block that is not
+            being visited, or in one of an outer scope """
+        branches = self.branches.get(var_symbol)
+        if branches is not None and (
+            var_symbol.scope_level != self.current_scope.scope_level or
+            tuple(self.current_scope.branches[:len(branches)]) != branches
+        ):
+            return ANY
+        return var_symbol.value_type
+
+    def variable_symbol(self, var_name):
         var_symbol = self.current_scope.lookup(var_name)
         if var_symbol is None:
             raise Exception(
                 "Error: Symbol(identifier) not found '%s'" % var_name
             ) 
+        if not isinstance(var_symbol, VariableSymbol):
+            raise Exception("Error: '%s' is not a variable" % var_name)
+        return var_symbol
     
     def visit_Print(self, node):
         for arg in node.args:
@@ -255,37 +410,396 @@ class SemanticAnalyzer(NodeVisitor):
  
     def visit_IfStatement(self, node):
         self.visit(node.value)
+        branches = self.current_scope.branches
+        branches.append(node.block)
         self.visit(node.block)
+        branches.pop()
         if node.elseblock:
+            branches.append(node.elseblock)
             self.visit(node.elseblock)
+            branches.pop()
 
     def visit_Comparison(self, node):
-        self.visit(node.left)
-        self.visit(node.right)
+        left = self.visit(node.left)
+        right = None
+        if node.right is not None:
+            right = self.visit(node.right)
+        return self.comparison_type(node, left, right)
+
+    def comparison_type(self, node, left, right):
+        node.type = self.compared_type(node.op and node.op.value, left, right)
+        return 'bool'
+
+    @staticmethod
+    def compared_type(op, left, right):
+        """ Type of both sides or None """
+        if op is None: # Condition with just a value
+            return None if left == ANY else left
+        if op != '==' and ANY not in (left, right) and left != right:
+            raise Exception("Error: Can not compare types {} and {} with {}".format(
+                left, right, op
+            ))
+        return left if ANY not in (left, right) and left == right else None
+
+    def visit_UnaryOp(self, node):
+        return self.unary_type(node.op.value, self.visit(node.expr))
+
+    @staticmethod
+    def unary_type(op, value):
+        if value not in (ANY, 'int', 'float'):
+            raise Exception("Error: Can not run {} operation on type {}".format(
+                op, value
+            ))
+        return value
 
     def visit_Number(self, node):
         value = node.value
-        if not isinstance(value, int) and not isinstance(value, float):
+        if isinstance(value, float):
+            return 'float'
+        if not isinstance(value, int):
             raise Exception("TypeError: '%s' is not a Number" % value)
+        return 'int'
 
     def visit_String(self, node):
         value = node.value
         if not isinstance(value, str):
             raise Exception("TypeError: '%s' is not a String" % value)
+        return 'str'
 
     def visit_Boolean(self, node):
         value = node.value
         if not isinstance(value, bool):
             raise Exception("TypeError: '%s' is not a Boolean" % value)
+        return 'bool'
 
     def visit_Empty(self, node):
         # Nothing to do on empty statement
         pass
 
 
+def always_returns(block):
+    """ True when every way through block ends with a return """
+    pending = [block]
+    while pending:
+        children = [child for child in pending.pop().children if not isinstance(child, Empty)]
+        if not children:
+            return False
+        last = children[-1]
+        if isinstance(last, IfStatement) and last.elseblock is not None:
+            pending.append(last.block)
+            pending.append(last.elseblock)
+        elif not isinstance(last, Returns):
+            return False
+    return True
+
+
+def mark_tail_calls(func_symbol):
+    """ Sets tail on the calls of the function to itself that are the
+        only value of a return nothing can run after. The interpreter
+        runs those again in the same activation record. """
+    pending = [func_symbol.block]
+    while pending:
+        children = [
+            child for child in pending.pop().children
+            if not isinstance(child, (Empty, FuncDecl))
+        ]
+        if not children:
+            continue
+        last = children[-1]
+        if isinstance(last, IfStatement):
+            pending.append(last.block)
+            if last.elseblock is not None:
+                pending.append(last.elseblock)
+        elif isinstance(last, Returns) and len(last.returns) == 1:
+            call = last.returns[0]
+            if isinstance(call, FuncCall) and call.func_symbol is func_symbol:
+                call.tail = True
 
 
+###############################
+# Explicit Stack Analysis
+###############################
 
 
+# Same checks as SemanticAnalyzer, but the nodes that nest yield their
+# children to trampoline.run instead of visiting them recursively
+class StackSemanticAnalyzer(SemanticAnalyzer):
+    max_depth = MAX_DEPTH
 
+    def visit(self, node):
+        return run(node, self.start, self.max_depth)
 
+    def start(self, node):
+        return super(StackSemanticAnalyzer, self).visit(node)
+
+    def visit_Block(self, node):
+        root = self.current_scope is None
+        if root: # Global scope
+            self.current_scope = SymbolTable(
+                scope_name='global',
+                scope_level=1,
+                parent_scope=builtin_scope,
+            )
+
+        for child in node.children:
+            yield child
+
+        if root:
+            node.nlocals = self.current_scope.nlocals
+
+    def visit_BinOp(self, node):
+        left = yield node.left
+        right = yield node.right
+        return self.binop_type(node, left, right)
+
+    def visit_UnaryOp(self, node):
+        value = yield node.expr
+        return self.unary_type(node.op.value, value)
+
+    def visit_Comparison(self, node):
+        left = yield node.left
+        right = None
+        if node.right is not None:
+            right = yield node.right
+        return self.comparison_type(node, left, right)
+
+    def visit_FuncDecl(self, node):
+        func_symbol = self.enter_function(node)
+        yield node.block_node
+        self.leave_function(func_symbol)
+
+    def visit_FuncCall(self, node):
+        self.check_call(node)
+        types = []
+        for param in node.params:
+            value_type = yield param
+            types.append(value_type)
+        return self.call_type(node.func_symbol, types)
+
+    def visit_Assign(self, node):
+        value_type = yield node.value
+        self.assign(node, value_type)
+
+    def visit_Returns(self, node):
+        types = []
+        for item in node.returns:
+            value_type = yield item
+            types.append(value_type)
+        self.add_returns(types)
+
+    def visit_Print(self, node):
+        for arg in node.args:
+            yield arg
+
+    def visit_IfStatement(self, node):
+        yield node.value
+        branches = self.current_scope.branches
+        branches.append(node.block)
+        yield node.block
+        branches.pop()
+        if node.elseblock:
+            branches.append(node.elseblock)
+            yield node.elseblock
+            branches.pop()
+
+
+###############################
+# Flat Tree Analysis
+###############################
+
+
+# Same checks as SemanticAnalyzer on the arrays of a FlatTree. What the
+# analyser sets on nodes goes to the info columns of the tree instead,
+# see flat.info_layouts, and function symbols to flat.symbols
+class FlatSemanticAnalyzer(SemanticAnalyzer):
+    def __init__(self, flat):
+        super(FlatSemanticAnalyzer, self).__init__(flat)
+        self.flat = flat
+        self.root = flat.root
+        self.kinds = flat.kinds
+        self.columns = flat.columns
+        self.items = flat.items
+        self.constants = flat.constants
+        self.symbol_index = {} # Function symbol -> its index in flat.symbols
+        self.kind_methods = kind_table(type(self))
+
+    def visit(self, index):
+        return self.kind_methods[self.kinds[index]](self, index)
+
+    def list(self, index, column):
+        """ Node indices of the list in column and the one after it """
+        start = self.columns[column][index]
+        count = self.columns[column + 1][index]
+        if count < 0:
+            return None
+        return self.items[start:start + count]
+
+    def flat_Block(self, index):
+        root = self.current_scope is None
+        if root: # Global scope, new symbols and info for each visit
+            self.current_scope = SymbolTable(
+                scope_name='global',
+                scope_level=1,
+                parent_scope=builtin_scope,
+            )
+            flat = self.flat
+            flat.info = tuple(array('i', [-1]) * len(flat) for _ in range(2))
+            flat.symbols = []
+            self.symbol_index = {}
+
+        for child in self.list(index, 0):
+            self.visit(child)
+
+        if root:
+            self.flat.nlocals = self.current_scope.nlocals
+
+    def flat_Number(self, index):
+        value = self.constants[self.columns[0][index]]
+        if isinstance(value, float):
+            return 'float'
+        return 'int'
+
+    def flat_String(self, index):
+        return 'str'
+
+    def flat_Boolean(self, index):
+        return 'bool'
+
+    def flat_Variable(self, index):
+        var_symbol = self.variable_symbol(self.constants[self.columns[0][index]])
+        depths, slots = self.flat.info
+        depths[index] = self.current_scope.scope_level - var_symbol.scope_level
+        slots[index] = var_symbol.slot
+        return self.read_type(var_symbol)
+
+    def flat_BinOp(self, index):
+        columns = self.columns
+        left = self.visit(columns[0][index])
+        right = self.visit(columns[2][index])
+        op = self.constants[columns[1][index]].value
+        operands, value_type = self.operation_types(op, left, right)
+        self.set_type(index, operands)
+        return value_type
+
+    def flat_Comparison(self, index):
+        columns = self.columns
+        left = self.visit(columns[0][index])
+        right = None
+        if columns[2][index] >= 0:
+            right = self.visit(columns[2][index])
+        op = self.constants[columns[1][index]]
+        self.set_type(index, self.compared_type(op and op.value, left, right))
+        return 'bool'
+
+    def set_type(self, index, type_name):
+        self.flat.info[0][index] = -1 if type_name is None else self.flat.constant(type_name)
+
+    def flat_UnaryOp(self, index):
+        columns = self.columns
+        value = self.visit(columns[1][index])
+        return self.unary_type(self.constants[columns[0][index]].value, value)
+
+    def flat_Assign(self, index):
+        columns = self.columns
+        value_type = self.visit(columns[2][index])
+        name = columns[0][index]
+        var_symbol = self.declare_variable(
+            self.constants[columns[0][name]], self.constants[columns[1][index]], value_type
+        )
+        depths, slots = self.flat.info
+        depths[name] = 0
+        slots[name] = var_symbol.slot
+
+    def flat_Print(self, index):
+        for arg in self.list(index, 0):
+            self.visit(arg)
+
+    def flat_IfStatement(self, index):
+        columns = self.columns
+        self.visit(columns[0][index])
+        branches = self.current_scope.branches
+        for branch in (columns[1][index], columns[2][index]):
+            if branch >= 0:
+                branches.append(branch)
+                self.visit(branch)
+                branches.pop()
+
+    def flat_FuncDecl(self, index):
+        columns = self.columns
+        constants = self.constants
+        params = [
+            (constants[columns[0][columns[0][param]]], constants[columns[1][param]].value)
+            for param in self.list(index, 1)
+        ]
+        block = columns[3][index]
+        returns = self.list(index, 4)
+        func_symbol = self.declare_function(
+            constants[columns[0][columns[0][index]]], block,
+            None if returns is None else returns.tolist(), params
+        )
+        self.visit(block)
+        self.leave_function(func_symbol)
+
+    def flat_FuncCall(self, index):
+        params = self.list(index, 1)
+        func_symbol = self.call_symbol(self.constants[self.columns[0][index]], len(params))
+        # Save this func symbol to the tree to use in the Interpreter
+        symbols, tails = self.flat.info
+        if func_symbol not in self.symbol_index:
+            self.symbol_index[func_symbol] = len(self.flat.symbols)
+            self.flat.symbols.append(func_symbol)
+        symbols[index] = self.symbol_index[func_symbol]
+        tails[index] = 0 # See mark_tail_calls
+        types = [self.visit(param) for param in params]
+        return self.call_type(func_symbol, types)
+
+    def flat_Returns(self, index):
+        self.add_returns([self.visit(item) for item in self.list(index, 0)])
+
+    def flat_Empty(self, index):
+        pass
+
+    def statements(self, block):
+        """ Statements of block but empty ones and function declarations """
+        kinds = self.kinds
+        return [
+            child for child in self.list(block, 0)
+            if kinds[child] != EMPTY and kinds[child] != FUNCDECL
+        ]
+
+    def always_returns(self, block):
+        """ True when every way through block ends with a return """
+        kinds = self.kinds
+        columns = self.columns
+        pending = [block]
+        while pending:
+            children = [child for child in self.list(pending.pop(), 0) if kinds[child] != EMPTY]
+            if not children:
+                return False
+            last = children[-1]
+            if kinds[last] == IFSTATEMENT and columns[2][last] >= 0:
+                pending.append(columns[1][last])
+                pending.append(columns[2][last])
+            elif kinds[last] != RETURNS:
+                return False
+        return True
+
+    def mark_tail_calls(self, func_symbol):
+        """ Like mark_tail_calls, in the tail column """
+        kinds = self.kinds
+        columns = self.columns
+        symbols, tails = self.flat.info
+        pending = [func_symbol.block]
+        while pending:
+            children = self.statements(pending.pop())
+            if not children:
+                continue
+            last = children[-1]
+            if kinds[last] == IFSTATEMENT:
+                pending.append(columns[1][last])
+                if columns[2][last] >= 0:
+                    pending.append(columns[2][last])
+            elif kinds[last] == RETURNS and columns[1][last] == 1:
+                call = self.items[columns[0][last]]
+                if kinds[call] == FUNCCALL and self.flat.symbols[symbols[call]] is func_symbol:
+                    tails[call] = 1
@@ -0,0 +1,257 @@
+import gc
+import marshal
+import struct
+import sys
+import zlib
+from array import array
+from collections import deque
+from itertools import islice, repeat
+
+from . import ast
+from .ast import fields
+from .cache import source_key
+from .lexer import Token
+from .semantic_analyser import (
+    Symbol,
+    BuiltinTypeSymbol,
+    VariableSymbol,
+    FunctionSymbol
+)
+
+#######################################
+#######################################
+# COMPILED PROGRAMS
+#######################################
+#######################################
+
+"""
+File layout, little endian:
+    magic           4s   b'INTP'
+    version         H    FORMAT_VERSION
+    marshal version B
+    source hash     32s  sha256 of the source text
+    payload length  I
+    payload crc32   I
+    payload              marshal data, see encode
+
+Loading checks every header field and only creates
+objects of the classes listed in serializable.
+"""
+
+MAGIC = b'INTP'
+FORMAT_VERSION = 6
+MARSHAL_VERSION = 4
+header = struct.Struct('<4sHB32sII')
+
+# Classes that can be stored, by name
+serializable = {
+    cls.__name__: cls for cls in (
+        [getattr(ast, name) for name in dir(ast)
+         if isinstance(getattr(ast, name), type) and issubclass(getattr(ast, name), ast.AST)] +
+        [Token, Symbol, BuiltinTypeSymbol, VariableSymbol, FunctionSymbol]
+    )
+}
+plain_types = (int, float, str, bool, type(None))
+# Never changed once created, equal ones are stored once
+value_classes = (Token, BuiltinTypeSymbol, ast.Empty)
+
+
+def dumps(tree, source):
+    """ Analysed tree of source -> bytes """
+    payload = marshal.dumps(encode(tree), MARSHAL_VERSION)
+    return header.pack(
+        MAGIC, FORMAT_VERSION, MARSHAL_VERSION, source_key(source),
+        len(payload), zlib.crc32(payload)
+    ) + payload
+
+
+def loads(data, source=None):
+    """ bytes -> analysed tree, when source is given it has
+        to be the text the program was compiled from """
+    if len(data) < header.size:
+        raise Exception('Error: Not a compiled program')
+    magic, version, marshal_version, digest, length, crc = header.unpack_from(data)
+    if magic != MAGIC:
+        raise Exception('Error: Not a compiled program')
+    if version != FORMAT_VERSION or marshal_version != MARSHAL_VERSION:
+        raise Exception('Error: Compiled program has version {}.{}, expected {}.{}'.format(
+            version, marshal_version, FORMAT_VERSION, MARSHAL_VERSION
+        ))
+    payload = data[header.size:]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise Exception('Error: Compiled program is corrupt')
+    if source is not None and source_key(source) != digest:
+        raise Exception('Error: Compiled program does not match its source')
+
+    # Nothing created while decoding is garbage, collecting
+    # in between only walks the growing object table
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return decode(marshal.loads(payload))
+    except Exception as exc:
+        raise Exception('Error: Compiled program is corrupt ({})'.format(exc))
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def dump(tree, source, f):
+    f.write(dumps(tree, source))
+
+
+def load(f, source=None):
+    return loads(f.read(), source)
+
+
+def is_compiled(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+# The object graph becomes flat tables so loading can build it with
+# C level loops (map) instead of a Python loop per node. Objects are
+# grouped by class and attribute names, each attribute is a column.
+# Columns of references hold indices into the object table, which is
+# None, then every group in order, then every list. Indices keep
+# shared objects and cycles (a function calling itself) intact.
+def encode(root):
+    # Find every object
+    seen = {id(root)}
+    found = [root]
+    lists = []
+    values = {} # Contents of a value object -> id of the one that is stored
+    aliases = {} # id of a duplicate -> id of the stored one
+    attrs = {id(root): dict(fields(root))}
+    i = 0
+    while i < len(found): # found grows while it is walked
+        obj = found[i]
+        i += 1
+        name = type(obj).__name__
+        if serializable.get(name) is not type(obj):
+            raise Exception('Error: Can not serialize {}'.format(name))
+        for value in attrs[id(obj)].values():
+            if isinstance(value, list):
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    lists.append(value)
+                items = value
+            else:
+                items = (value,)
+            for item in items:
+                if isinstance(item, plain_types) or id(item) in seen:
+                    continue
+                seen.add(id(item))
+                item_attrs = attrs[id(item)] = dict(fields(item))
+                if isinstance(item, value_classes):
+                    contents = (type(item), tuple(
+                        (attr, type(attr_value), attr_value) for attr, attr_value in item_attrs.items()
+                    ))
+                    if contents in values:
+                        aliases[id(item)] = values[contents]
+                        continue
+                    values[contents] = id(item)
+                found.append(item)
+
+    groups = {}
+    for obj in found:
+        key = (type(obj).__name__, tuple(attrs[id(obj)]))
+        groups.setdefault(key, []).append(obj)
+
+    index = {id(None): 0}
+    for members in groups.values():
+        for obj in members:
+            index[id(obj)] = len(index)
+    # Lists of the same length are built together
+    lists.sort(key=len)
+    for items in lists:
+        index[id(items)] = len(index)
+    for duplicate, stored in aliases.items():
+        index[duplicate] = index[stored]
+
+    class_names = sorted(set(name for name, _ in groups))
+    encoded_groups = []
+    for (name, names), members in groups.items():
+        columns = []
+        for field in names:
+            values = [attrs[id(obj)][field] for obj in members]
+            if all(isinstance(value, plain_types) for value in values):
+                columns.append(tuple(values))
+            else:
+                try:
+                    refs = [index[id(value)] for value in values]
+                except KeyError:
+                    raise Exception('Error: Can not serialize {}.{}'.format(name, field))
+                columns.append(pack_indices(refs))
+        encoded_groups.append(
+            (class_names.index(name), len(members), names, tuple(columns))
+        )
+
+    lengths = [] # (length, number of lists)
+    items = []
+    for value in lists:
+        if lengths and lengths[-1][0] == len(value):
+            lengths[-1] = (len(value), lengths[-1][1] + 1)
+        else:
+            lengths.append((len(value), 1))
+        for item in value:
+            if isinstance(item, (list,) + plain_types):
+                raise Exception('Error: Can not serialize lists of values')
+            items.append(index[id(item)])
+
+    return (
+        tuple(class_names), tuple(encoded_groups),
+        tuple(lengths), pack_indices(items), index[id(root)]
+    )
+
+
+def decode(data):
+    class_names, groups, lengths, items, root = data
+    classes = []
+    for name in class_names:
+        if name not in serializable:
+            raise Exception('unknown class {}'.format(name))
+        classes.append(serializable[name])
+
+    # Create everything first, then link it up
+    new = object.__new__
+    objects = [None]
+    for code, count, _, _ in groups:
+        objects.extend(map(new, repeat(classes[code], count)))
+
+    flat = map(objects.__getitem__, unpack_indices(items))
+    for length, count in lengths:
+        if length == 0:
+            objects.extend(map(list, repeat((), count)))
+        else:
+            # Takes length items from flat for every list
+            objects.extend(map(list, islice(zip(*[flat] * length), count)))
+
+    get = objects.__getitem__
+    start = 1
+    for _, count, names, columns in groups:
+        members = objects[start:start + count]
+        start += count
+        for field, column in zip(names, columns):
+            if not isinstance(column, tuple):
+                column = map(get, unpack_indices(column))
+            deque(map(setattr, members, repeat(field), column), maxlen=0)
+
+    tree = objects[root]
+    if not isinstance(tree, ast.Block):
+        raise Exception('root is not a Block')
+    return tree
+
+
+def pack_indices(values):
+    values = array('I', values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_indices(data):
+    values = array('I')
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
@@ -0,0 +1,61 @@
+import sys
+from types import GeneratorType
+
+#######################################
+#######################################
+# TRAMPOLINE
+#######################################
+#######################################
+
+# Nesting is limited by this many suspended steps instead of the
+# Python stack, each one costs a generator frame (a few hundred bytes)
+MAX_DEPTH = 500000
+
+
+def _step():
+    yield
+
+
+# Memory of one suspended step, a generator and its frame
+_suspended = _step()
+next(_suspended)
+STEP_BYTES = sys.getsizeof(_suspended)
+del _suspended
+
+
+# Runs nested steps without Python recursion. start(item) returns either
+# a value or a generator; a generator yields the items it needs worked
+# out and gets their values sent back, its return value goes to the
+# generator that asked for it. The suspended generators are kept in
+# stack, pass a list to see how deep it is while it runs.
+def run(item, start, max_depth=MAX_DEPTH, stack=None):
+    value = start(item)
+    if not isinstance(value, GeneratorType):
+        return value
+
+    if stack is None:
+        stack = []
+    stack.append(value)
+    value = None
+    while stack:
+        try:
+            item = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+            continue
+
+        value = start(item)
+        if isinstance(value, GeneratorType):
+            if len(stack) >= max_depth:
+                raise Exception(
+                    'Error: Maximum nesting depth of {} exceeded'.format(max_depth)
+                )
+            stack.append(value)
+            value = None
+
+    return value
+
+
+def identity(item):
+    return item
@@ -0,0 +1,263 @@
+from functools import lru_cache
+
+from .ast import AST, IfStatement, FuncDecl, FuncCall, Returns, Empty, Variable, fields
+from .interpreter import NodeVisitor, Interpreter
+
+#######################################
+#######################################
+# PYTHON TRANSPILER
+#######################################
+#######################################
+
+"""
+Turns an analysed tree into Python source, CPython compiles and runs it.
+The program becomes the body of one function, so variables are fast
+locals and functions are nested defs that see the scopes they were
+declared in.
+
+Names get the level of their scope (a_1, a_2), so a variable never
+hides one of an outer scope it is read from. Functions get a number,
+two functions in one scope can have the same name.
+
+The last return a call runs is what it returns, so returns only set
+returns_ and the function returns it at the end. A return that is the
+last statement of the body always runs last and returns directly.
+"""
+
+INDENT = '    '
+
+
+@lru_cache(maxsize=256)
+def compile_source(source):
+    return compile(source, '<program>', 'exec')
+
+
+def global_returns(values):
+    raise Exception('Error: Invalid syntax')
+
+
+class PythonProgram(object):
+    def __init__(self, source, constants):
+        self.source = source
+        self.constants = constants # BinOps checked at run time, by name
+        self.code = compile_source(source)
+
+    def run(self):
+        namespace = {
+            'checked_binop': Interpreter.checked_binop,
+            'print_args': Interpreter.print_args,
+            'global_returns': global_returns,
+        }
+        namespace.update(self.constants)
+        exec(self.code, namespace)
+        return 'success'
+
+
+class Transpiler(NodeVisitor):
+    def __init__(self, tree):
+        self.tree = tree
+        self.lines = []
+        self.indent = 1
+        self.level = 1 # Scope level of the code being written
+        self.constants = {}
+        self.functions = {} # id of a function block -> its Python name
+
+    def transpile(self):
+        """ Python source of the program """
+        self.lines.append('def program():')
+        self.scope(self.tree)
+        self.lines.append('program()')
+        return '\n'.join(self.lines) + '\n'
+
+    def compile(self):
+        source = self.transpile()
+        return PythonProgram(source, self.constants)
+
+    def line(self, text):
+        self.lines.append(INDENT * self.indent + text)
+
+    def variable(self, name, depth):
+        return '{}_{}'.format(name, self.level - depth)
+
+    def function(self, name, block):
+        key = id(block)
+        if key not in self.functions:
+            self.functions[key] = '{}_f{}'.format(name, len(self.functions))
+        return self.functions[key]
+
+    def scope(self, block, last_returns=False, nparams=0):
+        """ Body of the program or of a function. Its functions are
+            defined first and its variables but the params start as
+            None, like unset slots do """
+        start = len(self.lines)
+        names = scope_variables(block)
+        declared = sorted(
+            self.variable(name, 0) for slot, name in names.items() if slot >= nparams
+        )
+        if declared:
+            self.line(' = '.join(declared) + ' = None')
+
+        self.declare_functions(block)
+        children = block.children
+        if last_returns and children and isinstance(children[-1], Returns):
+            self.block(children[:-1])
+            self.line('return {}'.format(self.returns(children[-1])))
+        else:
+            self.block(children)
+        if len(self.lines) == start:
+            self.line('pass')
+
+    def declare_functions(self, block):
+        pending = [block]
+        while pending:
+            node = pending.pop()
+            for child in node.children:
+                if isinstance(child, FuncDecl):
+                    self.visit(child)
+                elif isinstance(child, IfStatement):
+                    pending.append(child.block)
+                    if child.elseblock is not None:
+                        pending.append(child.elseblock)
+
+    def block(self, children):
+        for child in children:
+            if isinstance(child, FuncCall): # What it returns is not used
+                self.line(self.visit(child))
+            elif not isinstance(child, (FuncDecl, Empty)):
+                self.visit(child)
+
+    def visit_Block(self, node):
+        start = len(self.lines)
+        self.block(node.children)
+        if len(self.lines) == start:
+            self.line('pass')
+
+    def visit_FuncDecl(self, node):
+        self.level += 1
+        params = ', '.join(
+            self.variable(param.var_node.value, 0) for param in node.formal_params
+        )
+        name = self.function(node.func_name.value, node.block_node)
+        self.line('def {}({}):'.format(name, params))
+        self.indent += 1
+        children = node.block_node.children
+        ends_with_returns = bool(children) and isinstance(children[-1], Returns)
+        returns = any(isinstance(child, Returns) for child in children[:-1]) or (
+            has_nested_returns(node.block_node)
+        )
+        if returns:
+            self.line('returns_ = None')
+        self.scope(node.block_node, last_returns=True, nparams=len(node.formal_params))
+        if returns and not ends_with_returns:
+            self.line('return returns_')
+        self.indent -= 1
+        self.level -= 1
+
+    def visit_Number(self, node):
+        return repr(node.value)
+
+    def visit_String(self, node):
+        return repr(node.value)
+
+    def visit_Boolean(self, node):
+        return repr(node.value)
+
+    def visit_Variable(self, node):
+        return self.variable(node.value, node.depth)
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if node.type is None: # Types only known at run time
+            name = 'binop_{}'.format(len(self.constants))
+            self.constants[name] = node
+            return 'checked_binop({}, {}, {})'.format(name, left, right)
+        return '({} {} {})'.format(left, node.op.value, right)
+
+    def visit_UnaryOp(self, node):
+        return '({}{})'.format(node.op.value, self.visit(node.expr))
+
+    def visit_Comparison(self, node):
+        left = self.visit(node.left)
+        if node.op is None: # Condition with just a value
+            return left
+        return '({} {} {})'.format(left, node.op.value, self.visit(node.right))
+
+    def visit_Assign(self, node):
+        self.line('{} = {}'.format(self.variable(node.name.value, 0), self.visit(node.value)))
+
+    def visit_IfStatement(self, node):
+        self.line('if {}:'.format(self.visit(node.value)))
+        self.indent += 1
+        self.visit(node.block)
+        self.indent -= 1
+        if node.elseblock is not None:
+            self.line('else:')
+            self.indent += 1
+            self.visit(node.elseblock)
+            self.indent -= 1
+
+    def visit_Print(self, node):
+        self.line('print_args([{}])'.format(', '.join(self.visit(arg) for arg in node.args)))
+
+    def returns(self, node):
+        """ What a call that ran node returns """
+        values = [self.visit(item) for item in node.returns]
+        if len(values) == 1:
+            return values[0]
+        return '[{}]'.format(', '.join(values))
+
+    def visit_Returns(self, node):
+        if self.level == 1:
+            self.line('global_returns([{}])'.format(
+                ', '.join(self.visit(item) for item in node.returns)
+            ))
+        else:
+            self.line('returns_ = {}'.format(self.returns(node)))
+
+    def visit_FuncCall(self, node):
+        func_symbol = node.func_symbol
+        return '{}({})'.format(
+            self.function(func_symbol.name, func_symbol.block),
+            ', '.join(self.visit(param) for param in node.params)
+        )
+
+
+def scope_variables(block):
+    """ Slot -> name of the variables of the scope of block that are
+        set or read in it or in the functions declared in it. The
+        optimizer can remove where a variable is set but not every read """
+    names = {}
+    pending = [(block, 0)] # (node, functions between it and block)
+    while pending:
+        node, nesting = pending.pop()
+        if isinstance(node, list):
+            pending.extend((item, nesting) for item in node)
+        elif isinstance(node, Variable):
+            if node.depth == nesting:
+                names[node.slot] = node.value
+        elif isinstance(node, FuncDecl):
+            pending.append((node.block_node, nesting + 1))
+        elif isinstance(node, AST):
+            pending.extend((value, nesting) for _, value in fields(node))
+    return names
+
+
+def has_nested_returns(block):
+    """ True when an if block in block has a return """
+    pending = [child for child in block.children if isinstance(child, IfStatement)]
+    while pending:
+        node = pending.pop()
+        for branch in (node.block, node.elseblock):
+            if branch is None:
+                continue
+            for child in branch.children:
+                if isinstance(child, Returns):
+                    return True
+                if isinstance(child, IfStatement):
+                    pending.append(child)
+    return False
+
+
+def transpile(tree):
+    return Transpiler(tree).compile()
@@ -0,0 +1,62 @@
+from .ast import AST
+
+#######################################
+#######################################
+# NODE VISITOR
+#######################################
+#######################################
+
+"""
+visit looks the method for a node up in a table of its class, node
+class -> function, instead of building 'visit_' + name and calling
+getattr on every node. The table is made when the class is created,
+so a subclass gets its own with its overrides in it. Methods added to
+a class after that are not seen.
+"""
+
+
+def node_classes():
+    """ Every AST class """
+    classes = []
+    pending = [AST]
+    while pending:
+        cls = pending.pop()
+        classes.append(cls)
+        pending.extend(cls.__subclasses__())
+    return classes
+
+
+def dispatch_table(cls, prefix='visit_'):
+    """ Node class -> the function of cls named prefix + its name """
+    table = {}
+    for node_class in node_classes():
+        method = getattr(cls, prefix + node_class.__name__, None)
+        if method is not None:
+            table[node_class] = method
+    return table
+
+
+class NodeVisitor(object):
+    dispatch = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.dispatch = dispatch_table(cls)
+
+    def visit(self, node):
+        method = self.dispatch.get(type(node))
+        if method is None:
+            return self.generic_visit(node)
+        return method(self, node)
+
+    def generic_visit(self, node):
+        raise Exception('No visit_{} method'.format(type(node).__name__))
+
+
+def make_visitor(name, methods, base=NodeVisitor):
+    """ Visitor class for a new pass, methods maps node
+        classes to functions of (visitor, node) """
+    namespace = {
+        'visit_' + node_class.__name__: method for node_class, method in methods.items()
+    }
+    return type(name, (base,), namespace)
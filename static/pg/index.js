@@ -20,6 +20,8 @@ document.getElementById("main-input").addEventListener("keydown", function (e) {
 
 const api_url = 'http://localhost:5000';
 const stdout_text = '/ts$ ';
+// Lets the server re-parse only what changed since the last run
+const session_id = Math.random().toString(36).slice(2);
 
 const runCode = async () => {
   let code = document.getElementById('main-input').value;
@@ -58,7 +60,7 @@ const runInterpreter = async (code) => {
       'Content-Type': 'application/json'
     },
     method: "POST",
-    body: JSON.stringify({ 'code': code })
+    body: JSON.stringify({ 'code': code, 'session_id': session_id })
   });
   const json = await response.json();
   return json
@@ -0,0 +1,107 @@
+import pytest
+from interpreter.interpreter import Interpreter
+from interpreter.bytecode import compile_tree, disassemble
+from test_interpreter import analysed
+from test_interpreter.test_closures import programs as closure_programs
+from test_interpreter.test_optimizer import programs as optimizer_programs
+
+
+programs = closure_programs + optimizer_programs + [
+    """
+    function show(a: int) {
+        print(a);
+    }
+    show(1);
+    if (True) { show(2); }
+    """,
+    """
+    function outer(a: int) {
+        b: int = a * 2;
+        function inner(c: int) {
+            if (c > 0) {
+                return(b + inner(c - 1));
+            } else {
+                return(0);
+            }
+        }
+        return(inner(a));
+    }
+    print(outer(3), ' ', outer(1));
+    """,
+]
+
+
+@pytest.mark.parametrize('text', programs)
+def test_bytecode_same_output(text, capsys):
+    Interpreter(analysed(text)).interpret()
+    expected = capsys.readouterr().out
+    assert Interpreter(analysed(text)).interpret(engine='bytecode') == 'success'
+    assert capsys.readouterr().out == expected
+
+
+def test_bytecode_program_runs_again(capsys):
+    program = compile_tree(analysed('a: int = 1; print(a + 1);'))
+    program.run()
+    program.run()
+    assert capsys.readouterr().out == '2\n2\n'
+
+
+def test_bytecode_deep_recursion(capsys):
+    # Calls do not use the Python stack
+    program = compile_tree(analysed("""
+        function count(n: int) {
+            if (n == 0) {
+                return(0);
+            } else {
+                return(1 + count(n - 1));
+            }
+        }
+        print(count(5000));
+    """))
+    program.run()
+    assert capsys.readouterr().out == '5000\n'
+
+
+@pytest.mark.parametrize('text, error', [
+    ('return(1);', 'Error: Invalid syntax'),
+    ("""
+    function f(a: int) {
+        if (a > 0) {
+            return('text');
+        }
+    }
+    b: int = 1 + f(1);
+    """, 'Error: Can not run + operation on types int and str'),
+])
+def test_bytecode_errors(text, error):
+    with pytest.raises(Exception) as excinfo:
+        compile_tree(analysed(text)).run()
+    assert error in str(excinfo.value)
+
+
+def test_disassemble():
+    program = compile_tree(analysed("""
+        function f(a: int) {
+            if (a > 1) { return(a); } else { return(-a); }
+        }
+        print(f(2));
+    """))
+    assert disassemble(program).split('\n') == [
+        '     0 CONST             0 (2)',
+        '     2 CALL              1 (f)',
+        '     4 PRINT             1 (1 values)',
+        '     6 HALT',
+        '',
+        'function f:',
+        '     8 LOAD              2 (slot 0)',
+        '    10 CONST             2 (1)',
+        '    12 GREATER',
+        '    14 JUMP_IF_FALSE     6 (to 22)',
+        '    16 LOAD              2 (slot 0)',
+        '    18 RETURN            1 (1 values)',
+        '    20 JUMP              6 (to 28)',
+        '    22 LOAD              2 (slot 0)',
+        '    24 NEGATIVE',
+        '    26 RETURN            1 (1 values)',
+        '    28 END',
+    ]
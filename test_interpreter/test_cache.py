@@ -0,0 +1,72 @@
+import pytest
+from interpreter.interpreter import Interpreter
+from interpreter.cache import ProgramCache, tree_size
+from test_interpreter import analysed
+
+
+program = """
+    function add(a: int, b: int) {
+        return(a + b);
+    }
+    print(add(2, 3));
+"""
+
+
+def test_cache_hit_and_miss():
+    cache = ProgramCache()
+    assert cache.get(program) is None
+    tree = analysed(program)
+    cache.put(program, tree)
+
+    assert cache.get(program) is tree
+    assert cache.get(program + ' ') is None
+    assert cache.stats() == {
+        'entries': 1,
+        'bytes': tree_size(tree),
+        'hits': 1,
+        'misses': 2,
+        'evictions': 0,
+    }
+
+
+def test_cache_evicts_least_recently_used():
+    texts = ['print({});'.format(i) for i in range(3)]
+    size = tree_size(analysed(texts[0]))
+    cache = ProgramCache(max_bytes=size * 2)
+
+    cache.put(texts[0], analysed(texts[0]))
+    cache.put(texts[1], analysed(texts[1]))
+    cache.get(texts[0])
+    cache.put(texts[2], analysed(texts[2]))
+
+    assert cache.get(texts[1]) is None
+    assert cache.get(texts[0]) is not None
+    assert cache.get(texts[2]) is not None
+    assert cache.evictions == 1
+    assert cache.size <= cache.max_bytes
+
+
+def test_cache_skips_too_large():
+    cache = ProgramCache(max_bytes=10)
+    cache.put(program, analysed(program))
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_cache_tree_runs_again(capsys):
+    cache = ProgramCache()
+    cache.put(program, analysed(program))
+
+    for _ in range(3):
+        assert Interpreter(cache.get(program)).interpret() == 'success'
+    assert capsys.readouterr().out == '5\n' * 3
+
+
+def test_tree_size_counts_called_blocks():
+    tree = analysed(program)
+    block = tree.children[0].block_node
+    # Only the call reaches the function now, like after optimising
+    tree.children = tree.children[1:]
+    size = tree_size(tree)
+    tree.children[0].args[0].func_symbol = None
+    assert size - tree_size(tree) > tree_size(block)
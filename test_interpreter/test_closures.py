@@ -0,0 +1,100 @@
+import pytest
+from interpreter.interpreter import Interpreter
+from interpreter.closures import ClosureCompiler
+from test_interpreter import analysed
+
+
+programs = [
+    "a: int = 12; print('a is ', a, ' ', -a, ' ', +a);",
+    'a: int = 2 * 3 + -1; b: int = a * a; print(a, b, 7 / 2, b - 2, 1 / a);',
+    'a: float = 7 / 2; b: float = a + a - 1 / 4; print(b, -a, b - a);',
+    "a: str = 'x'; b: str = a + a; if (b == a) { print(b); } else { print(a); }",
+    'a: bool = True; if (a) { print(1); } if (3 < 2) { print(2); } else { print(3); }',
+    """
+    n: int = 4;
+    function f(a: int) {
+        k: int = n + 1;
+        function g(b: int) {
+            function h(c: int) {
+                return(c + a + n);
+            }
+            return(h(b * k));
+        }
+        return(g(a));
+    }
+    print(f(2), ' ', f(n * 3));
+    """,
+    """
+    function fib(n: int) {
+        if (n <= 1) {
+            return(n);
+        } else {
+            a: int = fib(n - 1);
+            return(a + fib(n - 2));
+        }
+    }
+    print(fib(12));
+    """,
+    """
+    function pair(a: int) {
+        return(a, a * 2);
+        return(a + 1);
+    }
+    function show(a: int) {
+        print(a);
+    }
+    print(pair(3), show(5));
+    """,
+    # Operands and args read from slots and constants
+    """
+    function pair(a: int) { return(a, 10 - a); }
+    function three(a: int, b: str, c: bool) {
+        d: str = b;
+        e: int = 2;
+        p: int = pair(a);
+        if (c == True) { print(d, 3 * a, e, p); }
+        f: str = d + b;
+        if (a >= e) { return(a - e, f); }
+    }
+    print(three(4, 'x', True));
+    print(pair(1));
+    """,
+]
+
+
+@pytest.mark.parametrize('text', programs)
+def test_closures_same_output(text, capsys):
+    Interpreter(analysed(text)).interpret()
+    expected = capsys.readouterr().out
+    assert Interpreter(analysed(text)).interpret(engine='closures') == 'success'
+    assert capsys.readouterr().out == expected
+
+
+def test_closures_program_runs_again(capsys):
+    program = ClosureCompiler(analysed('a: int = 1; print(a + 1);')).compile()
+    program()
+    program()
+    assert capsys.readouterr().out == '2\n2\n'
+
+
+@pytest.mark.parametrize('text, error', [
+    ('return(1);', 'Error: Invalid syntax'),
+    ("""
+    function f(a: int) {
+        if (a > 0) {
+            return('text');
+        }
+    }
+    b: int = 1 + f(1);
+    """, 'Error: Can not run + operation on types int and str'),
+])
+def test_closures_errors(text, error):
+    with pytest.raises(Exception) as excinfo:
+        Interpreter(analysed(text)).interpret(engine='closures')
+    assert error in str(excinfo.value)
+
+
+def test_unknown_engine():
+    with pytest.raises(Exception) as excinfo:
+        Interpreter(analysed('a: int = 1;')).interpret(engine='jit')
+    assert 'Unknown engine jit' in str(excinfo.value)
@@ -0,0 +1,178 @@
+import pytest
+from interpreter.ast import Block, dump
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser, StackParser
+from interpreter.semantic_analyser import SemanticAnalyzer, FlatSemanticAnalyzer
+from interpreter.interpreter import Interpreter, FlatInterpreter
+from interpreter.flat import FlatTree, flatten, unflatten
+from test_interpreter import analysed
+from test_interpreter.test_closures import programs as closure_programs
+
+
+programs = [
+    '',
+    'a: int = 12; print(a);',
+    "a: str = 'I am '; b: str = 'Jakob'; print(a + b, True);",
+    """
+    function factorial(a: int) {
+        if (a == 1) {
+            return(1);
+        } else {
+            return(a * factorial(a - 1));
+        }
+    }
+    print('Factorial of 4 is : ', factorial(4));
+    """,
+    """
+    /* Nested blocks and expressions */
+    function f(a: int, b: str) {
+        c: int = -(a + 2) * 3 - +a * 1;
+        if (c >= 3) {
+            if (c) { print(b, c); }
+        }
+        return(c, b);
+    }
+    print(f(2, 'x'));
+    d: bool = False;
+    if (True == d) { print('no'); } else { print('yes'); }
+    f(1, 'y');
+    """,
+]
+
+
+def parse(text):
+    return Parser(RegexLexer(text)).parse()
+
+
+def flat_analysed(text):
+    flat = Parser(RegexLexer(text)).parse_flat()
+    FlatSemanticAnalyzer(flat).analyse()
+    return flat
+
+
+@pytest.mark.parametrize('text', programs)
+def test_flat_round_trip(text):
+    tree = parse(text)
+    assert dump(unflatten(flatten(tree))) == dump(tree)
+
+
+@pytest.mark.parametrize('text', programs)
+def test_flat_parse(text):
+    flat = Parser(RegexLexer(text)).parse_flat()
+    assert isinstance(flat, FlatTree)
+    assert dump(flat.to_tree()) == dump(parse(text))
+
+
+@pytest.mark.parametrize('text', programs + closure_programs + [
+    # Tail calls and args of unknown type
+    """
+    function down(n: int) {
+        if (n == 0) { return(0); } else { return(down(n - 1)); }
+    }
+    function text(a: int) {
+        if (a > 0) { return('x'); }
+    }
+    function twice(b: str) { return(b + b); }
+    print(down(5000), twice(text(1)));
+    """,
+])
+def test_flat_run(text, capsys):
+    Interpreter(analysed(text)).interpret()
+    expected = capsys.readouterr().out
+
+    assert FlatInterpreter(flat_analysed(text)).interpret() == 'success'
+    assert capsys.readouterr().out == expected
+
+
+@pytest.mark.parametrize('text', [
+    'print(a);',
+    'a: int = 1; a: int = 2;',
+    "a: int = 'x';",
+    "a: int = 1 + 'x';",
+    "a: bool = -True;",
+    'f(1);',
+    'function f(a: int) { return(a); } b: int = f(1, 2);',
+    "function f(a: int) { return(a); } b: int = f('x');",
+    'return(1);',
+    """
+    function f(a: int) {
+        if (a > 0) {
+            return('text');
+        }
+    }
+    b: int = 1 + f(1);
+    """,
+])
+def test_flat_errors(text):
+    with pytest.raises(Exception) as expected:
+        Interpreter(analysed(text)).interpret()
+    with pytest.raises(Exception) as excinfo:
+        FlatInterpreter(flat_analysed(text)).interpret()
+    assert str(excinfo.value) == str(expected.value)
+
+
+def test_flat_analysis_columns():
+    flat = flat_analysed("""
+    a: int = 1;
+    function f(b: int) {
+        return(f(a + b));
+    }
+    """)
+    assert flat.nlocals == 1
+    depths, slots = flat.info
+    function = flat.field(flat.root, 'children')[1]
+    returns = flat.field(flat.field(function, 'block_node'), 'children')[0]
+    call, = flat.field(returns, 'returns')
+    add, = flat.field(call, 'params')
+    a = flat.field(add, 'left')
+    b = flat.field(add, 'right')
+    assert (depths[a], slots[a]) == (1, 0)
+    assert (depths[b], slots[b]) == (0, 0)
+    assert flat.constants[depths[add]] == 'int' # Type of the operands
+    symbols, tails = flat.info
+    assert flat.symbols[symbols[call]].name == 'f'
+    assert tails[call] == 1
+
+
+def test_flat_other_engines():
+    flat = flat_analysed('a: int = 1;')
+    with pytest.raises(Exception) as excinfo:
+        FlatInterpreter(flat).interpret(engine='closures')
+    assert 'only run with the tree engine' in str(excinfo.value)
+
+
+def test_flat_columns():
+    flat = Parser(RegexLexer('print(1, a + 1); b: int = 1;')).parse_flat()
+    assert flat.kind(flat.root) == 'Block'
+    first, second, _ = flat.field(flat.root, 'children')
+    assert flat.kind(first) == 'Print'
+    assert flat.kind(second) == 'Assign'
+
+    one, add = flat.field(first, 'args')
+    # Nodes come before the nodes they are in, lists are ranges of items
+    assert one < add < first
+    start, count = flat.columns[0][first], flat.columns[1][first]
+    assert flat.items[start:start + count].tolist() == [one, add]
+    assert flat.field(one, 'value') == 1
+    assert flat.field(add, 'op').value == '+'
+    assert flat.kind(flat.field(add, 'left')) == 'Variable'
+
+    # Equal constants share a slot in the pool
+    assert flat.constants.count(1) == 1
+    assert flat.field(second, 'type').value == 'int'
+
+
+def test_flat_to_tree_is_not_kept():
+    flat = Parser(RegexLexer('a: int = 1;')).parse_flat()
+    assert flat.to_tree() is not flat.to_tree()
+    assert not hasattr(flat, 'tree')
+
+
+def test_flat_deep_nesting():
+    depth = 100000
+    text = 'if (x) { ' * depth + 'a: int = ' + '(' * depth + '1' + ')' * depth + ';' + ' }' * depth
+    flat = StackParser(RegexLexer(text)).parse_flat()
+    node = flat.to_tree().children[0]
+    for _ in range(depth - 1):
+        node = node.block.children[0]
+    assert node.block.children[0].value.value == 1
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+from interpreter.ast import Block, FuncDecl, Print, dump
+from interpreter.lexer import RegexLexer
+from interpreter.parser import Parser
+from interpreter.incremental import IncrementalParser
+
+
+def full_parse(text):
+    return dump(Parser(RegexLexer(text)).parse())
+
+
+program = """
+    /* Some program */
+    a: int = 12;
+    function some_function(b: int, c: str) {
+        d: int = b * 2 + 1;
+        if (d > 3) {
+            print(c, d);
+        } else {
+            print('small');
+        }
+        return(d);
+    }
+    print(some_function(a, 'x'));
+    e: str = 'text';
+    if (a == 12) {
+        print(e);
+    }
+    f: int = a - 1;
+"""
+
+
+def test_incremental_initial_parse():
+    parser = IncrementalParser(program)
+    assert dump(parser.parse()) == full_parse(program)
+
+
+@pytest.mark.parametrize(
+    'old, new', [
+        ('a: int = 12;', 'a: int = 13;'),
+        ('print(e);', 'print(e, e);'),
+        ('f: int = a - 1;', 'f: int = a - 1; g: int = 2;'),
+        ('    a: int = 12;\n', ''),
+        ('print(c, d);', 'print(c, d + 1);'),
+        ('}\n    e: str', '} else { print(a); }\n    e: str'),
+        ('/* Some program */', '/* Some\n longer program */'),
+    ]
+)
+def test_incremental_edit(old, new):
+    parser = IncrementalParser(program)
+    text = program.replace(old, new, 1)
+    tree = parser.update(text)
+    assert dump(tree) == full_parse(text)
+
+
+def test_incremental_reuses_untouched_statements():
+    parser = IncrementalParser(program)
+    before = list(parser.parse().children)
+
+    tree = parser.update(program.replace('a: int = 12;', 'a: int = 99;'))
+    assert tree.children[0] is not before[0]
+    assert isinstance(tree.children[1], FuncDecl)
+    assert tree.children[1] is before[1]
+    assert tree.children[-1] is before[-1]
+
+    # Statements in front of the edit are not parsed again
+    tree = parser.update(parser.text.replace('print(e);', 'print(e, a);'))
+    assert tree.children[1] is before[1]
+    assert tree.children[-1] is before[-1]
+
+
+def test_incremental_edit_range():
+    parser = IncrementalParser('print(1);')
+    start = len('print(')
+    tree = parser.edit(start, start + 1, '2 + 3')
+    assert parser.text == 'print(2 + 3);'
+    assert isinstance(tree, Block)
+    assert isinstance(tree.children[0], Print)
+    assert dump(tree) == full_parse('print(2 + 3);')
+
+
+def test_incremental_syntax_error_keeps_state():
+    parser = IncrementalParser(program)
+    with pytest.raises(Exception):
+        parser.update(program.replace('a: int = 12;', 'a: int 12;'))
+    assert parser.text == program
+    assert dump(parser.parse()) == full_parse(program)
+
+
+def test_incremental_random_edits():
+    rand = random.Random(4)
+    pieces = ['x', ';', ' ', '1', '+', '(', ')', '{', '}', "'", 'print(a);', '/*', '*/']
+    parser = IncrementalParser(program)
+    checked = 0
+
+    for _ in range(300):
+        text = parser.text
+        start = rand.randint(0, len(text))
+        end = min(len(text), start + rand.randint(0, 6))
+        new_text = text[:start] + rand.choice(pieces) + text[end:]
+        try:
+            expected = full_parse(new_text)
+        except Exception:
+            continue
+        assert dump(parser.update(new_text)) == expected
+        checked += 1
+
+    assert checked > 20
@@ -1,8 +1,8 @@
 import pytest
-from interpreter.lexer import Lexer
-from interpreter.parser import Parser
-from interpreter.semantic_analyser import SemanticAnalyzer
-from interpreter.interpreter import Interpreter
+from interpreter.lexer import Lexer, RegexLexer
+from interpreter.parser import Parser, StackParser
+from interpreter.semantic_analyser import SemanticAnalyzer, StackSemanticAnalyzer
+from interpreter.interpreter import Interpreter, StackInterpreter
 
 
 @pytest.fixture
@@ -138,18 +138,277 @@ def test_int_7(tree, capsys):
         c: int = a + b; 
     """)]
 )    
-def test_int_7(tree, capsys):
-    interpreter = Interpreter(tree)
+def test_int_7(text, capsys):
+    # Caught by the semantic analyser before anything runs
+    tree = Parser(Lexer(text)).parse()
     with pytest.raises(Exception) as excinfo:
-        result = interpreter.interpret()
+        SemanticAnalyzer(tree).analyse()
 
     assert 'Error: Can not run + operation on types str and int' in str(excinfo)
-    
 
 
-    
+@pytest.mark.parametrize(
+    'text', [("""
+        a: int = -3;
+        if (a) {
+            print(-a * 2, ' ', +a);
+        }
+        if (a < 0) {
+            print('negative');
+        }
+    """)]
+)
+def test_int_unary_and_condition(tree, capsys):
+    interpreter = Interpreter(tree)
+    result = interpreter.interpret()
+    assert result == 'success'
+    captured = capsys.readouterr()
+    assert captured.out == '6 -3\nnegative\n'
 
 
+def stack_tree(text):
+    tree = StackParser(RegexLexer(text)).parse()
+    StackSemanticAnalyzer(tree).analyse()
+    return tree
+
+
+DEPTH = 100000
 
 
+def test_stack_int_matches_interpreter(capsys):
+    text = """
+        function factorial(a: int) {
+            if (a == 1) {
+                return(1);
+            } else {
+                return(a * factorial(a - 1));
+            }
+        }
+        b: int = -(2 + 3) * 4;
+        print('Factorial of 5 is : ', factorial(5), ' ', b);
+    """
+    Interpreter(stack_tree(text)).interpret()
+    expected = capsys.readouterr().out
+    assert StackInterpreter(stack_tree(text)).interpret() == 'success'
+    assert capsys.readouterr().out == expected == 'Factorial of 5 is : 120 -20\n'
+
+
+def test_stack_int_deep_expression(capsys):
+    text = (
+        'a: int = ' + '(' * DEPTH + '1' + ')' * DEPTH + ' + ' + '-' * DEPTH + '2;' +
+        'b: int = ' + ' + '.join(['1'] * DEPTH) + ';' +
+        'print(a, " ", b);'
+    )
+    assert StackInterpreter(stack_tree(text)).interpret() == 'success'
+    assert capsys.readouterr().out == '3 100000\n'
+
+
+def test_stack_int_deep_ifs(capsys):
+    text = 'if (True) { ' * DEPTH + 'print("deep");' + ' }' * DEPTH
+    assert StackInterpreter(stack_tree(text)).interpret() == 'success'
+    assert capsys.readouterr().out == 'deep\n'
+
+
+def test_stack_int_deep_recursion(capsys):
+    text = """
+        function count(n: int) {
+            if (n == 0) {
+                return(0);
+            } else {
+                return(1 + count(n - 1));
+            }
+        }
+        print(count(20000));
+    """
+    assert StackInterpreter(stack_tree(text)).interpret() == 'success'
+    assert capsys.readouterr().out == '20000\n'
+
+
+def test_stack_int_memory_budget(capsys):
+    text = """
+        function count(n: int) {
+            if (n == 0) {
+                return(0);
+            } else {
+                return(1 + count(n - 1));
+            }
+        }
+        print(count(20000));
+    """
+    interpreter = StackInterpreter(stack_tree(text))
+    interpreter.max_bytes = 64 * 1024 * 1024
+    assert interpreter.interpret() == 'success'
+    assert capsys.readouterr().out == '20000\n'
+    assert interpreter.call_stack.bytes == 0
+
+    interpreter = StackInterpreter(stack_tree(text))
+    interpreter.max_bytes = 1024 * 1024
+    with pytest.raises(Exception) as excinfo:
+        interpreter.interpret()
+    assert 'Error: Calls need more than the memory budget of 1048576 bytes' in str(excinfo.value)
+
+
+@pytest.mark.parametrize(
+    'text', [("""
+        g: int = 10;
+        function outer(a: int) {
+            b: int = a + g;
+            function inner(c: int) {
+                return(c + b + g);
+            }
+            return(inner(a * 2));
+        }
+        x: int = outer(1);
+        print(x, ' ', outer(x));
+    """)]
+)
+def test_int_outer_scopes(tree, capsys):
+    assert Interpreter(tree).interpret() == 'success'
+    assert capsys.readouterr().out == '23 89\n'
+    assert StackInterpreter(tree).interpret() == 'success'
+    assert capsys.readouterr().out == '23 89\n'
 
+
+@pytest.mark.parametrize(
+    'text', [("""
+        function show(a: int) {
+            print(a);
+        }
+        print(show(5));
+    """)]
+)
+def test_int_call_without_return(tree, capsys):
+    assert Interpreter(tree).interpret() == 'success'
+    assert capsys.readouterr().out == '5\nNone\n'
+
+
+@pytest.mark.parametrize(
+    'text', [("""
+        function f(a: int) {
+            if (a > 0) {
+                return('text');
+            }
+        }
+        b: int = 1 + f(1);
+    """)]
+)
+def test_int_checks_unknown_types(tree):
+    # f may not return, so the analyser leaves the check to the interpreter
+    with pytest.raises(Exception) as excinfo:
+        Interpreter(tree).interpret()
+    assert 'Error: Can not run + operation on types int and str' in str(excinfo.value)
+
+
+@pytest.mark.parametrize('engine', ['tree', 'closures', 'bytecode', 'registers', 'python'])
+@pytest.mark.parametrize(
+    'text, error', [
+        ("""
+            function f(n: int) { if (n > 0) { return('pos'); } }
+            x: int = f(1);
+            y: int = x * 3;
+            print(y);
+        """, 'Can not run * operation on types str and int'),
+        ("""
+            function f(n: int) { if (n > 0) { return('pos'); } }
+            x: int = f(0);
+            y: int = x * 3;
+        """, 'Can not run * operation on types NoneType and int'),
+        ("""
+            function g(a: int) { b: int = a * 3; print(b); }
+            function f(n: int) { if (n > 0) { return('pos'); } }
+            g(f(1));
+        """, 'Can not run * operation on types str and int'),
+    ]
+)
+def test_int_checks_variables_of_unknown_values(tree, engine, error):
+    # Declared int, but given the value of a call that may not be one
+    with pytest.raises(Exception) as excinfo:
+        Interpreter(tree).interpret(engine=engine)
+    assert error in str(excinfo.value)
+
+
+@pytest.mark.parametrize('engine', ['tree', 'closures', 'bytecode', 'registers', 'python'])
+@pytest.mark.parametrize(
+    'text, error', [
+        ("""
+            a: int = 1;
+            if (a > 2) { x: int = 3; }
+            y: int = x + 1;
+        """, 'Error: Can not run + operation on types NoneType and int'),
+        ("""
+            function f(n: int) {
+                if (n > 2) { x: int = n; }
+                return(2 * x);
+            }
+            print(f(1));
+        """, 'Error: Can not run * operation on types int and NoneType'),
+    ]
+)
+def test_int_checks_variables_that_may_be_unset(tree, engine, error):
+    # Declared in an if block that did not run, so the variable is None
+    with pytest.raises(Exception) as excinfo:
+        Interpreter(tree).interpret(engine=engine)
+    assert str(excinfo.value) == error
+
+
+@pytest.mark.parametrize(
+    'text', [("""
+        function count(n: int) {
+            if (n > 0) {
+                rest: int = count(n - 1);
+            }
+            return(n);
+        }
+        function show(a: int) {
+            if (a > 1) {
+                b: int = a;
+            }
+            print(b);
+        }
+        x: int = count(20);
+        y: int = count(20);
+        show(2);
+        show(1);
+    """)]
+)
+def test_int_reuses_records(tree, capsys):
+    interpreter = Interpreter(tree)
+    assert interpreter.interpret() == 'success'
+    # One record per nested call of count, then the same ones again
+    assert interpreter.allocated == 22
+    # A reused record does not keep the variables of the last call
+    assert capsys.readouterr().out == '2\nNone\n'
+
+    interpreter = Interpreter(tree)
+    interpreter.pool_size = 0
+    interpreter.interpret()
+    assert interpreter.allocated == 44
+
+
+@pytest.mark.parametrize(
+    'text', [("""
+        function sum(n: int, acc: int) {
+            if (n == 0) {
+                return(acc);
+            } else {
+                return(sum(n - 1, acc + n));
+            }
+        }
+        function last(n: int) {
+            if (n > 0) {
+                a: int = n;
+                return(last(n - 1));
+            }
+            print(a);
+        }
+        print(sum(100000, 0));
+        print(last(3));
+    """)]
+)
+def test_int_tail_calls(tree, capsys):
+    # sum goes far deeper than the Python stack in one record, last
+    # prints after its call so that is a call like any other
+    for interpreter in (Interpreter(tree), StackInterpreter(tree)):
+        assert interpreter.interpret() == 'success'
+        assert capsys.readouterr().out == '5000050000\nNone\n1\n2\n3\nNone\n'
+        assert interpreter.allocated == 5
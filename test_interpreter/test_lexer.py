@@ -1,4 +1,16 @@
-from interpreter.lexer import Lexer, Token
+import io
+import mmap
+
+import pytest
+from interpreter.lexer import (
+    Lexer,
+    RegexLexer,
+    StreamLexer,
+    Token,
+    TokenBuffer,
+    TokenKind,
+    make_lexer
+)
 
 #######################################
 #######################################
@@ -616,4 +628,189 @@ def test_lexer_comments():
     token = lexer.get_next_token()
     assert isinstance(token, Token)
     assert token.type == 'NAME'
-    assert token.value == 'a'
\ No newline at end of file
+    assert token.value == 'a'
+
+#######################################
+# REGEX LEXER TESTS
+#######################################
+
+def all_tokens(lexer):
+    tokens = []
+    while True:
+        token = lexer.get_next_token()
+        tokens.append((token.type, token.value))
+        if token.type == 'EOF':
+            return tokens
+
+
+@pytest.mark.parametrize(
+    'text', [
+        '+ = ; : () == <= >=',
+        'var: float = 1.56;',
+        'var: bool = True; other: bool = False;',
+        'var: str = "I am s string"; b: str = \'single\';',
+        """
+        /*
+        I am a comment
+        */
+        function some_function(a: int, b_c: str) {
+            if (a >= 12) {
+                print('Hello', b_c, some_function(a - 1, b_c));
+            } else {
+                return(a * 2 / 3);
+            }
+        }
+        """,
+    ]
+)
+def test_regex_lexer_matches_lexer(text):
+    assert all_tokens(RegexLexer(text)) == all_tokens(Lexer(text))
+
+
+def test_regex_lexer_current_char():
+    lexer = RegexLexer('foo(bar)')
+    assert lexer.get_next_token().value == 'foo'
+    assert lexer.current_char == '('
+
+
+def test_regex_lexer_empty():
+    lexer = RegexLexer('')
+    assert lexer.get_next_token().type == 'EOF'
+    assert lexer.get_next_token().type == 'EOF'
+
+
+def test_regex_lexer_invalid_char():
+    lexer = RegexLexer('a: int = 1 $ 2;')
+    with pytest.raises(Exception) as excinfo:
+        all_tokens(lexer)
+    assert 'Invalid syntax' in str(excinfo.value)
+
+
+def test_make_lexer():
+    assert isinstance(make_lexer('a'), RegexLexer)
+    assert not isinstance(make_lexer('a', regex=False), RegexLexer)
+
+
+def test_regex_lexer_trailing_comments():
+    # Used to backtrack over every way of splitting the comments
+    text = 'a: int = 1;' + ' /* c */ /* d * / */' * 40 + '\n'
+    assert all_tokens(RegexLexer(text)) == all_tokens(RegexLexer('a: int = 1;'))
+
+
+#######################################
+# TOKEN BUFFER TESTS
+#######################################
+
+@pytest.mark.parametrize(
+    'text', [
+        '',
+        '+ = ; : () == <= >=',
+        'var: float = 1.56; var: bool = False;',
+        """
+        /* comment */
+        function some_function(a: int, b_c: str) {
+            print('Hello', b_c, some_function(a - 1, "b"));
+            return(True);
+        }
+        """,
+    ]
+)
+def test_token_buffer_matches_lexer(text):
+    assert all_tokens(TokenBuffer(text).reader()) == all_tokens(RegexLexer(text))
+
+
+def test_token_buffer_columns():
+    buffer = TokenBuffer('a: str = "xy";')
+    assert len(buffer) == 7
+    assert buffer.kind(0) == TokenKind.NAME
+    assert buffer.kind(4) == TokenKind.STRING
+    assert buffer.value(4) == 'xy'
+    assert (buffer.starts[4], buffer.ends[4]) == (10, 12)
+    assert buffer.kind(6) == TokenKind.EOF
+    assert buffer.value(6) is None
+
+
+def test_token_buffer_shares_fixed_tokens():
+    buffer = TokenBuffer('a: int = 1; b: int = 2;')
+    # Punctuation has one value, names and literals do not
+    assert buffer.token(1) is buffer.token(7)
+    assert buffer.token(5) is buffer.token(11)
+    assert buffer.token(0) is not buffer.token(6)
+    assert buffer.token(4).value == 1 and buffer.token(10).value == 2
+
+
+def test_token_reader_stays_at_eof():
+    buffer = TokenBuffer('a;')
+    reader = buffer.reader()
+    tokens = [reader.get_next_token() for _ in range(5)]
+    assert tokens[1] is buffer.token(1)
+    assert [token.type for token in tokens] == ['NAME', 'SCOLON', 'EOF', 'EOF', 'EOF']
+
+
+def test_token_buffer_invalid_char():
+    with pytest.raises(Exception) as excinfo:
+        TokenBuffer('a: int = 1 $ 2;')
+    assert 'Invalid syntax' in str(excinfo.value)
+
+
+#######################################
+# STREAM LEXER TESTS
+#######################################
+
+stream_text = """
+    /* A comment that
+       spans a few chunks */
+    function some_function(a: int, b_c: str) {
+        if (a >= 12) {
+            print('Hello ünïcödé', b_c, some_function(a - 1, "b"));
+        } else {
+            return(a == 2.5);
+        }
+    }
+"""
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64 * 1024])
+def test_stream_lexer_chunks(chunk_size):
+    lexer = StreamLexer(io.StringIO(stream_text), chunk_size=chunk_size)
+    assert all_tokens(lexer) == all_tokens(RegexLexer(stream_text))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5])
+def test_stream_lexer_bytes(chunk_size):
+    # Multi byte chars get split between chunks
+    reader = io.BytesIO(stream_text.encode('utf-8'))
+    lexer = StreamLexer(reader, chunk_size=chunk_size)
+    assert all_tokens(lexer) == all_tokens(RegexLexer(stream_text))
+
+
+def test_stream_lexer_path_and_mmap(tmp_path):
+    path = tmp_path / 'program.txt'
+    path.write_text(stream_text, encoding='utf-8')
+    expected = all_tokens(RegexLexer(stream_text))
+
+    assert all_tokens(StreamLexer(str(path), chunk_size=4)) == expected
+
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            assert all_tokens(StreamLexer(mapped, chunk_size=4)) == expected
+
+
+def test_stream_lexer_current_char():
+    lexer = StreamLexer(io.StringIO('foo(bar)'), chunk_size=3)
+    assert lexer.get_next_token().value == 'foo'
+    assert lexer.current_char == '('
+    assert lexer.pos == 3
+
+
+def test_stream_lexer_unterminated_comment():
+    lexer = StreamLexer(io.StringIO('a: int = 1; /* never closed'), chunk_size=4)
+    with pytest.raises(Exception) as excinfo:
+        all_tokens(lexer)
+    assert 'Invalid syntax' in str(excinfo.value)
+
+
+@pytest.mark.parametrize('lexer_class', [Lexer, RegexLexer])
+def test_lexer_empty_input(lexer_class):
+    lexer = lexer_class('')
+    assert lexer.get_next_token().type == 'EOF'
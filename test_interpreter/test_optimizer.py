@@ -0,0 +1,235 @@
+import pytest
+from interpreter.ast import Number, Print, IfStatement, dump
+from interpreter.interpreter import Interpreter
+from interpreter.optimizer import Optimizer, DeadCodeEliminator, copy
+from test_interpreter import analysed
+
+
+def folded(text):
+    optimizer = Optimizer(analysed(text))
+    optimizer.dead_code = False
+    return optimizer.optimize()
+
+
+programs = [
+    'a: int = 2 * 3 + -1; b: int = a * a; print(a, b, 7 / 2);',
+    "a: str = 'x'; b: str = a + a; if (b == a) { print(b); } else { print(a); }",
+    """
+    n: int = 4;
+    function f(a: int) {
+        k: int = n + 1;
+        c: int = 2;
+        if (a > k) {
+            e: int = c - 1;
+            print(e);
+        } else {
+            print(c * 2);
+        }
+        if (k > 3) { d: int = c * k; print(d); }
+        return(a * k);
+    }
+    print(f(2), f(n * 3));
+    """,
+    """
+    function count(n: int) {
+        if (n == 0) {
+            return(0);
+        } else {
+            return(1 + count(n - 1));
+        }
+    }
+    if (False) { x: int = 1; } else { y: int = 2; }
+    print(count(5), y);
+    """,
+    # Uses of a variable that is only set in an if block are left alone
+    'a: int = 1; if (a > 2) { b: int = 3; } print(b);',
+    # A function declared in a branch that never runs can still be called
+    'v: int = 5; if (True) { print(0); } else { function f() { return(v); } } print(f());',
+]
+
+
+@pytest.mark.parametrize('text', programs)
+def test_optimizer_same_output(text, capsys):
+    Interpreter(analysed(text)).interpret()
+    expected = capsys.readouterr().out
+    Interpreter(Optimizer(analysed(text)).optimize()).interpret()
+    assert capsys.readouterr().out == expected
+
+
+@pytest.mark.parametrize('engine', ['tree', 'closures', 'bytecode', 'registers', 'python'])
+@pytest.mark.parametrize('text', programs)
+def test_optimized_engines_same_output(text, engine, capsys):
+    Interpreter(analysed(text)).interpret()
+    expected = capsys.readouterr().out
+    assert Interpreter(Optimizer(analysed(text)).optimize()).interpret(engine=engine) == 'success'
+    assert capsys.readouterr().out == expected
+
+
+@pytest.mark.parametrize('text', programs)
+def test_optimizer_keeps_input(text):
+    tree = analysed(text)
+    before = dump(tree)
+    Optimizer(tree).optimize()
+    assert dump(tree) == before
+
+
+def test_optimizer_keeps_function_symbols():
+    tree = analysed('function f(a: int) { return(a * 2 * 3); } print(f(1));')
+    call = tree.children[1].args[0]
+    block = call.func_symbol.block
+    optimized = Optimizer(tree).optimize()
+    assert call.func_symbol.block is block
+    assert optimized.children[1].args[0].func_symbol.block is optimized.children[0].block_node
+
+
+def test_optimizer_folds_and_propagates():
+    tree = folded("""
+        a: int = 2 * 3 + -1;
+        b: int = a * a - 5;
+        if (b > a) { print(b); } else { print(a); }
+    """)
+    assign_a, assign_b, printed = tree.children[:3]
+    assert isinstance(assign_a.value, Number) and assign_a.value.value == 5
+    assert assign_b.value.value == 20
+    # The if statement became the branch it takes
+    assert isinstance(printed, Print)
+    assert printed.args[0].value == 20
+
+
+def test_optimizer_function_blocks():
+    tree = folded("""
+        k: int = 3;
+        function f(a: int) {
+            return(a + k * 2);
+        }
+        print(f(1));
+    """)
+    funcdecl, printed = tree.children[1], tree.children[2]
+    call = printed.args[0]
+    assert call.func_symbol.block is funcdecl.block_node
+    assert funcdecl.block_node.children[0].returns[0].right.value == 6
+
+
+def test_optimizer_keeps_division_by_zero():
+    tree = Optimizer(analysed('a: float = 1 / 0;')).optimize()
+    assert tree.children[0].value.op.value == '/'
+
+
+def test_optimizer_keeps_unknown_conditions():
+    tree = folded("""
+        function f(a: int) {
+            if (a > 1) { print(a); }
+        }
+    """)
+    assert isinstance(tree.children[0].block_node.children[0], IfStatement)
+
+
+def test_dead_code_removed():
+    text = """
+        a: int = 1;
+        b: int = a * 2;
+        c: int = 5;
+        function unused(x: int) {
+            print(c);
+            return(unused(x - 1));
+        }
+        function used(x: int) {
+            y: int = x * 2;
+            z: int = x + 1;
+            return(z);
+        }
+        function noisy(x: int) {
+            print('called');
+            return(x);
+        }
+        d: int = noisy(1);
+        if (d > 0) {
+            e: int = d + 1;
+        }
+        print(used(d));
+    """
+    optimizer = Optimizer(analysed(text))
+    tree = optimizer.optimize()
+    assert sorted(optimizer.eliminated) == [
+        'assignment to a', 'assignment to b', 'assignment to c', 'assignment to e',
+        'assignment to y', 'function unused', 'if statement'
+    ]
+    kinds = [type(child).__name__ for child in tree.children]
+    assert kinds == ['FuncDecl', 'FuncDecl', 'Assign', 'Print']
+    used = tree.children[0]
+    assert [type(child).__name__ for child in used.block_node.children] == ['Assign', 'Returns']
+
+
+def test_dead_code_keeps_effects(capsys):
+    text = """
+        function f(x: int) {
+            print('f ', x);
+            return(x);
+        }
+        a: int = f(1);
+        b: float = 1 / 0;
+        c: int = 2;
+        function g(x: int) { return(x + c); }
+        print(g(1));
+    """
+    tree = Optimizer(analysed(text)).optimize()
+    names = [child.name.value for child in tree.children if type(child).__name__ == 'Assign']
+    assert names == ['a', 'b']
+    with pytest.raises(ZeroDivisionError):
+        Interpreter(tree).interpret()
+    assert capsys.readouterr().out == 'f 1\n'
+
+
+def test_dead_code_follows_calls(capsys):
+    # Folding can leave a called function out of the tree
+    tree = analysed("""
+        v: int = 5;
+        if (True) { print(0); } else { function f(a: int) { return(a + v); } }
+        print(f(1));
+    """)
+    branch = tree.children[1]
+    tree = copy(tree, children=[tree.children[0], branch.block, tree.children[2]])
+    tree = DeadCodeEliminator(tree).eliminate()
+    assert type(tree.children[0]).__name__ == 'Assign'
+    Interpreter(tree).interpret()
+    assert capsys.readouterr().out == '0\n6\n'
+
+
+@pytest.mark.parametrize('text', [
+    # x is None when y is worked out
+    "a: int = 1; if (a > 2) { x: int = 3; } y: int = x + 1; print('done');",
+    """
+    function f(n: int) {
+        if (n > 2) { x: int = n; } else { print('small'); }
+        y: int = -x;
+        print('done');
+    }
+    f(1);
+    """,
+    # Functions see the variables set before the if they are declared in
+    """
+    b: int = 1;
+    if (b > 5) {
+        x: int = 2;
+        function f() { y: int = x * 2; print('done'); }
+    }
+    f();
+    """,
+])
+def test_dead_code_keeps_stores_that_fail(text):
+    with pytest.raises(Exception):
+        Interpreter(analysed(text)).interpret()
+    tree = Optimizer(analysed(text)).optimize()
+    with pytest.raises(Exception):
+        Interpreter(tree).interpret()
+
+
+def test_dead_code_removes_stores_of_set_variables():
+    optimizer = Optimizer(analysed("""
+        function one() { return(1); }
+        x: int = one();
+        function f(n: int) { y: int = n + x; print(n); }
+        f(2);
+    """))
+    optimizer.optimize()
+    assert optimizer.eliminated == ['assignment to y']
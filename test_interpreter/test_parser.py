@@ -14,10 +14,13 @@ from interpreter.ast import (
     Param,
     FuncDecl,
     FuncCall,
-    Empty
+    Empty,
+    AST,
+    dump,
+    fields
 )
-from interpreter.lexer import Lexer, Token
-from interpreter.parser import Parser
+from interpreter.lexer import Lexer, RegexLexer, Token, TokenBuffer
+from interpreter.parser import Parser, StackParser
 
 ##################################
 ##################################
@@ -417,3 +420,278 @@ def test_parser_nested_func_call():
     assert isinstance(print_statement, Print)
 
 
+
+
+def test_parser_token_buffer():
+    text = """
+        function some_function(a: int) {
+            print(a * 2 + 1);
+        }
+        some_function(3);
+    """
+    node1 = Parser(TokenBuffer(text)).parse()
+    assert isinstance(node1, Block)
+    assert isinstance(node1.children[0], FuncDecl)
+    assert isinstance(node1.children[1], FuncCall)
+    assert node1.children[1].func_name == 'some_function'
+
+
+##################################
+# PRATT EXPRESSION PARSER
+##################################
+
+def parse_with(text, pratt):
+    parser = Parser(RegexLexer(text))
+    parser.pratt = pratt
+    return dump(parser.parse())
+
+
+@pytest.mark.parametrize(
+    'text', [
+        'a: int = 1 + 2 * 3 - 4 / 5;',
+        'a: int = -b * (c + -d) - +e;',
+        'a: int = ((1 + 2) * (3 - f(x, 2 * y))) / z;',
+        'print(a + b, "str", 2 * g(1));',
+        'if (a * 2 >= b + 1) { print(a); } else { print(b); }',
+        'if (True == x) { print(x); }',
+        'if (x) { print(x); }',
+        'function f(a: int) { return(a - 1 - 2 - 3); }',
+    ]
+)
+def test_pratt_matches_recursive_descent(text):
+    assert parse_with(text, pratt=True) == parse_with(text, pratt=False)
+
+
+def test_pratt_left_associative():
+    node = Parser(RegexLexer('a: int = 1 - 2 - 3;')).parse().children[0].value
+    assert isinstance(node, BinOp)
+    assert isinstance(node.left, BinOp)
+    assert node.left.left.value == 1
+    assert node.right.value == 3
+
+
+def test_pratt_comparison_bool_right():
+    node = Parser(RegexLexer('if (x == True) { print(x); }')).parse().children[0]
+    assert isinstance(node.value, Comparison)
+    assert isinstance(node.value.right, Boolean)
+
+
+@pytest.mark.parametrize(
+    'text', [
+        'if (a < b < c) { print(a); }',
+        'a: int = (a < b);',
+        'a: int = 1 +;',
+    ]
+)
+def test_pratt_invalid(text):
+    with pytest.raises(Exception) as excinfo:
+        Parser(RegexLexer(text)).parse()
+    assert 'Invalid syntax' in str(excinfo.value)
+
+
+@pytest.mark.parametrize(
+    'text', [
+        'a: int = 1 + 2 * 3 - 4 / 5;',
+        'a: int = -b * (c + -d) - +e;',
+        'a: int = ((1 + 2) * (3 - f(x, 2 * y))) / z;',
+        'print(a + b, "str", 2 * g(1));',
+        'if (a * 2 >= b + 1) { print(a); } else { print(b); }',
+        'if (x == True) { print(x); }',
+        'function f(a: int) { return(a - 1 - 2 - 3); }',
+        # Calls, in expressions and on their own
+        "a: int = f() + g(f(1), 'x', True, -(2 + h(3)) * 4) - k(-1);",
+        "f(g(h()), 'x'); print(f(1, g(2 * 3)), f(True)); return(f(g(1)));",
+        'function f(a: int) { return(f(a), g()); }',
+        'f(1) + 2;',
+    ]
+)
+def test_stack_parser_matches_pratt(text):
+    expected = dump(Parser(RegexLexer(text)).parse())
+    assert dump(StackParser(RegexLexer(text)).parse()) == expected
+
+
+DEPTH = 100000
+
+
+def test_stack_parser_deep_parens():
+    text = 'a: int = ' + '(' * DEPTH + '1' + ')' * DEPTH + ';'
+    node = StackParser(RegexLexer(text)).parse().children[0].value
+    assert isinstance(node, Number)
+    assert node.value == 1
+
+
+def test_stack_parser_deep_calls():
+    text = 'a: int = ' + 'f(' * DEPTH + '1' + ')' * DEPTH + ';'
+    node = StackParser(RegexLexer(text)).parse().children[0].value
+    for _ in range(DEPTH):
+        assert isinstance(node, FuncCall)
+        node, = node.params
+    assert node.value == 1
+
+
+def test_stack_parser_deep_call_statement():
+    text = 'f(' * DEPTH + "g(1, 'x') + 2" + ')' * DEPTH + ';'
+    node = StackParser(RegexLexer(text)).parse().children[0]
+    for _ in range(DEPTH):
+        assert node.func_name == 'f'
+        node, = node.params
+    assert isinstance(node, BinOp)
+    assert [type(param) for param in node.left.params] == [Number, String]
+
+
+@pytest.mark.parametrize('text', [
+    "a: int = f('x' + 1);",
+    'a: int = f(1 2);',
+    'a: int = f(1,);',
+])
+def test_stack_parser_call_errors(text):
+    with pytest.raises(Exception) as expected:
+        Parser(RegexLexer(text)).parse()
+    with pytest.raises(Exception) as excinfo:
+        StackParser(RegexLexer(text)).parse()
+    assert str(excinfo.value) == str(expected.value)
+
+
+def test_stack_parser_deep_unary():
+    text = 'a: int = ' + '-' * DEPTH + '1;'
+    node = StackParser(RegexLexer(text)).parse().children[0].value
+    for _ in range(DEPTH):
+        assert isinstance(node, UnaryOp)
+        node = node.expr
+    assert node.value == 1
+
+
+def test_stack_parser_deep_ifs():
+    text = 'if (x) { ' * DEPTH + 'print(x);' + ' }' * DEPTH
+    node = StackParser(RegexLexer(text)).parse().children[0]
+    for _ in range(DEPTH - 1):
+        node = node.block.children[0]
+    assert isinstance(node.block.children[0], Print)
+
+
+def test_stack_parser_depth_limit():
+    parser = StackParser(RegexLexer('a: int = ' + '(' * 50 + '1' + ')' * 50 + ';'))
+    parser.max_depth = 10
+    with pytest.raises(Exception) as excinfo:
+        parser.parse()
+    assert 'Maximum nesting depth' in str(excinfo.value)
+
+
+def test_parser_peek():
+    parser = Parser(RegexLexer('a: int = 1;'))
+    assert parser.peek(0).value == 'a'
+    assert parser.peek(3).type == 'EQUAL'
+    assert parser.peek(1).type == 'COLON'
+    parser.eat('NAME')
+    assert parser.curr_token.type == 'COLON'
+    assert parser.peek(4).type == 'SCOLON'
+    with pytest.raises(Exception):
+        parser.peek(5)
+
+
+def test_parser_call_with_space_before_paren():
+    tree = Parser(RegexLexer('foo (1); print(bar (2));')).parse()
+    assert isinstance(tree.children[0], FuncCall)
+    assert isinstance(tree.children[1].args[0], FuncCall)
+
+
+@pytest.mark.parametrize(
+    'text', [
+        'a: int = f(1) + g(x, 2) * b;',
+        'print(f (a), b);',
+        'function f(a: int) { return(g(a), a); }',
+        'if (h(1) > 2) { f(); }',
+    ]
+)
+def test_parser_token_list(text):
+    tokens = []
+    lexer = RegexLexer(text)
+    while True:
+        tokens.append(lexer.get_next_token())
+        if tokens[-1].type == 'EOF':
+            break
+
+    expected = dump(Parser(RegexLexer(text)).parse())
+    assert dump(Parser(tokens).parse()) == expected
+    # Also works without the EOF token and from an iterator
+    assert dump(Parser(iter(tokens[:-1])).parse()) == expected
+
+
+def test_ast_nodes_use_slots():
+    tree = Parser(RegexLexer("""
+        function f(a: int) { return(a); }
+        b: str = 'x';
+        if (f(1) > 0) { print(f(-1 + 2), True); } else { print(b); }
+    """)).parse()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, AST):
+            assert not hasattr(node, '__dict__')
+            stack.extend(value for _, value in fields(node))
+
+
+def test_ast_literal_tokens():
+    assert Number(Token('INTEGER', 3)).token.type == 'INTEGER'
+    assert Number(Token('FLOAT', 1.5)).token.type == 'FLOAT'
+    assert String(Token('STRING', 'a')).token.value == 'a'
+    assert Boolean(Token('BOOL', True)).token.type == 'BOOL'
+    assert Variable(Token('NAME', 'b')).token.value == 'b'
+    op = Token('PLUS', '+')
+    assert BinOp(left=None, op=op, right=None).token is op
+
+
+##################################
+# INTERNING
+##################################
+
+def test_parser_interns_literals():
+    tree = Parser(RegexLexer("""
+        a: int = 1;
+        b: int = 1;
+        c: str = 'ok';
+        print('ok', True, '1');
+        if (True) { print(True); }
+    """)).parse()
+    a, b, c, printed, condition = tree.children[:5]
+    assert a.value is b.value
+    assert c.value is printed.args[0]
+    assert printed.args[1] is condition.value.left
+    assert printed.args[1] is condition.block.children[0].args[0]
+    # Equal values of other types stay apart
+    assert printed.args[2] is not a.value
+    assert printed.args[1] is not a.value
+
+
+def test_parser_interns_pure_operations():
+    tree = Parser(RegexLexer("""
+        a: int = 2 * 3 + -1;
+        b: int = 2 * 3 + -1;
+        c: int = 2 * 3 - x;
+        d: int = x - 1;
+        e: int = x - 1;
+    """)).parse()
+    a, b, c, d, e = (node.value for node in tree.children[:5])
+    assert a is b
+    assert c is not a and c.left is a.left
+    # Nothing with a variable is shared
+    assert d is not e
+    assert d.left is not e.left
+    assert d.right is e.right
+
+
+def test_parser_intern_off():
+    text = 'a: int = 1 + 2; b: int = 1 + 2;'
+    parser = Parser(RegexLexer(text))
+    parser.intern = False
+    tree = parser.parse()
+    assert tree.children[0].value is not tree.children[1].value
+    assert tree.children[0].value.left is not tree.children[1].value.left
+    assert dump(tree) == dump(Parser(RegexLexer(text)).parse())
+
+
+def test_stack_parser_interns():
+    tree = StackParser(RegexLexer('a: int = (1 + 2) * 3; b: int = (1 + 2) * 3;')).parse()
+    assert tree.children[0].value is tree.children[1].value
@@ -0,0 +1,82 @@
+import pytest
+from interpreter.interpreter import Interpreter
+from interpreter.registers import (
+    compile_registers,
+    INT_ADD,
+    INT_SUB_CONST,
+    STR_CONCAT,
+    BINARY,
+    CHECKED_BINOP,
+    MOVE,
+)
+from test_interpreter import analysed
+from test_interpreter.test_transpiler import programs
+
+
+@pytest.mark.parametrize('text', programs)
+def test_registers_same_output(text, capsys):
+    Interpreter(analysed(text)).interpret()
+    expected = capsys.readouterr().out
+    assert Interpreter(analysed(text)).interpret(engine='registers') == 'success'
+    assert capsys.readouterr().out == expected
+
+
+def test_registers_program_runs_again(capsys):
+    program = compile_registers(analysed('a: int = 1; print(a + 1);'))
+    program.run()
+    program.run()
+    assert capsys.readouterr().out == '2\n2\n'
+
+
+def test_registers_deep_recursion(capsys):
+    program = compile_registers(analysed("""
+        function count(n: int) {
+            if (n == 0) {
+                return(0);
+            } else {
+                return(1 + count(n - 1));
+            }
+        }
+        print(count(5000));
+    """))
+    program.run()
+    assert capsys.readouterr().out == '5000\n'
+
+
+def test_registers_typed_instructions():
+    program = compile_registers(analysed("""
+        a: int = 1;
+        b: int = a + a;
+        c: int = b - 1;
+        s: str = 'x';
+        t: str = s + s;
+        function f(n: int) { if (n > 0) { return(n); } }
+        d: int = c + f(1);
+        x: float = 7 / 2;
+        y: float = x - x;
+    """))
+    ops = [instruction[0] for instruction in program.code]
+    assert ops.count(INT_ADD) == 1
+    assert ops.count(INT_SUB_CONST) == 1
+    assert ops.count(STR_CONCAT) == 1
+    assert ops.count(CHECKED_BINOP) == 1
+    assert ops.count(BINARY) == 1 # Float operations
+    # Results go straight into the variables
+    assert MOVE not in ops
+
+
+@pytest.mark.parametrize('text, error', [
+    ('return(1);', 'Error: Invalid syntax'),
+    ("""
+    function f(a: int) {
+        if (a > 0) {
+            return('text');
+        }
+    }
+    b: int = 1 + f(1);
+    """, 'Error: Can not run + operation on types int and str'),
+])
+def test_registers_errors(text, error):
+    with pytest.raises(Exception) as excinfo:
+        compile_registers(analysed(text)).run()
+    assert error in str(excinfo.value)
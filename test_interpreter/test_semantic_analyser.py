@@ -1,5 +1,5 @@
-from interpreter.lexer import Lexer, Token
-from interpreter.parser import Parser
+from interpreter.lexer import Lexer, RegexLexer, Token
+from interpreter.parser import Parser, StackParser
 from interpreter.ast import (
     Print,
     BinOp,
@@ -22,9 +22,12 @@ from interpreter.semantic_analyser import (
     SymbolTable,
     BuiltinTypeSymbol,
     FunctionSymbol,
-    SemanticAnalyzer
+    SemanticAnalyzer,
+    StackSemanticAnalyzer,
+    builtin_scope
 )
 from interpreter.interpreter import NodeVisitor
+from test_interpreter import analysed
 import pytest
 
 
@@ -183,5 +186,244 @@ def test_sem_an_bad_funccall2(tree):
     
     assert "was expecting" in str(excinfo)
 
+@pytest.mark.parametrize(
+    'text', [("""
+        function yo_yo(a: int, a: int) {
+            print(a);
+        }
+    """)]
+)
+def test_sem_an_duplicate_params(tree):
+    analyser = SemanticAnalyzer(tree)
+    with pytest.raises(Exception) as excinfo:
+        analyser.analyse()
+
+    assert "Duplicate identifier 'a' found" in str(excinfo.value)
+
+
+DEPTH = 100000
+
+
+def test_stack_sem_an_deep_nesting():
+    text = (
+        'x: int = 1;' +
+        'if (x) { ' * DEPTH +
+        'y: int = ' + '(' * DEPTH + 'x' + ')' * DEPTH + ' + ' + '-' * DEPTH + 'x;' +
+        ' }' * DEPTH
+    )
+    tree = StackParser(RegexLexer(text)).parse()
+    analyser = StackSemanticAnalyzer(tree)
+    analyser.analyse()
+
+
+def test_stack_sem_an_deep_undeclared():
+    text = 'if (True) { ' * DEPTH + 'print(z);' + ' }' * DEPTH
+    tree = StackParser(RegexLexer(text)).parse()
+    analyser = StackSemanticAnalyzer(tree)
+    with pytest.raises(Exception) as excinfo:
+        analyser.analyse()
+    assert 'z' in str(excinfo.value)
+
+
+def test_sem_an_resolves_slots():
+    tree = Parser(RegexLexer("""
+        a: int = 1;
+        b: int = a - 1;
+        function f(x: int, y: int) {
+            z: int = x + a;
+            return(z);
+        }
+    """)).parse()
+    SemanticAnalyzer(tree).analyse()
+    assign_a, assign_b, funcdecl = tree.children[:3]
+    assert tree.nlocals == 2
+    assert (assign_a.name.depth, assign_a.name.slot) == (0, 0)
+    assert (assign_b.name.slot, assign_b.value.left.depth, assign_b.value.left.slot) == (1, 0, 0)
+
+    assign_z = funcdecl.block_node.children[0]
+    x, a = assign_z.value.left, assign_z.value.right
+    assert (assign_z.name.depth, assign_z.name.slot) == (0, 2) # After the params
+    assert (x.depth, x.slot) == (0, 0)
+    assert (a.depth, a.slot) == (1, 0)
+    assert funcdecl.block_node.nlocals is None
+
+
+def test_sem_an_function_nlocals():
+    text = """
+        function f(x: int) {
+            y: int = x + 1;
+            if (y > 1) { z: int = y + 1; }
+            return(y);
+        }
+        print(f(2));
+    """
+    tree = StackParser(RegexLexer(text)).parse()
+    StackSemanticAnalyzer(tree).analyse()
+    call = tree.children[1].args[0]
+    assert call.func_symbol.nlocals == 3
+    assert [param.slot for param in call.func_symbol.formal_params] == [0]
+    assert tree.nlocals == 0
+
+
+def test_sem_an_function_is_not_a_variable():
+    tree = Parser(RegexLexer('function f(x: int) { return(x); } print(f);')).parse()
+    with pytest.raises(Exception) as excinfo:
+        SemanticAnalyzer(tree).analyse()
+    assert "'f' is not a variable" in str(excinfo.value)
 
-    
\ No newline at end of file
+
+def test_builtin_scope_is_shared():
+    tree = Parser(RegexLexer("""
+        function f(a: int) { return(a); }
+        function g(b: int) { return(b); }
+        print(f(1), g(2));
+    """)).parse()
+    SemanticAnalyzer(tree).analyse()
+    f, g = (arg.func_symbol for arg in tree.children[2].args)
+    assert f.formal_params[0].type is g.formal_params[0].type is builtin_scope.lookup('int')
+    with pytest.raises(Exception) as excinfo:
+        builtin_scope.insert(BuiltinTypeSymbol('float'))
+    assert 'builtin scope' in str(excinfo.value)
+
+
+def test_symbol_table_lookup_cache():
+    glob = SymbolTable('global', 1, builtin_scope)
+    outer = SymbolTable('outer', 2, glob)
+    inner = SymbolTable('inner', 3, outer)
+    symbol = FunctionSymbol('f', block=None)
+    glob.insert(symbol)
+    assert inner.lookup('f') is symbol
+    assert inner.cache['f'] is outer.cache['f'] is symbol
+    assert inner.lookup('int') is builtin_scope.symbols['int']
+    assert 'int' in glob.cache
+    assert inner.lookup('missing') is None
+    assert 'missing' not in inner.cache
+    # Own symbols come before cached ones
+    shadow = FunctionSymbol('f', block=None)
+    inner.insert(shadow)
+    assert inner.lookup('f') is shadow
+
+
+def test_sem_an_infers_types():
+    tree = analysed("""
+        a: int = 1 + 2 * 3;
+        s: str = 'x';
+        b: str = s + s;
+        function f(x: int) {
+            if (x > 0) { return(x); } else { return(0 - x); }
+        }
+        function g(x: int) {
+            if (x > 0) { return(x); }
+        }
+        d: int = f(1) + a;
+        e: int = g(1) + a;
+        if (b == 3) { print(b); }
+    """)
+    a, _, b, _, _, d, e, condition = tree.children[:8]
+    assert a.value.type == 'int' and a.value.right.type == 'int'
+    assert b.value.type == 'str'
+    assert d.value.type == 'int'
+    # g does not always return, checked when it runs
+    assert e.value.type is None
+    assert condition.value.type is None
+    assert d.value.left.func_symbol.return_type == 'int'
+    assert e.value.left.func_symbol.return_type == 'any'
+
+
+def test_sem_an_unknown_values_stay_untyped():
+    tree = analysed("""
+        function f(n: int) { if (n > 0) { return('pos'); } }
+        function g(a: int) { b: int = a * 3; return(b); }
+        function h(a: int) { return(a * 3); }
+        x: int = f(1);
+        y: int = x * 3;
+        z: int = g(f(1)) + h(2);
+    """)
+    _, g, h, _, y, z = tree.children[:6]
+    # Given the value of a call to f, which may not be an int
+    assert y.value.type is None
+    assert g.block_node.children[0].value.type is None
+    assert h.block_node.children[0].returns[0].type == 'int'
+    # a * 3 is checked when it runs, so what g returns is an int
+    assert z.value.type == 'int'
+    assert z.value.left.func_symbol.return_type == 'int'
+
+
+def test_sem_an_variables_that_may_be_unset_stay_untyped():
+    tree = analysed("""
+        a: int = 1;
+        if (a > 2) {
+            x: int = 3;
+            if (a > 3) { w: int = x + 1; }
+            v: int = x + 1;
+            function f() { return(x + 1); }
+        }
+        y: int = x + 1;
+    """)
+    condition = tree.children[1]
+    inner, v, f = condition.block.children[1:4]
+    # Read in the if block it is set in, after it is set
+    assert inner.block.children[0].value.type == 'int'
+    assert v.value.type == 'int'
+    # f can be called where the if block did not run
+    assert f.block_node.children[0].returns[0].type is None
+    assert tree.children[2].value.type is None
+
+
+def test_sem_an_division_is_float():
+    tree = analysed('a: int = 7; b: float = a / 2; c: float = b + b;')
+    _, b, c = tree.children[:3]
+    # Typed by its operands, which are ints
+    assert b.value.type == 'int'
+    assert c.value.type == 'float'
+
+
+@pytest.mark.parametrize(
+    'text, error', [
+        ("a: str = 'x'; b: str = a - a;", 'Can not run - operation on types str and str'),
+        ("a: bool = True; b: int = 1 * a;", 'Can not run * operation on types int and bool'),
+        ("a: str = 'x'; b: int = -a;", 'Can not run - operation on type str'),
+        ('x: int = 7 / 2; y: int = x * 2;', 'x is not of type int'),
+        ('a: float = 7 / 2; b: float = a * a;', 'Can not run * operation on types float and float'),
+        ("a: int = 1; b: str = 'x'; if (a < b) { print(a); }", 'Can not compare types int and str with <'),
+        ("function f(a: int) { return('x'); } b: int = f(1);", 'b is not of type int'),
+        ("function f(a: int) { return(a); } s: str = 'x'; b: int = f(1 + s);", 'types int and str'),
+        ("function f(a: str) { return(a); } b: str = f(-1);", "doesn't match defined arg"),
+    ]
+)
+def test_sem_an_type_errors(text, error):
+    tree = StackParser(RegexLexer(text)).parse()
+    with pytest.raises(Exception) as excinfo:
+        StackSemanticAnalyzer(tree).analyse()
+    assert error in str(excinfo.value)
+
+
+def test_sem_an_marks_tail_calls():
+    tree = analysed("""
+        function f(n: int) {
+            function g(m: int) { return(f(m)); }
+            if (n > 0) {
+                if (n > 5) { return(f(n - 2)); } else { return(f(n - 1)); }
+            } else {
+                return(g(1), f(n));
+            }
+        }
+        function h(n: int) {
+            if (n > 0) { return(h(n - 1)); }
+            print(n);
+            return(1 + h(n));
+        }
+        x: int = f(3);
+    """)
+    f, h, x = tree.children[:3]
+    g, if_statement = f.block_node.children[:2]
+    inner = if_statement.block.children[0]
+    assert inner.block.children[0].returns[0].tail
+    assert inner.elseblock.children[0].returns[0].tail
+    # More than one value, a call of another function and calls with
+    # statements after them are not tail calls
+    assert not if_statement.elseblock.children[0].returns[1].tail
+    assert not g.block_node.children[0].returns[0].tail
+    assert not h.block_node.children[0].block.children[0].returns[0].tail
+    assert not h.block_node.children[2].returns[0].right.tail
+    assert not x.value.tail
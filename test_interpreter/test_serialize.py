@@ -0,0 +1,103 @@
+import io
+
+import pytest
+from interpreter.ast import Block, FuncDecl, dump
+from interpreter.interpreter import Interpreter
+from interpreter.serialize import dumps, loads, load, header
+from interpreter.__main__ import main
+from test_interpreter import analysed
+
+
+program = """
+    function factorial(a: int) {
+        if (a == 1) {
+            return(1);
+        } else {
+            return(a * factorial(a - 1));
+        }
+    }
+    b: str = 'done';
+    c: bool = True;
+    if (c) {
+        print('Factorial of 5 is : ', factorial(5), ' ', -(2 + 1));
+    }
+    print(b, c);
+"""
+
+
+def test_serialize_round_trip(capsys):
+    tree = analysed(program)
+    loaded = loads(dumps(tree, program), program)
+    assert isinstance(loaded, Block)
+    assert dump(loaded) == dump(tree)
+
+    Interpreter(tree).interpret()
+    expected = capsys.readouterr().out
+    assert Interpreter(loaded).interpret() == 'success'
+    assert capsys.readouterr().out == expected
+
+
+def test_serialize_keeps_function_symbols():
+    loaded = loads(dumps(analysed(program), program))
+    decl = loaded.children[0]
+    assert isinstance(decl, FuncDecl)
+
+    # The call inside factorial points back at its own block
+    call = decl.block_node.children[0].elseblock.children[0].returns[0].right
+    assert call.func_symbol.block is decl.block_node
+    assert call.func_symbol.formal_params[0].name == 'a'
+
+
+def test_serialize_stores_tokens_once():
+    tree = analysed('a: int = 1; b: int = 1; c: int = a + b;')
+    loaded = loads(dumps(tree, ''))
+    first, second, third = loaded.children[:3]
+    assert first.type is second.type
+    assert third.value.token is third.value.op
+
+
+def test_serialize_source_mismatch():
+    data = dumps(analysed(program), program)
+    with pytest.raises(Exception) as excinfo:
+        loads(data, program + ' ')
+    assert 'does not match its source' in str(excinfo.value)
+
+
+@pytest.mark.parametrize(
+    'change, message', [
+        (lambda data: b'XXXX' + data[4:], 'Not a compiled program'),
+        (lambda data: data[:4] + b'\x09\x00' + data[6:], 'version'),
+        (lambda data: data[:-1], 'corrupt'),
+        (lambda data: data[:-1] + bytes([data[-1] ^ 1]), 'corrupt'),
+        (lambda data: data[:10], 'Not a compiled program'),
+    ]
+)
+def test_serialize_invalid(change, message):
+    data = dumps(analysed(program), program)
+    with pytest.raises(Exception) as excinfo:
+        loads(change(data))
+    assert message in str(excinfo.value)
+
+
+def test_serialize_file():
+    f = io.BytesIO()
+    f.write(dumps(analysed(program), program))
+    f.seek(0)
+    assert isinstance(load(f, program), Block)
+    assert f.tell() > header.size
+
+
+def test_compile_command(tmp_path, capsys):
+    source = tmp_path / 'program.txt'
+    source.write_text(program)
+    main(['run', str(source)])
+    expected = capsys.readouterr().out
+
+    main(['compile', str(source)])
+    compiled = tmp_path / 'program.ipc'
+    assert compiled.exists()
+    main(['run', str(compiled)])
+    assert capsys.readouterr().out == expected
+
+    main(['compile', str(source), '-o', str(tmp_path / 'other')])
+    assert (tmp_path / 'other').read_bytes() == compiled.read_bytes()
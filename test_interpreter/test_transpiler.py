@@ -0,0 +1,99 @@
+import pytest
+from interpreter.interpreter import Interpreter
+from interpreter.transpiler import Transpiler, transpile
+from test_interpreter import analysed
+from test_interpreter.test_bytecode import programs as bytecode_programs
+
+
+programs = bytecode_programs + [
+    # The last return that runs wins
+    """
+    function f(a: int) {
+        if (a > 1) { return(1); }
+        if (a > 2) { return(2, 3); }
+        print(a);
+    }
+    print(f(1), ' ', f(2), ' ', f(3));
+    """,
+    # Two functions with one name, calls go to the one declared before
+    """
+    function f(a: int) { return(a); }
+    print(f(1));
+    function f(a: int) { return(a * 10); }
+    print(f(1));
+    """,
+    # A function reads an outer variable and then declares its own
+    """
+    a: int = 1;
+    function f(b: int) {
+        c: int = a + b;
+        a: int = 5;
+        return(a + c);
+    }
+    print(f(2));
+    """,
+    'function empty(a: int) { } print(empty(1));',
+]
+
+
+@pytest.mark.parametrize('text', programs)
+def test_python_same_output(text, capsys):
+    Interpreter(analysed(text)).interpret()
+    expected = capsys.readouterr().out
+    assert Interpreter(analysed(text)).interpret(engine='python') == 'success'
+    assert capsys.readouterr().out == expected
+
+
+def test_python_program_runs_again(capsys):
+    program = transpile(analysed('a: int = 1; print(a + 1);'))
+    program.run()
+    program.run()
+    assert capsys.readouterr().out == '2\n2\n'
+
+
+def test_python_code_is_cached():
+    text = 'function f(a: int) { return(a + 1); } print(f(2));'
+    assert transpile(analysed(text)).code is transpile(analysed(text)).code
+
+
+@pytest.mark.parametrize('text, error', [
+    ('return(1);', 'Error: Invalid syntax'),
+    ("""
+    function f(a: int) {
+        if (a > 0) {
+            return('text');
+        }
+    }
+    b: int = 1 + f(1);
+    """, 'Error: Can not run + operation on types int and str'),
+])
+def test_python_errors(text, error):
+    with pytest.raises(Exception) as excinfo:
+        transpile(analysed(text)).run()
+    assert error in str(excinfo.value)
+
+
+def test_transpile_source():
+    source = Transpiler(analysed("""
+        n: int = 2;
+        function f(a: int) {
+            if (a > n) { b: int = a - 1; return(b); }
+            return(a, -a);
+        }
+        print(f(3));
+    """)).transpile()
+    assert source.split('\n') == [
+        'def program():',
+        '    n_1 = None',
+        '    def f_f0(a_2):',
+        '        returns_ = None',
+        '        b_2 = None',
+        '        if (a_2 > n_1):',
+        '            b_2 = (a_2 - 1)',
+        '            returns_ = b_2',
+        '        return [a_2, (-a_2)]',
+        '    n_1 = 2',
+        '    print_args([f_f0(3)])',
+        'program()',
+        '',
+    ]
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip('flask')
+import views
+
+
+def test_session_runs_use_the_program_cache():
+    views.program_cache.clear()
+    text = """
+        function add(a: int, b: int) { return(a + b); }
+        x: int = add(2, 3);
+        print(x);
+    """
+    first = views.run_interpreter(text, 'session')
+    hits = views.program_cache.hits
+    assert views.run_interpreter(text, 'session') == first
+    assert views.program_cache.hits == hits + 1
+
+
+def test_cached_session_trees_are_copies():
+    views.program_cache.clear()
+    function = 'function one() { return(1); } '
+    text = 'a: int = one(); b: int = a + 1; print(a, b);'
+    first = views.run_interpreter(function + text, 'session')
+    # The session analyses the statements it keeps again, they get new slots
+    views.run_interpreter(function + 'c: int = 5; ' + text, 'session')
+    hits = views.program_cache.hits
+    assert views.run_interpreter(function + text, 'session') == first
+    assert views.program_cache.hits == hits + 1
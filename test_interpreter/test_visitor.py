@@ -0,0 +1,57 @@
+import pytest
+from interpreter.ast import Number, String, BinOp, Empty
+from interpreter.lexer import Token
+from interpreter.visitor import NodeVisitor, dispatch_table, make_visitor
+
+
+class Values(NodeVisitor):
+    def visit_Number(self, node):
+        return node.value
+
+    def visit_BinOp(self, node):
+        return self.visit(node.left) + self.visit(node.right)
+
+
+class Strings(Values):
+    def visit_Number(self, node):
+        return str(node.value)
+
+    def visit_String(self, node):
+        return node.value
+
+
+def test_dispatch_table_of_class():
+    assert Values.dispatch[Number] is Values.visit_Number
+    assert String not in Values.dispatch
+
+
+def test_subclass_overrides_and_extends():
+    node = BinOp(Number(Token('INTEGER', 1)), Token('PLUS', '+'), Number(Token('INTEGER', 2)))
+    assert Values().visit(node) == 3
+    assert Strings().visit(node) == '12'
+    assert Strings.dispatch[BinOp] is Values.visit_BinOp
+    assert Strings().visit(String(Token('STRING', 'a'))) == 'a'
+
+
+def test_generic_visit():
+    with pytest.raises(Exception) as excinfo:
+        Values().visit(Empty())
+    assert 'No visit_Empty method' in str(excinfo.value)
+
+
+def test_dispatch_table_prefix():
+    class Printer(object):
+        def show_Number(self, node):
+            return 'number'
+
+    assert dispatch_table(Printer, 'show_') == {Number: Printer.show_Number}
+
+
+def test_make_visitor():
+    Doubler = make_visitor('Doubler', {Number: lambda visitor, node: node.value * 2})
+    assert Doubler.__name__ == 'Doubler'
+    assert issubclass(Doubler, NodeVisitor)
+    assert Doubler().visit(Number(Token('INTEGER', 4))) == 8
+
+    Tripler = make_visitor('Tripler', {Number: lambda visitor, node: node.value * 3}, base=Doubler)
+    assert Tripler().visit(Number(Token('INTEGER', 4))) == 12
@@ -6,12 +6,18 @@ from flask import (
     jsonify
 )
 import json
+from collections import OrderedDict
 from io import StringIO 
 import sys
-from interpreter.lexer import Lexer
+from threading import Lock
+from interpreter.cache import ProgramCache
+from interpreter.incremental import IncrementalParser
+from interpreter.lexer import make_lexer
 from interpreter.parser import Parser
 from interpreter.semantic_analyser import SemanticAnalyzer
 from interpreter.interpreter import Interpreter
+from interpreter.optimizer import Optimizer
+from interpreter.serialize import encode, decode
 
 
 pg = Blueprint('playground', __name__)
@@ -29,18 +35,68 @@ def about():
 # Api
 
 
-def run_interpreter(text):
+# Incremental front ends of the playground editors, keyed by the
+# session id the page sends along. Oldest sessions get dropped.
+MAX_SESSIONS = 256
+sessions = OrderedDict()
+sessions_lock = Lock()
+
+
+def get_session(session_id):
+    with sessions_lock:
+        session = sessions.pop(session_id, None)
+        if session is None:
+            session = (IncrementalParser(), Lock())
+        sessions[session_id] = session
+        while len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
+        return session
+
+
+def parse(text):
+    lexer = make_lexer(text)
+    parser = Parser(lexer)
+    return parser.parse()
+
+
+def analyse(tree):
+    sem_an = SemanticAnalyzer(tree)
+    sem_an.analyse()
+    return Optimizer(tree).optimize()
+
+
+# Analysed trees of programs that were run before, the same
+# examples and retries get posted over and over
+program_cache = ProgramCache()
+
+
+def interpret(text, session_id=None):
+    tree = program_cache.get(text)
+    if tree is not None:
+        return Interpreter(tree).interpret()
+
+    if session_id is None:
+        tree = analyse(parse(text))
+        program_cache.put(text, tree)
+        return Interpreter(tree).interpret()
+
+    # Only re-lex and re-parse what changed since the last run. The
+    # analyser writes to the session's tree, so a session runs one
+    # program at a time. Later runs analyse the nodes it keeps again,
+    # so the cache gets a copy that shares none of them.
+    parser, lock = get_session(session_id)
+    with lock:
+        tree = analyse(parser.update(text))
+        program_cache.put(text, decode(encode(tree)))
+        return Interpreter(tree).interpret()
+
+
+def run_interpreter(text, session_id=None):
     result = {}
     result['output'] = []
     with Capturing() as output:
         try:
-            lexer = Lexer(text)
-            parser = Parser(lexer)
-            tree = parser.parse()
-            sem_an = SemanticAnalyzer(tree)
-            sem_an.analyse()
-            interpreter = Interpreter(tree)
-            result['final_result'] = interpreter.interpret()
+            result['final_result'] = interpret(text, session_id)
         except Exception as exc:
             result['exception'] = str(exc)
 
@@ -65,8 +121,9 @@ class Capturing(list): # Context manager that catches stdout output
 def run_code():
     request_data = json.loads(request.data)
     text = request_data['code']
+    session_id = request_data.get('session_id')
     # Interpreter the code
-    result = run_interpreter(text)
+    result = run_interpreter(text, session_id)
 
     response = {
         'success': 'success',